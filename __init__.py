@@ -22,19 +22,24 @@
 # THE SOFTWARE.
 ###############################################################################
 
-import qrenderdoc as qrd
-
-from . import window
+# qrenderdoc only exists inside the RenderDoc UI, the command line exporter runs without it
+try:
+    import qrenderdoc as qrd
+except ImportError:
+    qrd = None
+
+if qrd is not None:
+    from . import window
     
 extiface_version = ''
 
-def window_callback(ctx: qrd.CaptureContext, data):
+def window_callback(ctx: 'qrd.CaptureContext', data):
     win = window.get_window(ctx, extiface_version)
 
     ctx.RaiseDockWindow(win)
 
 
-def register(version: str, ctx: qrd.CaptureContext):
+def register(version: str, ctx: 'qrd.CaptureContext'):
     global extiface_version
     extiface_version = version
 
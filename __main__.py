@@ -0,0 +1,145 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+###############################################################################
+
+# Headless batch exporter, using the standalone renderdoc python module instead of the UI:
+#
+#   python -m renderdoc2fbx capture.rdc [more.rdc ...] --range 100-900 --out dir [--jobs 8]
+#
+# The renderdoc module (renderdoc.pyd / renderdoc.so) must be importable, e.g. by adding
+# the folder of the RenderDoc build to PYTHONPATH.
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import sys
+import argparse
+
+from . import buffers, cache, exporter, farm, profiler, textures
+
+
+def parse_range(text):
+    start, sep, end = text.partition("-")
+    try:
+        start = int(start)
+        end = int(end) if sep else start
+    except ValueError:
+        raise argparse.ArgumentTypeError("not a valid drawcall range: " + text)
+    if start < 0 or end < start:
+        raise argparse.ArgumentTypeError("not a valid drawcall range: " + text)
+    return start, end
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="renderdoc2fbx", description="Export the drawcalls of RenderDoc captures as FBX files")
+    parser.add_argument("captures", nargs="+", help="capture files (.rdc) to export")
+    parser.add_argument("--out", required=True, help="destination folder, with one sub folder per capture when given several")
+    parser.add_argument("--range", type=parse_range, default=(None, None), metavar="START-END",
+                        help="drawcall ids to export, inclusive (default: every drawcall)")
+    parser.add_argument("--marker", metavar="REGEX", help="only export the drawcalls nested under a marker matching this pattern")
+    parser.add_argument("--textures", action="store_true", help="also save the textures used by each drawcall")
+    parser.add_argument("--texture-format", choices=[textures.TEXTURE_FORMAT_PNG, textures.TEXTURE_FORMAT_TGA, textures.TEXTURE_FORMAT_DDS],
+                        default=textures.TEXTURE_FORMAT_PNG, help="file format of the saved textures")
+    parser.add_argument("--binary", action="store_true", help="write binary FBX files instead of ascii")
+    parser.add_argument("--scene", action="store_true", help="write all drawcalls of a capture into one FBX scene")
+    parser.add_argument("--no-compress", action="store_true", help="don't zlib compress the arrays of binary FBX files")
+    parser.add_argument("--workers", type=int, default=0, help="decode and write drawcalls on this many worker processes")
+    parser.add_argument("--threads", action="store_true",
+                        help="use worker threads instead of processes, which only overlap the replay calls")
+    parser.add_argument("--dedup", choices=[exporter.DEDUP_OFF, exporter.DEDUP_MANIFEST, exporter.DEDUP_HARDLINK],
+                        default=exporter.DEDUP_OFF, help="how to handle drawcalls repeating the same mesh")
+    parser.add_argument("--no-texture-dedup", action="store_true",
+                        help="save every texture a drawcall uses, even when a saved one has the same pixels")
+    parser.add_argument("--instances", choices=[exporter.INSTANCES_MODELS, exporter.INSTANCES_MERGED],
+                        default=exporter.INSTANCES_MODELS,
+                        help="give every instance of an instanced draw a model sharing its geometry, or merge them into one mesh")
+    parser.add_argument("--instance-transform", metavar="NAME",
+                        help="per-instance attribute holding the instance transforms, as NAME0, NAME1, ... rows "
+                             "(default: the first attributes forming a matrix)")
+    parser.add_argument("--vertex-source", choices=[exporter.VERTEX_SOURCE_INPUTS, exporter.VERTEX_SOURCE_VSOUT,
+                                                    exporter.VERTEX_SOURCE_GSOUT],
+                        default=exporter.VERTEX_SOURCE_INPUTS,
+                        help="export the vertex inputs of each drawcall, or the output of its vertex or geometry shader")
+    parser.add_argument("--semantic-map", metavar="FILE",
+                        help="JSON file mapping vertex attribute name patterns to semantics, e.g. "
+                             "{\"in_var_ATTRIBUTE0\": \"POSITION\"}")
+    parser.add_argument("--chunk-size", type=int, default=exporter.DEFAULT_CHUNK_SIZE, metavar="INDICES",
+                        help="export draws with more indices than this a chunk at a time, 0 to never chunk")
+    parser.add_argument("--buffer-cache", type=int, default=buffers.DEFAULT_MAX_BYTES >> 20, metavar="MB",
+                        help="keep up to this much buffer data read for one drawcall for the next ones, 0 to not keep any")
+    parser.add_argument("--profile", action="store_true", help="time every stage of the export into " + profiler.REPORT_NAME)
+    parser.add_argument("--cache", metavar="DIR", help="keep decoded drawcalls in this folder to speed up exporting again")
+    parser.add_argument("--invalidate-cache", action="store_true", help="clear the cache before exporting")
+    parser.add_argument("--jobs", type=int, default=0,
+                        help="export on this many replay processes, one capture or shard each (default: in this process)")
+    parser.add_argument("--shard-size", type=int, default=0, metavar="DRAWS",
+                        help="split the drawcall range of each capture into jobs of this many drawcalls")
+    parser.add_argument("--retries", type=int, default=1, help="how many times to retry a failed capture before skipping it")
+
+    args = parser.parse_args(argv)
+    if args.shard_size and args.dedup == exporter.DEDUP_MANIFEST:
+        parser.error("--shard-size can't be combined with --dedup manifest, every shard would write its own manifest")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    # Clear the cache once up front, rather than in every job
+    if args.cache and args.invalidate_cache:
+        cache.ExportCache(args.cache).clear()
+
+    options = {
+        "is_save_texture": args.textures,
+        "exporter": {
+            "fbx_format": exporter.FBX_FORMAT_BINARY if args.binary else exporter.FBX_FORMAT_ASCII,
+            "compress_arrays": not args.no_compress,
+            "workers": args.workers,
+            "use_processes": not args.threads,
+            "dedup": args.dedup,
+            "cache_dir": args.cache,
+            "scene": args.scene,
+            "texture_format": args.texture_format,
+            "texture_dedup": not args.no_texture_dedup,
+            "profile": args.profile,
+            "chunk_size": args.chunk_size,
+            "buffer_cache_bytes": args.buffer_cache << 20,
+            "marker": args.marker,
+            "instances": args.instances,
+            "instance_transform": args.instance_transform,
+            "vertex_source": args.vertex_source,
+            "semantic_map": args.semantic_map,
+        },
+    }
+
+    startDrawcallId, endDrawcallId = args.range
+    jobs = farm.make_jobs(args.captures, args.out, startDrawcallId, endDrawcallId, args.shard_size)
+    batch = farm.Farm(jobs, options, processes=args.jobs, retries=args.retries).run()
+
+    print(batch.summary())
+    return 1 if batch.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 timmyliang
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Benchmark of the exporter outside of RenderDoc:
+#
+#   python -m renderdoc2fbx.benchmark [scenario ...] [--workers 4] [--json out.json] [--baseline old.json]
+#   python -m renderdoc2fbx.benchmark.micro [benchmark ...]
+#
+# Importing this package puts stand-ins for the renderdoc and qrenderdoc modules
+# in their place, so it has to happen before the exporter is first imported and
+# can't be used from inside RenderDoc. The captures are synthetic and served by
+# replay.StubController, see scenarios.py for what is measured. micro.py times
+# single steps of the exporter against how they were done before.
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import sys
+
+from . import fake_renderdoc
+from . import fake_qrenderdoc
+
+if sys.modules.get("renderdoc", fake_renderdoc) is not fake_renderdoc:
+    raise ImportError("the benchmark replaces the renderdoc module, it can't run next to the real one")
+
+sys.modules["renderdoc"] = fake_renderdoc
+sys.modules["qrenderdoc"] = fake_qrenderdoc
@@ -0,0 +1,314 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 timmyliang
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Run the benchmark scenarios and report time, peak memory and replay calls:
+#
+#   python -m renderdoc2fbx.benchmark [scenario ...] [--scale 0.1] [--repeat 3] [--workers 4]
+#                                     [--latency 0.0005] [--latency SetFrameEvent=0.002]
+#                                     [--json results.json] [--baseline previous.json] [--speedup]
+#
+# Every scenario is exported repeat times for the best time, then once more
+# with tracemalloc on for the peak memory, which only sees this process. The
+# first export also samples how far the resident set size of the process grows,
+# which takes in what numpy and zlib allocate as well. Memory freed by earlier
+# scenarios is reused rather than grown into, so run one scenario at a time,
+# such as large_draw for a draw of a million vertices, to measure it exactly.
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import threading
+import argparse
+import tempfile
+import contextlib
+import tracemalloc
+from collections import OrderedDict
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from . import fake_qrenderdoc
+from .replay import StubController
+from .scenarios import SCENARIOS
+from .. import buffers
+from .. import exporter
+from .. import textures
+
+
+def parse_latency(text):
+    name, sep, seconds = text.rpartition("=")
+    try:
+        seconds = float(seconds)
+    except ValueError:
+        raise argparse.ArgumentTypeError("not a valid latency: " + text)
+    return (name if sep else "*"), seconds
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="renderdoc2fbx.benchmark", description="Benchmark the exporter on synthetic captures")
+    parser.add_argument("scenarios", nargs="*", metavar="scenario",
+                        help="scenarios to run, out of %s (default: all)" % ", ".join(SCENARIOS))
+    parser.add_argument("--scale", type=float, default=1.0, help="scale the vertex and draw counts of every scenario")
+    parser.add_argument("--repeat", type=int, default=1, help="export every scenario this many times and keep the best time")
+    parser.add_argument("--latency", type=parse_latency, action="append", default=[], metavar="[CALL=]SECONDS",
+                        help="time every replay call, or the named one, takes")
+    parser.add_argument("--binary", action="store_true", help="write binary FBX files instead of ascii")
+    parser.add_argument("--workers", type=int, default=0, help="decode and write drawcalls on this many workers")
+    parser.add_argument("--processes", action="store_true", help="use worker processes instead of threads")
+    parser.add_argument("--speedup", action="store_true",
+                        help="also export every scenario without workers and report how much faster the workers are")
+    parser.add_argument("--texture-workers", type=int, default=textures.DEFAULT_WORKERS, help="threads encoding textures")
+    parser.add_argument("--chunk-size", type=int, default=exporter.DEFAULT_CHUNK_SIZE, metavar="INDICES",
+                        help="export draws with more indices than this a chunk at a time, 0 to never chunk")
+    parser.add_argument("--buffer-cache", type=int, default=buffers.DEFAULT_MAX_BYTES >> 20, metavar="MB",
+                        help="keep up to this much buffer data read for one draw for the next ones, 0 to not keep any")
+    parser.add_argument("--no-memory", action="store_true", help="skip the run measuring peak memory")
+    parser.add_argument("--json", metavar="PATH", help="write the results to this file")
+    parser.add_argument("--baseline", metavar="PATH", help="compare with the results of an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="slow down or memory growth, relative to the baseline, reported as a regression")
+
+    args = parser.parse_args(argv)
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error("unknown scenario %s, choose from %s" % (name, ", ".join(SCENARIOS)))
+    return args
+
+
+def _folder_bytes(path):
+    total = 0
+    for dir_path, dir_names, file_names in os.walk(path):
+        for name in file_names:
+            total += os.path.getsize(os.path.join(dir_path, name))
+    return total
+
+
+# Resident set size of this process, from /proc on Linux and through psutil elsewhere if it is
+# installed. None where neither is there
+def current_rss():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (IOError, OSError, ValueError, AttributeError):
+        pass
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    return None
+
+
+# Samples the resident set size on a thread of its own while a run goes on. growth is how far above
+# the size at the start it got, peaks shorter than the interval may be missed
+class RssSampler:
+    INTERVAL = 0.002
+
+    def __init__(self):
+        self.start = None
+        self.peak = None
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def __enter__(self):
+        self.start = self.peak = current_rss()
+        if self.start is not None:
+            self.thread = threading.Thread(target=self._sample, daemon=True)
+            self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.thread is not None:
+            self.stopped.set()
+            self.thread.join()
+            self.peak = max(self.peak, current_rss())
+
+    def _sample(self):
+        while not self.stopped.wait(self.INTERVAL):
+            self.peak = max(self.peak, current_rss())
+
+    @property
+    def growth(self):
+        return None if self.start is None else self.peak - self.start
+
+
+# Export a capture once through export_wrap, the way the UI runs the exporter
+def run_once(scenario, capture, options, latency, trace_memory=False, sample_rss=False):
+    controller = StubController(capture, latency)
+    ctx = fake_qrenderdoc.CaptureContext(controller)
+    out = tempfile.mkdtemp(prefix="renderdoc2fbx_benchmark_")
+    finished = {}
+
+    def finished_callback(result, summary):
+        finished["result"] = result
+
+    rss = RssSampler() if sample_rss else None
+    try:
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        # The exporter prints every file it writes, which would drown the report
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), rss or contextlib.suppress():
+            exporter.export_wrap(ctx, None, None, scenario.is_save_texture, out, finished_callback, **options)
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+        output_bytes = _folder_bytes(out)
+        shutil.rmtree(out, ignore_errors=True)
+
+    return {
+        "seconds": seconds,
+        "peak_bytes": peak,
+        "rss_bytes": rss.growth if rss is not None else None,
+        "output_bytes": output_bytes,
+        "calls": OrderedDict(sorted(controller.calls.items())),
+        "bytes_read": OrderedDict(sorted(controller.bytes_read.items())),
+        "result": finished.get("result"),
+    }
+
+
+def run_scenario(scenario, args, options):
+    capture = scenario.build(args.scale)
+    latency = dict(args.latency)
+    options = dict(options, **scenario.options)
+
+    runs = [run_once(scenario, capture, options, latency, sample_rss=not args.no_memory and i == 0)
+            for i in range(max(1, args.repeat))]
+    best = min(run["seconds"] for run in runs)
+
+    record = OrderedDict([
+        ("description", scenario.description),
+        ("draws", len(capture.draws)),
+        ("seconds", round(best, 4)),
+        ("runs", [round(run["seconds"], 4) for run in runs]),
+        ("draws_per_second", round(len(capture.draws) / max(best, 1e-9), 1)),
+        ("peak_bytes", None),
+        ("rss_bytes", runs[0]["rss_bytes"]),
+        ("output_bytes", runs[0]["output_bytes"]),
+        ("calls", runs[0]["calls"]),
+        ("calls_per_draw", round(sum(runs[0]["calls"].values()) / max(len(capture.draws), 1), 2)),
+        ("bytes_read", runs[0]["bytes_read"]),
+        ("result", runs[0]["result"]),
+    ])
+    if args.speedup and options["workers"] > 0:
+        serial = dict(options, workers=0)
+        record["serial_seconds"] = round(min(run_once(scenario, capture, serial, latency)["seconds"]
+                                             for _ in range(max(1, args.repeat))), 4)
+        record["speedup"] = round(record["serial_seconds"] / max(best, 1e-9), 2)
+    if not args.no_memory:
+        record["peak_bytes"] = run_once(scenario, capture, options, latency, trace_memory=True)["peak_bytes"]
+    return record
+
+
+def _megabytes(n):
+    return "-" if n is None else "%.1f MB" % (n / (1 << 20))
+
+
+def print_record(name, record):
+    print("%s: %.3fs, %d draws (%.1f draws/s), peak %s, rss growth %s, output %s%s" % (
+        name, record["seconds"], record["draws"], record["draws_per_second"], _megabytes(record["peak_bytes"]),
+        _megabytes(record["rss_bytes"]), _megabytes(record["output_bytes"]),
+        ", failed: " + record["result"] if record["result"] else ""))
+    print("  calls: %s (%.2f per draw)" % (" ".join("%s=%d" % item for item in record["calls"].items()),
+                                            record["calls_per_draw"]))
+    if "speedup" in record:
+        print("  speedup: %.2fx over %.3fs without workers" % (record["speedup"], record["serial_seconds"]))
+
+
+# Print how every scenario compares to the baseline, returns whether any regressed
+def compare(results, baseline, threshold):
+    regressed = False
+    for name, record in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None:
+            continue
+
+        changes = []
+        for key, label in [("seconds", "time"), ("peak_bytes", "memory"), ("rss_bytes", "rss")]:
+            if record.get(key) is None or not previous.get(key):
+                continue
+            change = record[key] / previous[key] - 1.0
+            changes.append("%s %+.1f%%" % (label, change * 100.0))
+            if change > threshold:
+                changes[-1] += " REGRESSION"
+                regressed = True
+        for call, count in record["calls"].items():
+            if count != previous.get("calls", {}).get(call, 0):
+                changes.append("%s calls %d -> %d" % (call, previous.get("calls", {}).get(call, 0), count))
+
+        print("%s vs baseline: %s" % (name, ", ".join(changes) or "no change"))
+    return regressed
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    options = {
+        "fbx_format": exporter.FBX_FORMAT_BINARY if args.binary else exporter.FBX_FORMAT_ASCII,
+        "workers": args.workers,
+        "use_processes": args.processes,
+        "texture_workers": args.texture_workers,
+        "chunk_size": args.chunk_size,
+        "buffer_cache_bytes": args.buffer_cache << 20,
+    }
+
+    results = OrderedDict()
+    for name in args.scenarios or SCENARIOS:
+        results[name] = run_scenario(SCENARIOS[name], args, options)
+        print_record(name, results[name])
+
+    report = OrderedDict([
+        ("python", platform.python_version()),
+        ("numpy", exporter.np.__version__ if exporter.np is not None else None),
+        ("scale", args.scale),
+        ("latency", dict(args.latency)),
+        ("options", options),
+        ("results", results),
+    ])
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=4)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        # Only runs of the same scenarios with the same settings compare
+        settings = ["scale", "latency", "options"]
+        if any(baseline.get(key) != report[key] for key in settings):
+            print("baseline was run with other %s, not comparing" % "/".join(settings))
+        elif compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 timmyliang
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Stand-in for the qrenderdoc module of the RenderDoc UI. A CaptureContext that
+# runs replay callbacks and UI thread callbacks right away, on the calling
+# thread, so the exporter can be driven through export_wrap like from the UI.
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+
+class MiniQtHelper:
+    def InvokeOntoUIThread(self, callback):
+        callback()
+
+
+class ExtensionManager:
+    def __init__(self):
+        self.mqt = MiniQtHelper()
+
+    def GetMiniQtHelper(self):
+        return self.mqt
+
+
+class ReplayManager:
+    def __init__(self, controller):
+        self.controller = controller
+
+    def AsyncInvoke(self, tag, callback):
+        callback(self.controller)
+
+    def BlockInvoke(self, callback):
+        callback(self.controller)
+
+
+class CaptureContext:
+    def __init__(self, controller, capture_filename=""):
+        self.replay = ReplayManager(controller)
+        self.extensions = ExtensionManager()
+        self.capture_filename = capture_filename
+
+    def Replay(self):
+        return self.replay
+
+    def Extensions(self):
+        return self.extensions
+
+    def GetCaptureFilename(self):
+        return self.capture_filename
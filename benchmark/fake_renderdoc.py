@@ -0,0 +1,423 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 timmyliang
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Stand-in for the renderdoc python module, with just enough of its types and
+# enums for the exporter to run on the synthetic captures of the benchmark.
+# Enum values follow RenderDoc 1.12. There is no replay here, the controller
+# serving the data is replay.StubController.
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import enum
+
+
+class ResourceId:
+    _next = 0
+
+    def __init__(self, value=None):
+        if value is None:
+            ResourceId._next += 1
+            value = ResourceId._next
+        self.value = value
+
+    @staticmethod
+    def Null():
+        return ResourceId(0)
+
+    def __eq__(self, other):
+        return isinstance(other, ResourceId) and other.value == self.value
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.value)
+
+    def __int__(self):
+        return self.value
+
+    def __str__(self):
+        return "ResourceId::%d" % self.value
+
+    __repr__ = __str__
+
+
+class CompType(enum.IntEnum):
+    Typeless = 0
+    Float = 1
+    UNorm = 2
+    SNorm = 3
+    UInt = 4
+    SInt = 5
+    UScaled = 6
+    SScaled = 7
+    Depth = 8
+    UNormSRGB = 9
+
+
+class ResourceFormatType(enum.IntEnum):
+    Regular = 0
+    Undefined = 1
+    BC1 = 2
+    BC2 = 3
+    BC3 = 4
+    BC4 = 5
+    BC5 = 6
+    BC6 = 7
+    BC7 = 8
+    ETC2 = 9
+    EAC = 10
+    ASTC = 11
+    R10G10B10A2 = 12
+    R11G11B10 = 13
+    R5G6B5 = 14
+    R5G5B5A1 = 15
+    R9G9B9E5 = 16
+    R4G4B4A4 = 17
+    R4G4 = 18
+    D16S8 = 19
+    D24S8 = 20
+    D32S8 = 21
+    S8 = 22
+    YUV8 = 23
+    YUV10 = 24
+    YUV12 = 25
+    YUV16 = 26
+    PVRTC = 27
+    A8 = 28
+
+
+class DrawFlags(enum.IntFlag):
+    NoFlags = 0x0
+    Clear = 0x1
+    Drawcall = 0x2
+    Dispatch = 0x4
+    CmdList = 0x8
+    SetMarker = 0x10
+    PushMarker = 0x20
+    PopMarker = 0x40
+    Present = 0x80
+    MultiDraw = 0x100
+    Copy = 0x200
+    Resolve = 0x400
+    GenMips = 0x800
+    PassBoundary = 0x1000
+    Indexed = 0x10000
+    Instanced = 0x20000
+    Auto = 0x40000
+    Indirect = 0x80000
+
+
+class ShaderStage(enum.IntEnum):
+    Vertex = 0
+    Hull = 1
+    Domain = 2
+    Geometry = 3
+    Pixel = 4
+    Fragment = 4
+    Compute = 5
+
+
+class ResourceUsage(enum.IntEnum):
+    Unused = 0
+    VertexBuffer = 1
+    IndexBuffer = 2
+    VS_Constants = 3
+    StreamOut = 10
+    VS_Resource = 11
+    CS_RWResource = 26
+    All_RWResource = 27
+    ColorTarget = 29
+    DepthStencilTarget = 30
+    Clear = 32
+    GenMips = 33
+    Resolve = 34
+    ResolveDst = 36
+    Copy = 37
+    CopySrc = 38
+    CopyDst = 39
+    CPUWrite = 41
+    Discard = 42
+
+
+class ShaderBuiltin(enum.IntEnum):
+    Undefined = 0
+    Position = 1
+
+
+class MeshDataStage(enum.IntEnum):
+    Unknown = 0
+    VSIn = 1
+    VSOut = 2
+    GSOut = 3
+
+
+class VarType(enum.IntEnum):
+    Float = 0
+    Double = 1
+    Half = 2
+    SInt = 3
+    UInt = 4
+
+
+class Topology(enum.IntEnum):
+    Unknown = 0
+    PointList = 1
+    LineList = 2
+    LineStrip = 3
+    LineLoop = 4
+    TriangleList = 5
+    TriangleStrip = 6
+    TriangleFan = 7
+
+
+class AlphaMapping(enum.IntEnum):
+    Discard = 0
+    BlendToColor = 1
+    BlendToCheckerboard = 2
+    Preserve = 3
+
+
+class FileType(enum.IntEnum):
+    DDS = 0
+    PNG = 1
+    JPG = 2
+    BMP = 3
+    TGA = 4
+    HDR = 5
+    EXR = 6
+    Raw = 7
+
+
+class ResourceFormat:
+    def __init__(self, compType=CompType.Float, compCount=4, compByteWidth=4, type=ResourceFormatType.Regular,
+                 bgraOrder=False):
+        self.type = type
+        self.compType = compType
+        self.compCount = compCount
+        self.compByteWidth = compByteWidth
+        self.bgraOrder = bgraOrder
+
+    def Special(self):
+        return self.type != ResourceFormatType.Regular
+
+    def BGRAOrder(self):
+        return self.bgraOrder
+
+    def SetBGRAOrder(self, flag):
+        self.bgraOrder = flag
+
+    def Name(self):
+        if self.Special():
+            return self.type.name
+        return "%s%dx%d" % (self.compType.name, self.compCount, self.compByteWidth * 8)
+
+
+class MeshFormat:
+    def __init__(self):
+        self.indexResourceId = ResourceId.Null()
+        self.indexByteOffset = 0
+        self.indexByteStride = 0
+        self.baseVertex = 0
+        self.vertexResourceId = ResourceId.Null()
+        self.vertexByteOffset = 0
+        self.vertexByteStride = 0
+        self.format = ResourceFormat()
+        self.numIndices = 0
+        self.topology = Topology.TriangleList
+        self.allowRestart = False
+        self.restartIndex = 0xFFFFFFFF
+        self.instanced = False
+        self.instStepRate = 1
+
+
+class SigParameter:
+    def __init__(self, varName="", semanticName="", semanticIndex=0, compCount=4, compType=CompType.Float,
+                 systemValue=ShaderBuiltin.Undefined, regIndex=0):
+        self.varName = varName
+        self.semanticName = semanticName
+        self.semanticIndex = semanticIndex
+        self.semanticIdxName = semanticName + (str(semanticIndex) if semanticIndex else "")
+        self.compCount = compCount
+        self.compType = compType
+        self.systemValue = systemValue
+        self.regIndex = regIndex
+
+
+class ShaderReflection:
+    def __init__(self, outputSignature=(), inputSignature=()):
+        self.outputSignature = list(outputSignature)
+        self.inputSignature = list(inputSignature)
+
+
+class DrawcallDescription:
+    def __init__(self, drawcallId=0, eventId=0, name="", flags=DrawFlags.NoFlags, numIndices=0, numInstances=1,
+                 baseVertex=0, indexOffset=0, vertexOffset=0, instanceOffset=0, indexByteWidth=0, children=()):
+        self.drawcallId = drawcallId
+        self.eventId = eventId
+        self.name = name
+        self.flags = flags
+        self.numIndices = numIndices
+        self.numInstances = numInstances
+        self.baseVertex = baseVertex
+        self.indexOffset = indexOffset
+        self.vertexOffset = vertexOffset
+        self.instanceOffset = instanceOffset
+        self.indexByteWidth = indexByteWidth
+        self.children = list(children)
+
+
+class BoundVBuffer:
+    def __init__(self, resourceId=None, byteOffset=0, byteStride=0, byteSize=0):
+        self.resourceId = resourceId if resourceId is not None else ResourceId.Null()
+        self.byteOffset = byteOffset
+        self.byteStride = byteStride
+        self.byteSize = byteSize
+
+
+class VertexInputAttribute:
+    def __init__(self, name, vertexBuffer, byteOffset, format, perInstance=False, instanceRate=0, used=True):
+        self.name = name
+        self.vertexBuffer = vertexBuffer
+        self.byteOffset = byteOffset
+        self.format = format
+        self.perInstance = perInstance
+        self.instanceRate = instanceRate
+        self.genericEnabled = False
+        self.used = used
+
+
+class BoundResource:
+    def __init__(self, resourceId=None):
+        self.resourceId = resourceId if resourceId is not None else ResourceId.Null()
+
+
+class BoundResourceArray:
+    def __init__(self, resources):
+        self.resources = list(resources)
+
+
+class TextureDescription:
+    def __init__(self, resourceId, width, height, format, arraysize=1, mips=1, byteSize=0):
+        self.resourceId = resourceId
+        self.width = width
+        self.height = height
+        self.depth = 1
+        self.arraysize = arraysize
+        self.mips = mips
+        self.msSamp = 1
+        self.cubemap = False
+        self.dimension = 2
+        self.format = format
+        self.byteSize = byteSize
+
+
+class BufferDescription:
+    def __init__(self, resourceId, length):
+        self.resourceId = resourceId
+        self.length = length
+
+
+class EventUsage:
+    def __init__(self, eventId, usage):
+        self.eventId = eventId
+        self.usage = usage
+
+
+class ResourceDescription:
+    def __init__(self, resourceId, name):
+        self.resourceId = resourceId
+        self.name = name
+
+
+class Subresource:
+    def __init__(self, mip=0, slice=0, sample=0):
+        self.mip = mip
+        self.slice = slice
+        self.sample = sample
+
+
+class TextureSliceMapping:
+    def __init__(self):
+        self.sliceIndex = -1
+
+
+class TextureSave:
+    def __init__(self):
+        self.resourceId = ResourceId.Null()
+        self.alpha = AlphaMapping.Preserve
+        self.destType = FileType.DDS
+        self.mip = 0
+        self.slice = TextureSliceMapping()
+
+
+# The base of the stand-in controllers
+class ReplayController:
+    pass
+
+
+# The state of a draw as the stand-in controllers return it from GetPipelineState
+class PipeState:
+    def __init__(self, ibuffer, vbuffers, inputs, textures=(), restartEnabled=False, restartIndex=0xFFFFFFFF,
+                 topology=Topology.TriangleList):
+        self.ibuffer = ibuffer
+        self.vbuffers = list(vbuffers)
+        self.inputs = list(inputs)
+        self.textures = list(textures)
+        self.restartEnabled = restartEnabled
+        self.restartIndex = restartIndex
+        self.topology = topology
+        # stage -> ShaderReflection, of the stages with post-VS data
+        self.reflections = {}
+
+    def GetIBuffer(self):
+        return self.ibuffer
+
+    def GetVBuffers(self):
+        return self.vbuffers
+
+    def GetVertexInputs(self):
+        return self.inputs
+
+    def GetReadOnlyResources(self, stage, onlyUsed=False):
+        if stage != ShaderStage.Fragment:
+            return []
+        return [BoundResourceArray([BoundResource(resourceId)]) for resourceId in self.textures]
+
+    def GetShader(self, stage):
+        return ResourceId.Null()
+
+    def GetShaderReflection(self, stage):
+        return self.reflections.get(stage)
+
+    def IsRestartEnabled(self):
+        return self.restartEnabled
+
+    def GetRestartIndex(self):
+        return self.restartIndex
+
+    def GetPrimitiveTopology(self):
+        return self.topology
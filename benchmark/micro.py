@@ -0,0 +1,243 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+###############################################################################
+
+# Micro benchmarks of single steps of the exporter, each against the way it
+# was done before, on synthetic inputs of growing size:
+#
+#   python -m renderdoc2fbx.benchmark.micro [benchmark ...] [--repeat 3] [--json results.json]
+#
+# Every case is run repeat times for the best time. Unlike the scenarios of the
+# main benchmark, nothing is exported, so the step measured isn't drowned out.
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import contextlib
+from collections import defaultdict, OrderedDict
+
+import renderdoc as rd
+
+from .replay import StubController, SyntheticCapture, grid_indices, vertex_format
+from .. import exporter
+from .. import profiler
+
+
+# Best time of calling run repeat times
+def best_time(run, repeat):
+    best = None
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        run()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+# An exporter of a capture without any draws, which stops once it has indexed the textures and
+# resources of the capture
+def indexed_exporter(capture):
+    out = tempfile.mkdtemp(prefix="renderdoc2fbx_micro_")
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return exporter.Exporter(StubController(capture), None, None, False, out)
+    finally:
+        shutil.rmtree(out, ignore_errors=True)
+
+
+# How textures were found before they were indexed by id, scanning the whole list every time
+def scan_textures(textures, resid):
+    for t in textures:
+        if t.resourceId == resid:
+            return t
+    return None
+
+
+# Looking up the textures bound by the draws, as Exporter.get_tex does, against scanning the list
+# of every texture of the capture for each of them
+def texture_lookup(args):
+    records = []
+    rng = random.Random(0)
+    for count in args.sizes or [1000, 10000, 50000]:
+        capture = SyntheticCapture()
+        textures = [capture.textures[capture.add_texture("Texture%d" % i, 4, 4)] for i in range(count)]
+        exp = indexed_exporter(capture)
+        lookups = [rng.choice(textures).resourceId for _ in range(args.lookups)]
+
+        def scan():
+            for resid in lookups:
+                scan_textures(textures, resid)
+
+        def index():
+            for resid in lookups:
+                exp.get_tex(resid)
+
+        assert all(exp.get_tex(resid) is scan_textures(textures, resid) for resid in lookups[:100])
+        records.append(OrderedDict([
+            ("textures", count),
+            ("lookups", len(lookups)),
+            ("before_seconds", round(best_time(scan, args.repeat), 6)),
+            ("seconds", round(best_time(index, args.repeat), 6)),
+        ]))
+    return records
+
+
+# The snapshot of a draw of a side x side grid of float3 positions, as export_fbx takes
+def grid_snapshot(side):
+    capture = SyntheticCapture()
+    vb, stride, inputs = capture.add_vertex_buffer("vb", [("in_POSITION0", vertex_format(rd.CompType.Float, 3, 4))],
+                                                   side * side, side)
+    indices = grid_indices(side, side)
+    ib = capture.add_index_buffer("ib", indices, 4)
+    controller = StubController(capture)
+
+    mesh = exporter.MeshData()
+    mesh.indexResourceId = ib
+    mesh.indexByteStride = 4
+    mesh.numIndices = len(indices)
+    mesh.vertexResourceId = vb
+    mesh.vertexByteStride = stride
+    mesh.format = inputs[0].format
+    mesh.name = inputs[0].name
+
+    indices = exporter.getIndices(controller, mesh)
+    return exporter.DrawSnapshot("", indices, exporter.VertexFetcher(controller, [mesh], indices))
+
+
+# How the vertices were compacted before, walking the indices one at a time with membership tests,
+# from positions decoded into a list of tuples
+def compact_per_index(indices, positions, minIndex):
+    idx_list = []
+    vertex_data = OrderedDict()
+    idx2newIdx = defaultdict(list)
+    newIdx = 0
+    for idx in indices:
+        if idx not in idx2newIdx:
+            idx2newIdx[idx] = newIdx
+            newIdx = newIdx + 1
+        idx_list.append(idx2newIdx[idx])
+        if idx not in vertex_data:
+            vertex_data[idx] = positions[idx - minIndex]
+    return idx_list, [v for values in vertex_data.values() for v in values]
+
+
+# Compacting a draw to the vertices its indices reference, as the compact and gather stages of
+# build_mesh do, against the per index walk it replaced, which only runs up to --before-max indices
+def compaction(args):
+    records = []
+    for count in args.sizes or [1000, 10000, 100000, 1000000, 10000000]:
+        side = max(2, int((count / 6.0) ** 0.5) + 1)
+        snapshot = grid_snapshot(side)
+        indices = snapshot.indices
+        attr = snapshot.fetcher.attributes[0]
+        minIndex, maxIndex = exporter.indexBounds(indices)
+
+        stages = {}
+
+        def batched():
+            mesh, data = profiler.run_profiled(exporter.build_mesh, snapshot)
+            stages["compact"] = data["stages"]["compact"][0] + data["stages"]["gather"][0]
+            stages["mesh"] = mesh
+
+        total = best_time(batched, args.repeat)
+        record = OrderedDict([
+            ("indices", len(indices)),
+            ("vertices", side * side),
+            ("before_seconds", None),
+            ("seconds", round(stages["compact"], 6)),
+            ("build_mesh_seconds", round(total, 6)),
+        ])
+
+        if len(indices) <= args.before_max:
+            positions = [tuple(v) for v in snapshot.fetcher.decode(attr, minIndex, maxIndex - minIndex + 1)]
+            plain = [int(idx) for idx in indices]
+            result = []
+            record["before_seconds"] = round(best_time(
+                lambda: result.append(compact_per_index(plain, positions, minIndex)), args.repeat), 6)
+
+            mesh = stages["mesh"]
+            assert list(mesh.indices) == result[0][0] and list(mesh.vertices) == result[0][1]
+        records.append(record)
+    return records
+
+
+BENCHMARKS = OrderedDict([
+    ("texture_lookup", texture_lookup),
+    ("compaction", compaction),
+])
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="renderdoc2fbx.benchmark.micro",
+                                     description="Time single steps of the exporter against how they were done before")
+    parser.add_argument("benchmarks", nargs="*", metavar="benchmark",
+                        help="benchmarks to run, out of %s (default: all)" % ", ".join(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=3, help="run every case this many times and keep the best time")
+    parser.add_argument("--sizes", type=int, nargs="+", metavar="N", help="run the cases of these sizes instead")
+    parser.add_argument("--lookups", type=int, default=1000, help="textures looked up by texture_lookup")
+    parser.add_argument("--before-max", type=int, default=10000000, metavar="INDICES",
+                        help="largest draw compaction also compacts the way it was done before")
+    parser.add_argument("--json", metavar="PATH", help="write the results to this file")
+
+    args = parser.parse_args(argv)
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error("unknown benchmark %s, choose from %s" % (name, ", ".join(BENCHMARKS)))
+    return args
+
+
+def print_record(name, record):
+    case = ", ".join("%s %s" % (value, key) for key, value in record.items() if not key.endswith("seconds"))
+    line = "%s: %s: %.6fs" % (name, case, record["seconds"])
+    if record.get("before_seconds") is not None:
+        speedup = record["before_seconds"] / max(record["seconds"], 1e-9)
+        line += ", before %.6fs (%.1fx)" % (record["before_seconds"], speedup)
+    print(line)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    results = OrderedDict()
+    for name in args.benchmarks or BENCHMARKS:
+        results[name] = BENCHMARKS[name](args)
+        for record in results[name]:
+            print_record(name, record)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,333 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 timmyliang
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Synthetic captures and the controller replaying them. A SyntheticCapture
+# holds drawcalls, buffers, textures and the pipeline state of every draw, all
+# generated up front so building them isn't part of what is measured. The
+# StubController serves them through the ReplayController calls the exporter
+# makes, counting every call and optionally sleeping in them to stand in for
+# the time a real replay takes.
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import sys
+import math
+import time
+import array
+import random
+import struct
+from collections import Counter
+
+import renderdoc as rd
+
+# array typecodes of the integer component types, by byte width
+_UNSIGNED_TYPECODES = {1: "B", 2: "H", 4: "I"}
+_SIGNED_TYPECODES = {1: "b", 2: "h", 4: "i"}
+
+# Bytes of one 4x4 block of the block compressed formats
+_BLOCK_BYTES = {rd.ResourceFormatType.BC1: 8, rd.ResourceFormatType.BC4: 8}
+
+# Synthetic pixels repeat with this period, so they compress about as well as real textures
+_PIXEL_PERIOD = 4096
+
+
+def vertex_format(compType, compCount, compByteWidth, bgraOrder=False):
+    return rd.ResourceFormat(compType, compCount, compByteWidth, bgraOrder=bgraOrder)
+
+
+def texture_format(compType=rd.CompType.UNorm, bgraOrder=False, type=rd.ResourceFormatType.Regular):
+    return rd.ResourceFormat(compType, 4, 1, type=type, bgraOrder=bgraOrder)
+
+
+def _to_bytes(typecode, values):
+    data = array.array(typecode, values)
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data.tobytes()
+
+
+# Pack a flat list of values in [-1, 1] (or [0, 1] for unsigned types, positions may be larger) in a format
+def pack_values(fmt, values):
+    if fmt.compType == rd.CompType.Float:
+        if fmt.compByteWidth == 2:
+            return struct.pack("<%de" % len(values), *values)
+        return _to_bytes("f" if fmt.compByteWidth == 4 else "d", values)
+
+    bits = fmt.compByteWidth * 8
+    if fmt.compType in (rd.CompType.SNorm, rd.CompType.SInt, rd.CompType.SScaled):
+        scale = (1 << (bits - 1)) - 1
+        return _to_bytes(_SIGNED_TYPECODES[fmt.compByteWidth],
+                         [int(round(max(-1.0, min(1.0, v)) * scale)) for v in values])
+
+    scale = (1 << bits) - 1
+    return _to_bytes(_UNSIGNED_TYPECODES[fmt.compByteWidth],
+                     [int(round(max(0.0, min(1.0, v)) * scale)) for v in values])
+
+
+# Values of an attribute for every vertex of a grid of the given width, picked by the semantic in its name
+def attribute_values(name, count, compCount, width, seed=0):
+    height = max(1, -(-count // width))
+    name = name.upper()
+
+    if "POSITION" in name:
+        def vertex(i):
+            x, z = i % width, i // width
+            return (x - width * 0.5, math.sin((x + seed) * 0.3) * math.cos(z * 0.3), z - height * 0.5, 1.0)
+    elif "NORMAL" in name:
+        def vertex(i):
+            nx = math.sin((i % width + seed) * 0.3) * 0.3
+            return (nx, math.sqrt(1.0 - nx * nx), 0.0, 0.0)
+    elif "TANGENT" in name:
+        def vertex(i):
+            tx = math.cos((i % width + seed) * 0.3)
+            return (tx, math.sqrt(max(0.0, 1.0 - tx * tx)), 0.0, 1.0)
+    elif "COLOR" in name:
+        def vertex(i):
+            return ((i % 251) / 250.0, (i % 127) / 126.0, ((i + seed) % 63) / 62.0, 1.0)
+    else:
+        def vertex(i):
+            return ((i % width) / float(width), (i // width) / float(height), 0.0, 1.0)
+
+    return [v for i in range(count) for v in vertex(i)[:compCount]]
+
+
+# Indices of the triangles of a grid of vertices, two per quad
+def grid_indices(width, height):
+    indices = []
+    for z in range(height - 1):
+        for x in range(width - 1):
+            i = z * width + x
+            indices += (i, i + width, i + 1, i + 1, i + width, i + width + 1)
+    return indices
+
+
+class SyntheticCapture:
+    def __init__(self):
+        self.roots = []
+        self.draws = []
+        self.states = {}
+        self.buffers = {}
+        self.textures = {}
+        # resourceId -> resourceId of the texture whose pixels a copy of it holds
+        self.texture_copies = {}
+        self.resources = []
+        self.eventId = 0
+        # (eventId, MeshDataStage) -> MeshFormat of the shader output of a draw
+        self.post_vs = {}
+        # resourceId -> [(eventId, data)] of the buffers written during the frame, and the EventUsage of them
+        self.buffer_writes = {}
+        self.usage = {}
+
+    def add_buffer(self, name, data):
+        resourceId = rd.ResourceId()
+        self.buffers[resourceId] = bytes(data)
+        self.resources.append(rd.ResourceDescription(resourceId, name))
+        return resourceId
+
+    # Overwrite a buffer with an event of its own, the draws after it see the new data
+    def write_buffer(self, resourceId, data):
+        self.eventId += 1
+        self.buffer_writes.setdefault(resourceId, []).append((self.eventId, bytes(data)))
+        self.usage.setdefault(resourceId, []).append(rd.EventUsage(self.eventId, rd.ResourceUsage.CopyDst))
+
+    # A texture of its own pixels, or of the pixels of copy_of, which must have the same size and format
+    def add_texture(self, name, width, height, fmt=None, arraysize=1, copy_of=None):
+        fmt = fmt or texture_format()
+        if fmt.type in _BLOCK_BYTES:
+            sliceSize = (width // 4) * (height // 4) * _BLOCK_BYTES[fmt.type]
+        else:
+            sliceSize = width * height * fmt.compCount * fmt.compByteWidth
+
+        resourceId = rd.ResourceId()
+        self.textures[resourceId] = rd.TextureDescription(resourceId, width, height, fmt, arraysize,
+                                                           byteSize=sliceSize * arraysize)
+        if copy_of is not None:
+            self.texture_copies[resourceId] = copy_of
+        self.resources.append(rd.ResourceDescription(resourceId, name))
+        return resourceId
+
+    # An interleaved vertex buffer of a grid of vertices, returns its id, stride and vertex inputs.
+    # layout is a list of (attribute name, format), attributes are 4 byte aligned
+    def add_vertex_buffer(self, name, layout, count, width, seed=0, vertexBuffer=0):
+        offsets = []
+        stride = 0
+        for attr, fmt in layout:
+            offsets.append(stride)
+            stride += -(-fmt.compByteWidth * fmt.compCount // 4) * 4
+
+        data = bytearray(stride * count)
+        inputs = []
+        for (attr, fmt), offset in zip(layout, offsets):
+            column = pack_values(fmt, attribute_values(attr, count, fmt.compCount, width, seed))
+            size = fmt.compByteWidth * fmt.compCount
+            # Scatter the packed column into its place in every vertex, a byte lane at a time
+            for b in range(size):
+                data[offset + b::stride] = column[b::size]
+            inputs.append(rd.VertexInputAttribute(attr, vertexBuffer, offset, fmt))
+
+        return self.add_buffer(name, data), stride, inputs
+
+    def add_index_buffer(self, name, indices, indexByteWidth):
+        return self.add_buffer(name, _to_bytes(_UNSIGNED_TYPECODES[indexByteWidth], indices))
+
+    # Add an indexed draw, under a marker named parent if given
+    def add_draw(self, state, numIndices, indexByteWidth, baseVertex=0, indexOffset=0, parent=None):
+        self.eventId += 1
+        draw = rd.DrawcallDescription(len(self.draws) + 1, self.eventId, "DrawIndexed(%d)" % numIndices,
+                                      rd.DrawFlags.Drawcall | rd.DrawFlags.Indexed, numIndices,
+                                      baseVertex=baseVertex, indexOffset=indexOffset, indexByteWidth=indexByteWidth)
+        self.states[draw.eventId] = state
+        self.draws.append(draw)
+
+        if parent is None:
+            self.roots.append(draw)
+        else:
+            if not self.roots or self.roots[-1].name != parent:
+                self.eventId += 1
+                self.roots.append(rd.DrawcallDescription(0, self.eventId, parent, rd.DrawFlags.PushMarker))
+            self.roots[-1].children.append(draw)
+        return draw
+
+    # Give a draw the output of a vertex or geometry shader, a float4 position followed by the other
+    # attributes of layout as floats, tightly packed the way the replay lays them out. The positions are
+    # those of the inputs displaced, as if skinned. Indices are shared with the draw
+    def add_post_vs(self, draw, stage, layout, count, width, seed=0):
+        outputs = [("in_POSITION0", vertex_format(rd.CompType.Float, 4, 4))]
+        outputs += [(attr, vertex_format(rd.CompType.Float, fmt.compCount, 4)) for attr, fmt in layout
+                    if attr != "in_POSITION0"]
+
+        state = self.states[draw.eventId]
+        name = "%s_%s" % (draw.name, stage.name)
+        vb, stride, inputs = self.add_vertex_buffer(name, outputs, count, width, seed + 1)
+
+        signature = [rd.SigParameter("gl_Position", compCount=4, systemValue=rd.ShaderBuiltin.Position)]
+        for attr, fmt in outputs[1:]:
+            semantic = attr[len("in_"):].rstrip("0123456789")
+            index = int(attr[len("in_") + len(semantic):] or 0)
+            signature.append(rd.SigParameter("vs_" + attr[len("in_"):], semantic, index, fmt.compCount))
+
+        shader = rd.ShaderStage.Geometry if stage == rd.MeshDataStage.GSOut else rd.ShaderStage.Vertex
+        state.reflections[shader] = rd.ShaderReflection(signature)
+
+        postvs = rd.MeshFormat()
+        postvs.indexResourceId = state.ibuffer.resourceId
+        postvs.indexByteOffset = state.ibuffer.byteOffset + draw.indexOffset * draw.indexByteWidth
+        postvs.indexByteStride = draw.indexByteWidth
+        postvs.baseVertex = draw.baseVertex
+        postvs.vertexResourceId = vb
+        postvs.vertexByteStride = stride
+        postvs.format = outputs[0][1]
+        postvs.numIndices = draw.numIndices
+        self.post_vs[(draw.eventId, stage)] = postvs
+        return postvs
+
+    # Bytes of pixels the capture serves
+    def texture_bytes(self):
+        return sum(texture.byteSize for texture in self.textures.values())
+
+
+class StubController(rd.ReplayController):
+    # latency maps the name of a call to the seconds it takes, "*" applying to any other call
+    def __init__(self, capture, latency=None):
+        self.capture = capture
+        self.latency = latency or {}
+        self.calls = Counter()
+        self.bytes_read = Counter()
+        self.eventId = None
+
+    def _call(self, name):
+        self.calls[name] += 1
+        seconds = self.latency.get(name, self.latency.get("*", 0.0))
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def GetDrawcalls(self):
+        self._call("GetDrawcalls")
+        return self.capture.roots
+
+    def GetTextures(self):
+        self._call("GetTextures")
+        return list(self.capture.textures.values())
+
+    def GetResources(self):
+        self._call("GetResources")
+        return self.capture.resources
+
+    def SetFrameEvent(self, eventId, force):
+        self._call("SetFrameEvent")
+        self.eventId = eventId
+
+    def GetPipelineState(self):
+        self._call("GetPipelineState")
+        return self.capture.states.get(self.eventId)
+
+    def GetBuffers(self):
+        self._call("GetBuffers")
+        return [rd.BufferDescription(resourceId, len(data)) for resourceId, data in self.capture.buffers.items()]
+
+    def GetBufferData(self, resourceId, offset, length):
+        self._call("GetBufferData")
+        data = self.capture.buffers.get(resourceId, b"")
+        for eventId, written in self.capture.buffer_writes.get(resourceId, []):
+            if self.eventId is not None and eventId <= self.eventId:
+                data = written
+        data = data[offset:offset + length] if length > 0 else data[offset:]
+        self.bytes_read["GetBufferData"] += len(data)
+        return data
+
+    def GetPostVSData(self, instance, view, stage):
+        self._call("GetPostVSData")
+        return self.capture.post_vs.get((self.eventId, stage), rd.MeshFormat())
+
+    def GetTextureData(self, resourceId, sub):
+        self._call("GetTextureData")
+        texture = self.capture.textures.get(resourceId)
+        if texture is None:
+            return b""
+
+        size = texture.byteSize // texture.arraysize
+        source = self.capture.texture_copies.get(resourceId, resourceId)
+        rng = random.Random(int(source) * 4099 + sub.slice)
+        block = rng.getrandbits(8 * _PIXEL_PERIOD).to_bytes(_PIXEL_PERIOD, "little")
+        data = (block * (size // _PIXEL_PERIOD + 1))[:size]
+        self.bytes_read["GetTextureData"] += len(data)
+        return data
+
+    def SaveTexture(self, texsave, path):
+        self._call("SaveTexture")
+        texture = self.capture.textures.get(texsave.resourceId)
+        if texture is None:
+            return False
+        with open(path, "wb") as f:
+            f.write(bytes(texture.byteSize // texture.arraysize))
+        return True
+
+    def GetUsage(self, resourceId):
+        self._call("GetUsage")
+        return list(self.capture.usage.get(resourceId, []))
+
+    def Shutdown(self):
+        pass
@@ -0,0 +1,154 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 timmyliang
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# The synthetic captures the benchmark exports. Each stresses a different part
+# of the exporter: decoding one huge draw, the per draw overhead of many small
+# ones, saving textures, decoding formats other than 32 bit floats, and reading
+# back what a vertex shader output. scale
+# shrinks or grows every scenario, vertex and draw counts linearly.
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import math
+from collections import OrderedDict
+
+import renderdoc as rd
+
+from .replay import SyntheticCapture, grid_indices, texture_format, vertex_format
+from .. import exporter
+
+FLOAT_LAYOUT = [
+    ("in_POSITION0", vertex_format(rd.CompType.Float, 3, 4)),
+    ("in_NORMAL0", vertex_format(rd.CompType.Float, 3, 4)),
+    ("in_TANGENT0", vertex_format(rd.CompType.Float, 4, 4)),
+    ("in_COLOR0", vertex_format(rd.CompType.UNorm, 4, 1, bgraOrder=True)),
+    ("in_TEXCOORD0", vertex_format(rd.CompType.Float, 2, 4)),
+]
+
+# Compressed vertex formats as used by engines to save bandwidth
+PACKED_LAYOUT = [
+    ("in_POSITION0", vertex_format(rd.CompType.Float, 4, 2)),
+    ("in_NORMAL0", vertex_format(rd.CompType.SNorm, 4, 1)),
+    ("in_TANGENT0", vertex_format(rd.CompType.SNorm, 4, 2)),
+    ("in_COLOR0", vertex_format(rd.CompType.UNorm, 4, 1)),
+    ("in_TEXCOORD0", vertex_format(rd.CompType.Float, 2, 2)),
+    ("in_TEXCOORD1", vertex_format(rd.CompType.UNorm, 2, 2)),
+]
+
+
+class Scenario:
+    # build(scale) returns the SyntheticCapture to export, options are exporter options the scenario needs
+    def __init__(self, name, description, build, is_save_texture=False, options=None):
+        self.name = name
+        self.description = description
+        self.build = build
+        self.is_save_texture = is_save_texture
+        self.options = options or {}
+
+
+def _scaled(count, scale, minimum=1):
+    return max(minimum, int(round(count * scale)))
+
+
+# Add one draw of a width x height grid with buffers of its own
+def _grid_draw(capture, name, layout, width, height, indexByteWidth, textures=(), parent=None, seed=0):
+    vb, stride, inputs = capture.add_vertex_buffer(name + "_vb", layout, width * height, width, seed)
+    indices = grid_indices(width, height)
+    ib = capture.add_index_buffer(name + "_ib", indices, indexByteWidth)
+
+    state = rd.PipeState(rd.BoundVBuffer(ib, 0, indexByteWidth), [rd.BoundVBuffer(vb, 0, stride)], inputs, textures)
+    return capture.add_draw(state, len(indices), indexByteWidth, parent=parent)
+
+
+def large_draw(scale):
+    capture = SyntheticCapture()
+    side = _scaled(1000, math.sqrt(scale), 2)
+    _grid_draw(capture, "Terrain", FLOAT_LAYOUT, side, side, 4)
+    return capture
+
+
+# Small draws sharing one vertex and one index buffer, as batched engines do
+def many_small_draws(scale):
+    capture = SyntheticCapture()
+    draws = _scaled(5000, scale)
+    side = 8
+
+    vb, stride, inputs = capture.add_vertex_buffer("Props_vb", FLOAT_LAYOUT, draws * side * side, side)
+    pattern = grid_indices(side, side)
+    ib = capture.add_index_buffer("Props_ib", pattern * draws, 2)
+
+    state = rd.PipeState(rd.BoundVBuffer(ib, 0, 2), [rd.BoundVBuffer(vb, 0, stride)], inputs)
+    for i in range(draws):
+        capture.add_draw(state, len(pattern), 2, baseVertex=i * side * side, indexOffset=i * len(pattern),
+                         parent="Pass %d" % (i // 500))
+    return capture
+
+
+# Draws binding four large textures each, overlapping with the next draw. Some textures are
+# block compressed and left to SaveTexture, some are BGRA, some are arrays
+def heavy_textures(scale):
+    capture = SyntheticCapture()
+    draws = _scaled(48, scale)
+    side = max(4, int(1024 * math.sqrt(scale)) // 4 * 4)
+
+    textures = []
+    for i in range(draws * 2 + 2):
+        if i % 8 == 0:
+            fmt = texture_format(type=rd.ResourceFormatType.BC1)
+        else:
+            fmt = texture_format(bgraOrder=i % 4 == 1)
+        textures.append(capture.add_texture("Texture%d" % i, side, side, fmt, 4 if i % 6 == 2 else 1))
+
+    for i in range(draws):
+        _grid_draw(capture, "Mesh%d" % i, FLOAT_LAYOUT, 16, 16, 2, textures[i * 2:i * 2 + 4], "Opaque", seed=i)
+    return capture
+
+
+def packed_formats(scale):
+    capture = SyntheticCapture()
+    side = _scaled(500, math.sqrt(scale), 2)
+    for i in range(2):
+        _grid_draw(capture, "Character%d" % i, PACKED_LAYOUT, side, side, 4, seed=i)
+    return capture
+
+
+# A draw exported from what its vertex shader output rather than its inputs
+def skinned_draw(scale):
+    capture = SyntheticCapture()
+    side = _scaled(500, math.sqrt(scale), 2)
+    draw = _grid_draw(capture, "Skinned", FLOAT_LAYOUT, side, side, 4)
+    capture.add_post_vs(draw, rd.MeshDataStage.VSOut, FLOAT_LAYOUT, side * side, side)
+    return capture
+
+
+SCENARIOS = OrderedDict((scenario.name, scenario) for scenario in [
+    Scenario("large_draw", "one draw of 1M vertices in float formats", large_draw),
+    Scenario("many_small_draws", "5000 draws of 64 vertices from shared buffers", many_small_draws),
+    Scenario("heavy_textures", "48 small draws with 4 1024x1024 textures each", heavy_textures, is_save_texture=True),
+    Scenario("packed_formats", "two draws of 250k vertices in half and SNorm formats", packed_formats),
+    Scenario("skinned_draw", "one draw of 250k vertices exported from its vertex shader output", skinned_draw,
+             options={"vertex_source": exporter.VERTEX_SOURCE_VSOUT}),
+])
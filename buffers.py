@@ -0,0 +1,158 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+###############################################################################
+
+# Buffer contents read from the replay, kept across draws. The draws of a capture
+# mostly read a few shared vertex and index buffers, each at offsets of its own,
+# so once a buffer is read for a second time it is fetched whole and the draws
+# after that are served from memory. GetBufferData returns a buffer as it is at
+# the current event, so a kept buffer is only reused up to the next event that
+# writes it, as GetUsage tells. Buffers the capture doesn't list, such as the
+# ones the replay writes post-VS data to, are never kept.
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import bisect
+from collections import Counter, OrderedDict
+
+import renderdoc as rd
+
+DEFAULT_MAX_BYTES = 256 << 20
+
+# Buffers bigger than this share of the cache are always read a range at a time
+_MAX_SHARE = 4
+
+# Usages that change the contents of a buffer, the ones a replay doesn't have are skipped
+WRITE_USAGES = [
+    "StreamOut", "CS_RWResource", "All_RWResource", "VS_RWResource", "HS_RWResource", "DS_RWResource",
+    "GS_RWResource", "PS_RWResource", "ColorTarget", "DepthStencilTarget", "Clear", "Discard", "GenMips",
+    "Resolve", "ResolveDst", "Copy", "CopyDst", "CPUWrite",
+]
+
+
+class BufferCache:
+    def __init__(self, controller, max_bytes=DEFAULT_MAX_BYTES):
+        self.controller = controller
+        self.max_bytes = max_bytes
+        self.eventId = 0
+
+        # resourceId -> length of every buffer of the capture, listed the first time one is read
+        self.sizes = None
+        self.reads = Counter()
+
+        # resourceId -> (eventId it was read at, contents), least recently used first
+        self.blobs = OrderedDict()
+        self.bytes = 0
+
+        # resourceId -> the sorted events writing to the buffer
+        self.writes = {}
+        self.write_usages = set(getattr(rd.ResourceUsage, name) for name in WRITE_USAGES
+                                if hasattr(rd.ResourceUsage, name))
+
+        self.requests = 0
+        self.served = 0
+        self.fetched = 0
+        self.invalidated = 0
+
+    def set_event(self, eventId):
+        self.eventId = eventId
+
+    # The same as the replay's GetBufferData, a length of 0 reading up to the end of the buffer
+    def GetBufferData(self, resourceId, offset, length):
+        self.requests += 1
+        self.reads[resourceId] += 1
+
+        data = self._cached(resourceId)
+        if data is not None:
+            self.served += 1
+        elif self._keep(resourceId):
+            data = self._read(resourceId, 0, 0)
+            self._store(resourceId, data)
+        else:
+            return self._read(resourceId, offset, length)
+
+        return data[offset:offset + length] if length > 0 else data[offset:]
+
+    def _read(self, resourceId, offset, length):
+        self.fetched += 1
+        return self.controller.GetBufferData(resourceId, offset, length)
+
+    # Whether a buffer not kept yet should be, once it is read again
+    def _keep(self, resourceId):
+        if self.max_bytes <= 0 or self.reads[resourceId] < 2:
+            return False
+        if self.sizes is None:
+            self.sizes = dict((buf.resourceId, buf.length) for buf in self.controller.GetBuffers())
+        size = self.sizes.get(resourceId)
+        return size is not None and 0 < size <= self.max_bytes // _MAX_SHARE
+
+    def _cached(self, resourceId):
+        entry = self.blobs.get(resourceId)
+        if entry is None:
+            return None
+
+        eventId, data = entry
+        if self._written(resourceId, min(eventId, self.eventId), max(eventId, self.eventId)):
+            self.invalidated += 1
+            del self.blobs[resourceId]
+            self.bytes -= len(data)
+            return None
+
+        self.blobs.move_to_end(resourceId)
+        return data
+
+    # The last event up to the current one writing the buffer, or 0. Draws reading a buffer at the
+    # same version read the same contents
+    def version(self, resourceId):
+        writes = self._writes(resourceId)
+        i = bisect.bisect_right(writes, self.eventId)
+        return writes[i - 1] if i > 0 else 0
+
+    # The sorted events writing to the buffer
+    def _writes(self, resourceId):
+        writes = self.writes.get(resourceId)
+        if writes is None:
+            usage = self.controller.GetUsage(resourceId)
+            writes = self.writes[resourceId] = sorted(set(u.eventId for u in usage if u.usage in self.write_usages))
+        return writes
+
+    # Whether the buffer is written by an event after first, up to and including last
+    def _written(self, resourceId, first, last):
+        if first == last:
+            return False
+        writes = self._writes(resourceId)
+        i = bisect.bisect_right(writes, first)
+        return i < len(writes) and writes[i] <= last
+
+    def _store(self, resourceId, data):
+        self._writes(resourceId)
+        while self.blobs and self.bytes + len(data) > self.max_bytes:
+            self.bytes -= len(self.blobs.popitem(last=False)[1][1])
+        self.blobs[resourceId] = (self.eventId, data)
+        self.bytes += len(data)
+
+    def summary(self):
+        return "buffer cache: %d of %d reads served from memory, %d buffers kept (%.1f MB), %d invalidated by writes" % (
+            self.served, self.requests, len(self.blobs), self.bytes / (1 << 20), self.invalidated)
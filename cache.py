@@ -0,0 +1,236 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+###############################################################################
+
+# Persistent on-disk cache of decoded draws. Entries are keyed by the capture
+# file, the draw and the options that affect decoding, so exporting the same
+# capture again can skip the replay (SetFrameEvent, GetBufferData) and the
+# decode entirely and only write the files.
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os
+import sys
+import array
+import struct
+import hashlib
+
+# Bump whenever the decoded mesh layout or the entry format changes
+CACHE_VERSION = 4
+
+DEFAULT_MAX_BYTES = 2 << 30
+
+_MAGIC = b"RD2FBXC\x00"
+_ENTRY_EXT = ".mesh"
+
+# The capture is sampled in this many blocks of this size rather than hashed in full
+_SAMPLE_BLOCKS = 16
+_SAMPLE_SIZE = 1 << 20
+
+
+# Identify a capture file by its size, modification time and a sample of its content, spread over the
+# whole file. The sample alone would miss a capture saved again with changes in between the blocks
+def hash_capture(path):
+    h = hashlib.blake2b(digest_size=16)
+    stat = os.stat(path)
+    size = stat.st_size
+    h.update(struct.pack("<QQ", size, stat.st_mtime_ns))
+
+    with open(path, "rb") as f:
+        if size <= _SAMPLE_BLOCKS * _SAMPLE_SIZE:
+            h.update(f.read())
+        else:
+            step = (size - _SAMPLE_SIZE) // (_SAMPLE_BLOCKS - 1)
+            for block in range(_SAMPLE_BLOCKS):
+                f.seek(block * step)
+                h.update(f.read(_SAMPLE_SIZE))
+
+    return h.hexdigest()
+
+
+def _write_array(f, typecode, values):
+    f.write(struct.pack("<Q", len(values)))
+
+    # numpy arrays convert directly, anything else goes through array.array
+    if hasattr(values, "astype"):
+        f.write(values.astype("<" + typecode).tobytes())
+        return
+
+    values = array.array(typecode, values)
+    if sys.byteorder != "little":
+        values.byteswap()
+    f.write(values.tobytes())
+
+
+# end is the size of the file, a count running past it is a damaged entry rather than something to read
+def _read_array(f, typecode, end):
+    count = struct.unpack("<Q", f.read(8))[0]
+    values = array.array(typecode)
+    if count * values.itemsize > end - f.tell():
+        raise ValueError("truncated cache entry")
+    values.frombytes(f.read(count * values.itemsize))
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+# Raise ValueError unless the arrays read fit together as the layers of a triangle mesh
+def _check_mesh(mesh):
+    polygon_vertices = len(mesh.indices)
+    vertices = len(mesh.vertices) // 3
+    if polygon_vertices % 3 or len(mesh.vertices) % 3:
+        raise ValueError("not a triangle mesh")
+    if len(mesh.normals) not in (0, polygon_vertices * 3):
+        raise ValueError("normals don't match the indices")
+    if len(mesh.tangents) and len(mesh.tangents) not in (polygon_vertices * 3, polygon_vertices * 4):
+        raise ValueError("tangents don't match the indices")
+    for index, colors in mesh.colors.items():
+        if len(colors) != polygon_vertices * mesh.color_components[index]:
+            raise ValueError("colors don't match the indices")
+    for uvs in mesh.uvs.values():
+        if len(uvs) and (vertices == 0 or len(uvs) % vertices):
+            raise ValueError("uvs don't match the vertices")
+
+
+class ExportCache:
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+
+    # Key for one draw of a capture, options is a dict of everything that changes how the draw is decoded
+    def key(self, capture_hash, eventId, drawcallId, options):
+        text = repr((CACHE_VERSION, capture_hash, eventId, drawcallId, sorted(options.items())))
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, key + _ENTRY_EXT)
+
+    # Fill the given FbxMesh from the cache, returning the content digest of the draw or None on a miss.
+    # An entry that is cut short or damaged is a miss, the mesh is then left partly filled
+    def load(self, key, mesh):
+        path = self._entry_path(key)
+        try:
+            with open(path, "rb") as f:
+                end = os.fstat(f.fileno()).st_size
+                if f.read(len(_MAGIC)) != _MAGIC:
+                    raise IOError("not a cache entry")
+
+                digest_len = struct.unpack("<B", f.read(1))[0]
+                digest = f.read(digest_len).decode("ascii")
+                color_sets, uv_sets = struct.unpack("<BB", f.read(2))
+
+                mesh.indices = _read_array(f, "i", end)
+                mesh.vertices = _read_array(f, "d", end)
+                mesh.normals = _read_array(f, "d", end)
+                mesh.tangents = _read_array(f, "d", end)
+                for i in range(color_sets):
+                    index, mesh.color_components[index] = struct.unpack("<BB", f.read(2))
+                    mesh.colors[index] = _read_array(f, "d", end)
+                for i in range(uv_sets):
+                    index = struct.unpack("<B", f.read(1))[0]
+                    mesh.uvs[index] = _read_array(f, "d", end)
+
+                if f.tell() != end or len(mesh.colors) != color_sets or len(mesh.uvs) != uv_sets:
+                    raise ValueError("not the entry its header describes")
+                _check_mesh(mesh)
+        # UnicodeDecodeError, of a damaged digest, is a ValueError too
+        except (IOError, OSError, ValueError, struct.error):
+            self.misses += 1
+            return None
+
+        # Mark the entry as recently used for eviction
+        os.utime(path, None)
+
+        self.hits += 1
+        return digest
+
+    def store(self, key, mesh, digest):
+        path = self._entry_path(key)
+
+        # Write to a temporary file first so a concurrent or interrupted export never sees half an entry
+        temp_path = "%s.%d.tmp" % (path, os.getpid())
+        with open(temp_path, "wb") as f:
+            f.write(_MAGIC)
+            digest = digest.encode("ascii")
+            f.write(struct.pack("<B", len(digest)))
+            f.write(digest)
+            f.write(struct.pack("<BB", len(mesh.colors), len(mesh.uvs)))
+
+            _write_array(f, "i", mesh.indices)
+            _write_array(f, "d", mesh.vertices)
+            _write_array(f, "d", mesh.normals)
+            _write_array(f, "d", mesh.tangents)
+            for index, colors in mesh.colors.items():
+                f.write(struct.pack("<BB", index, mesh.color_components[index]))
+                _write_array(f, "d", colors)
+            for index, uvs in mesh.uvs.items():
+                f.write(struct.pack("<B", index))
+                _write_array(f, "d", uvs)
+
+        os.replace(temp_path, path)
+
+    # Exports sharing the cache, such as the processes of a farm, may remove any entry at any time, those
+    # already gone are skipped
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.path):
+            if name.endswith(_ENTRY_EXT):
+                path = os.path.join(self.path, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    # Remove the least recently used entries until the cache fits in max_bytes
+    def evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for mtime, size, path in entries)
+        for mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def clear(self):
+        for mtime, size, path in self._entries():
+            self._remove(path)
+
+    def summary(self):
+        return "cache: %d hits, %d misses" % (self.hits, self.misses)
@@ -0,0 +1,110 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+###############################################################################
+
+# The drawcalls of a capture to pick the ones to export from. The tree of
+# actions GetDrawcalls returns, with draws nested under any depth of markers,
+# is walked once into a map of every action by id and an array of the draws in
+# event order. Ranges of drawcall ids are then found by bisecting that array,
+# so selecting costs the same however many actions the capture has. Actions
+# that draw nothing, such as clears, copies and dispatches, are never selected.
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import re
+import bisect
+
+import renderdoc as rd
+
+
+# Whether an action draws geometry that can be exported
+def is_draw(action):
+    return bool(action.flags & rd.DrawFlags.Drawcall)
+
+
+class DrawcallIndex:
+    def __init__(self, roots):
+        # drawcall id -> action, for every action of the tree
+        self.actions = {}
+
+        # the draws in event order, with their drawcall ids and the markers they are nested under
+        self.draws = []
+        self.ids = []
+        self.markers = []
+
+        # Pre-order walk with a stack, trees can be deeper than the recursion limit. The markers of a draw
+        # are a (name, parent markers) pair, shared by every draw under the same marker, or None
+        stack = [(action, None) for action in reversed(roots)]
+        while stack:
+            action, markers = stack.pop()
+            self.actions[action.drawcallId] = action
+
+            if is_draw(action):
+                self.draws.append(action)
+                self.markers.append(markers)
+
+            if len(action.children) > 0:
+                if action.flags & rd.DrawFlags.PushMarker:
+                    markers = (action.name, markers)
+                stack.extend((child, markers) for child in reversed(action.children))
+
+        # Drawcall ids count up in event order, but don't rely on the order of the children
+        order = sorted(range(len(self.draws)), key=lambda i: self.draws[i].eventId)
+        self.draws = [self.draws[i] for i in order]
+        self.markers = [self.markers[i] for i in order]
+        self.ids = [draw.drawcallId for draw in self.draws]
+
+    def __len__(self):
+        return len(self.draws)
+
+    def find(self, drawcallId):
+        return self.actions.get(drawcallId)
+
+    # The draws with ids from start to end inclusive, whether or not those ids exist. A start or end of
+    # None leaves that side of the range open. With marker, only the draws nested under a marker whose
+    # name matches that regular expression are kept
+    def select(self, startDrawcallId=None, endDrawcallId=None, marker=None):
+        first = 0 if startDrawcallId is None else bisect.bisect_left(self.ids, startDrawcallId)
+        last = len(self.ids) if endDrawcallId is None else bisect.bisect_right(self.ids, endDrawcallId)
+        if marker is None:
+            return self.draws[first:last]
+
+        pattern = re.compile(marker)
+
+        # Match each marker once, however many draws and nested markers it has
+        matches = {id(None): False}
+
+        def matched(markers):
+            pending = []
+            while id(markers) not in matches:
+                pending.append(markers)
+                markers = markers[1]
+            result = matches[id(markers)]
+            for markers in reversed(pending):
+                result = result or pattern.search(markers[0]) is not None
+                matches[id(markers)] = result
+            return result
+
+        return [self.draws[i] for i in range(first, last) if matched(self.markers[i])]
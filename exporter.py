@@ -28,86 +28,207 @@ from __future__ import print_function
 from __future__ import absolute_import
 
 import os
+import re
+import sys
+import math
 import json
+import time
+import array
+import shutil
+import bisect
 import struct
-from textwrap import dedent
+import hashlib
+import concurrent.futures
 from functools import partial
-from collections import defaultdict, OrderedDict
+from collections import OrderedDict
 
-import qrenderdoc as qrd
 import renderdoc as rd
-from typing import Optional
-
-FBX_ASCII_TEMPLETE = """; FBX 7.3.0 project file
-; ----------------------------------------------------
-
-; Object definitions
-;------------------------------------------------------------------
-
-Definitions:  {
-    ObjectType: "Geometry" {
-        Count: 1
-        PropertyTemplate: "FbxMesh" {
-            Properties70:  {
-                P: "Primary Visibility", "bool", "", "",1
-            }
-        }
-    }
-    ObjectType: "Model" {
-        Count: 1
-        PropertyTemplate: "FbxNode" {
-            Properties70:  {
-                P: "Visibility", "Visibility", "", "A",1
-            }
-        }
-    }
-}
 
-; Object properties
-;------------------------------------------------------------------
-
-Objects:  {
-    Geometry: 2035541511296, "Geometry::", "Mesh" {
-        Vertices: *%(vertices_num)s {
-            a: %(vertices)s
-        } 
-        PolygonVertexIndex: *%(polygons_num)s {
-            a: %(polygons)s
-        } 
-        GeometryVersion: 124%(LayerElementNormal)s%(LayerElementTangent)s%(LayerElementColor)s%(LayerElementUV)s%(LayerElementUV1)s
-        Layer: 0 {
-            Version: 100%(LayerElementNormalInsert)s%(LayerElementTangentInsert)s%(LayerElementColorInsert)s%(LayerElementUVInsert)s
-        }%(LayerElementUV1Insert)s
-    }
-    Model: 2035615390896, "Model::%(model_name)s", "Mesh" {
-        Properties70:  {
-            P: "DefaultAttributeIndex", "int", "Integer", "",0
-        }
-    }
-}
+from . import buffers
+from . import cache
+from . import drawcalls
+from . import fbx_ascii
+from . import fbx_binary
+from . import profiler
+from . import semantics
+from . import textures
 
-; Object connections
-;------------------------------------------------------------------
+# NumPy is not always importable from RenderDoc's embedded Python, in which case
+# vertex data is decoded one element at a time with struct instead
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
-Connections:  {
-    ;Model::pCube1, Model::RootNode
-    C: "OO",2035615390896,0
-    ;Geometry::, Model::pCube1
-    C: "OO",2035541511296,2035615390896
-}"""
+FBX_FORMAT_ASCII = "ascii"
+FBX_FORMAT_BINARY = "binary"
 
 
 class MeshData(rd.MeshFormat):
     indexOffset = 0
+    instanceRate = 0
     name = ""
 
 
-# Unpack a tuple of the given format, from the data
-def unpackData(fmt, data):
-    # We don't handle 'special' formats - typically bit-packed such as 10:10:10:2
+# The decoded geometry of one draw, laid out the way the FBX layers store it
+class FbxMesh:
+    def __init__(self):
+        self.name = ""
+        # compacted vertex index of every polygon vertex
+        self.indices = []
+        # x, y, z of each compacted vertex
+        self.vertices = []
+        # per polygon vertex layers, empty when the draw has no such attribute
+        self.normals = []
+        self.tangents = []
+        # per polygon vertex color sets and the number of components of each, by set number
+        self.colors = {}
+        self.color_components = {}
+        # per compacted vertex uv sets by set number, indexed through self.indices
+        self.uvs = {}
+
+    def polygons(self):
+        return PolygonVertexIndex(self.indices)
+
+
+# PolygonVertexIndex marks the last vertex of each triangle by storing it as -(index + 1).
+# This computes it on the fly from the triangle indices for whichever slice a writer asks for
+class PolygonVertexIndex:
+    def __init__(self, indices):
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, s):
+        start = s.start or 0
+        chunk = self.indices[s]
+
+        if np is not None and isinstance(chunk, np.ndarray):
+            chunk = chunk.copy()
+            last = (2 - start) % 3
+            chunk[last::3] = -(chunk[last::3] + 1)
+            return chunk
+
+        return [v if i % 3 else -(v + 1) for i, v in enumerate(chunk, start + 1)]
+
+
+# Decoders of the bit-packed formats, by ResourceFormatType. Each entry is the size in bytes of one
+# element and a function decoding elements read as little endian unsigned integers: a numpy array of
+# them into a (count, compCount) array of doubles, or a list of them into a list of tuples
+PACKED_FORMATS = {}
+
+
+def packedFormat(formatType, byteSize):
+    def register(decode):
+        PACKED_FORMATS[formatType] = (byteSize, decode)
+        return decode
+    return register
+
+
+def getPackedFormat(fmt):
+    if fmt.type not in PACKED_FORMATS:
+        raise RuntimeError("Packed format %s is not supported!" % rd.ResourceFormatType(fmt.type).name)
+    return PACKED_FORMATS[fmt.type]
+
+
+# Split packed integers into fields of the given bit widths, lowest bits first, and normalise or sign
+# extend them as the component type asks. Signed normalised fields are clamped to -1 as the graphics
+# APIs do, so the most negative value decodes to -1 rather than just below it
+def unpackBits(fmt, words, widths):
+    shifts = [sum(widths[:i]) for i in range(len(widths))]
+    signed = fmt.compType in (rd.CompType.SNorm, rd.CompType.SInt, rd.CompType.SScaled)
+
+    if hasattr(words, "dtype"):
+        words = words.astype(np.int64)
+        value = np.stack([(words >> shift) & ((1 << bits) - 1) for shift, bits in zip(shifts, widths)], axis=1)
+        bits = np.array(widths)
+        if signed:
+            value -= (value >> (bits - 1)) << bits
+        value = value.astype(np.float64)
+        if fmt.compType == rd.CompType.UNorm:
+            value /= (1 << bits) - 1
+        elif fmt.compType == rd.CompType.SNorm:
+            value = np.maximum(value / ((1 << (bits - 1)) - 1), -1.0)
+        return value
+
+    values = []
+    for word in words:
+        value = []
+        for shift, bits in zip(shifts, widths):
+            v = (word >> shift) & ((1 << bits) - 1)
+            if signed and v >> (bits - 1):
+                v -= 1 << bits
+            if fmt.compType == rd.CompType.UNorm:
+                v = v / float((1 << bits) - 1)
+            elif fmt.compType == rd.CompType.SNorm:
+                v = max(v / float((1 << (bits - 1)) - 1), -1.0)
+            value.append(float(v))
+        values.append(tuple(value))
+    return values
+
+
+@packedFormat(rd.ResourceFormatType.R10G10B10A2, 4)
+def decodeR10G10B10A2(fmt, words):
+    return unpackBits(fmt, words, [10, 10, 10, 2])
+
+
+@packedFormat(rd.ResourceFormatType.A8, 1)
+def decodeA8(fmt, words):
+    return unpackBits(fmt, words, [8])
+
+
+# Unsigned 11 and 10 bit floats have the exponent and mantissa layout of a half float,
+# only with fewer mantissa bits, so they are decoded by shifting them into one
+@packedFormat(rd.ResourceFormatType.R11G11B10, 4)
+def decodeR11G11B10(fmt, words):
+    if hasattr(words, "dtype"):
+        halves = np.stack([(words & 0x7FF) << 4, ((words >> 11) & 0x7FF) << 4, ((words >> 22) & 0x3FF) << 5], axis=1)
+        return halves.astype("<u2").view("<f2").astype(np.float64)
+
+    return [struct.unpack("<3e", struct.pack("<3H", (word & 0x7FF) << 4, ((word >> 11) & 0x7FF) << 4,
+                                             ((word >> 22) & 0x3FF) << 5)) for word in words]
+
+
+# Three 9 bit mantissas sharing a 5 bit exponent, without implicit leading ones
+@packedFormat(rd.ResourceFormatType.R9G9B9E5, 4)
+def decodeR9G9B9E5(fmt, words):
+    if hasattr(words, "dtype"):
+        exponent = (words >> 27).astype(np.int64) - 24
+        mantissas = np.stack([(words >> shift) & 0x1FF for shift in (0, 9, 18)], axis=1).astype(np.float64)
+        return np.ldexp(mantissas, exponent[:, None])
+
+    return [tuple(math.ldexp((word >> shift) & 0x1FF, (word >> 27) - 24) for shift in (0, 9, 18))
+            for word in words]
+
+
+# Size in bytes of one element of the given format
+def getFormatByteSize(fmt):
     if fmt.Special():
-        raise RuntimeError("Packed formats are not supported!")
+        return getPackedFormat(fmt)[0]
+    return fmt.compByteWidth * fmt.compCount
+
+
+# Unpack a tuple of the given format, from the data at the given byte offset
+def unpackData(fmt, data, offset=0):
+    # 'Special' formats are typically bit-packed such as 10:10:10:2, and have decoders of their own
+    if fmt.Special():
+        byteSize, decode = getPackedFormat(fmt)
+        value = decode(fmt, [int.from_bytes(data[offset:offset + byteSize], "little")])[0]
+    else:
+        value = unpackRegular(fmt, data, offset)
+
+    # If the format is BGRA, swap the two components
+    if fmt.BGRAOrder():
+        value = tuple(value[i] for i in [2, 1, 0, 3])
+        
+    # keep four digits
+    value = tuple(float("%.4f" % value[i]) for i in range(len(value)))
+
+    return value
 
+
+def unpackRegular(fmt, data, offset):
     formatChars = {}
     #                                 012345678
     formatChars[rd.CompType.UInt] = "xBHxIxxxL"
@@ -124,7 +245,7 @@ def unpackData(fmt, data):
     vertexFormat = str(fmt.compCount) + formatChars[fmt.compType][fmt.compByteWidth]
 
     # Unpack the data
-    value = struct.unpack_from(vertexFormat, data, 0)
+    value = struct.unpack_from(vertexFormat, data, offset)
 
     # If the format needs post-processing such as normalisation, do that now
     if fmt.compType == rd.CompType.UNorm:
@@ -137,41 +258,1339 @@ def unpackData(fmt, data):
             (float(i) if (i == maxNeg) else (float(i) / divisor)) for i in value
         )
 
-    # If the format is BGRA, swap the two components
+    return value
+
+
+# Round to four decimal places, giving exactly the same values as float("%.4f" % v)
+def roundValues(values):
+    # Scaling is inexact, so anything that lands too close to a rounding tie (or is too
+    # large to be scaled safely) is rounded through the string formatting instead
+    with np.errstate(invalid="ignore", over="ignore"):
+        scaled = values * 10000.0
+        rounded = np.rint(scaled) / 10000.0
+        tie = np.abs(scaled - np.floor(scaled) - 0.5) <= np.abs(scaled) * 2.0 ** -52
+        inexact = tie | ~(np.abs(values) < 1e11)
+
+    if inexact.any():
+        rounded[inexact] = [float("%.4f" % v) for v in values[inexact].tolist()]
+
+    return rounded
+
+
+# Unpack count elements of the given format spaced stride bytes apart, starting from
+# the given byte offset into the data. This is the vectorized counterpart of unpackData
+# and returns the same values as a (count, compCount) array of doubles
+def unpackArray(fmt, data, offset, stride, count):
+    if fmt.Special():
+        byteSize, decode = getPackedFormat(fmt)
+        words = np.ndarray((count,), dtype=np.dtype("<u%d" % byteSize), buffer=data, offset=offset, strides=(stride,))
+        value = decode(fmt, words)
+    else:
+        value = unpackRegularArray(fmt, data, offset, stride, count)
+
     if fmt.BGRAOrder():
-        value = tuple(value[i] for i in [2, 1, 0, 3])
-        
-    # keep four digits
-    value = tuple(float("%.4f" % value[i]) for i in range(len(value)))
+        value = value[:, [2, 1, 0, 3]]
+
+    return roundValues(value)
+
+
+def unpackRegularArray(fmt, data, offset, stride, count):
+    dtypeChars = {}
+    dtypeChars[rd.CompType.UInt] = "u"
+    dtypeChars[rd.CompType.SInt] = "i"
+    dtypeChars[rd.CompType.Float] = "f"
+
+    dtypeChars[rd.CompType.UNorm] = dtypeChars[rd.CompType.UInt]
+    dtypeChars[rd.CompType.UScaled] = dtypeChars[rd.CompType.UInt]
+    dtypeChars[rd.CompType.SNorm] = dtypeChars[rd.CompType.SInt]
+    dtypeChars[rd.CompType.SScaled] = dtypeChars[rd.CompType.SInt]
+
+    dtype = np.dtype("<" + dtypeChars[fmt.compType] + str(fmt.compByteWidth))
+
+    # View the strided elements in place, then convert them all at once
+    view = np.ndarray(
+        (count, fmt.compCount), dtype=dtype, buffer=data, offset=offset, strides=(stride, fmt.compByteWidth)
+    )
+    with np.errstate(invalid="ignore"):
+        value = view.astype(np.float64)
+
+    if fmt.compType == rd.CompType.UNorm:
+        divisor = float((2 ** (fmt.compByteWidth * 8)) - 1)
+        value /= divisor
+    elif fmt.compType == rd.CompType.SNorm:
+        maxNeg = -float(2 ** (fmt.compByteWidth * 8)) / 2
+        divisor = float(-(maxNeg - 1))
+        value = np.where(value == maxNeg, value, value / divisor)
 
     return value
 
 
-def getIndices(controller, mesh):
-    # Get the character for the width of index
-    indexFormat = "B"
-    if mesh.indexByteStride == 2:
-        indexFormat = "H"
-    elif mesh.indexByteStride == 4:
-        indexFormat = "I"
+# array.array typecode and numpy dtype for each index width
+INDEX_TYPES = {
+    1: ("B", "<u1"),
+    2: ("H", "<u2"),
+    4: ("I", "<u4"),
+}
+
+
+# Primitive restart only cuts strips, fans and loops. RenderDoc reports it as enabled whatever the topology
+# on D3D11, and on D3D12 whenever a strip cut value is set, where a list can still use the all ones index
+RESTART_TOPOLOGIES = frozenset(getattr(rd.Topology, name) for name in (
+    "LineStrip", "LineLoop", "TriangleStrip", "TriangleFan", "LineStrip_Adj", "TriangleStrip_Adj")
+    if hasattr(rd.Topology, name))
+
+# Topologies whose indices are unrolled into a triangle list. The other strips and loops can't be written
+# as polygons, draws of them are skipped
+UNROLLED_TOPOLOGIES = frozenset((rd.Topology.TriangleStrip, rd.Topology.TriangleFan))
+UNSUPPORTED_TOPOLOGIES = RESTART_TOPOLOGIES - UNROLLED_TOPOLOGIES
+
 
-    # Duplicate the format by the number of indices
-    indexFormat = str(mesh.numIndices) + indexFormat
+def restartEnabled(allowRestart, topology):
+    return bool(allowRestart) and topology in RESTART_TOPOLOGIES
 
+
+# Unroll the indices of a triangle strip or fan into a triangle list, every run between two restarts
+# being a strip or fan of its own. Every other triangle of a strip is flipped to keep the winding of
+# the first, the triangles of a fan all share the first vertex of its run, and degenerate triangles,
+# such as the ones joining strips, are dropped. Returns the triangles and, unless final, what the next
+# indices of the draw continue: carry, the end of the open run and the parity of its next triangle
+def unrollTriangles(indices, topology, restartIndex=None, carry=None, final=True):
+    carried, parity = carry if carry is not None else ([], 0)
+    strip = topology == rd.Topology.TriangleStrip
+
+    if np is not None:
+        indices = np.asarray(indices)
+        if len(carried):
+            indices = np.concatenate((np.asarray(carried, dtype=indices.dtype), indices))
+        positions = np.arange(len(indices))
+
+        # The first position of the run holding every position, the one after a restart for a restart
+        if restartIndex is not None:
+            cut = indices == restartIndex
+            starts = np.maximum.accumulate(np.where(cut, positions + 1, 0))
+        else:
+            cut = np.zeros(len(indices), dtype=bool)
+            starts = np.zeros(len(indices), dtype=np.int64)
+
+        # A triangle starts at every position whose next two are in its run
+        i = positions[:max(len(indices) - 2, 0)]
+        i = i[~(cut[i] | cut[i + 1] | cut[i + 2])]
+        if strip:
+            odd = (i - starts[i] + np.where(starts[i] == 0, parity, 0)) % 2 == 1
+            a = np.where(odd, indices[i + 1], indices[i])
+            b = np.where(odd, indices[i], indices[i + 1])
+        else:
+            a = indices[starts[i]]
+            b = indices[i + 1]
+        c = indices[i + 2]
+        keep = (a != b) & (b != c) & (a != c)
+        triangles = np.stack((a, b, c), axis=1)[keep].ravel()
+
+        start = int(starts[-1]) if len(indices) else 0
+        run = indices[start:].tolist()
+        runParity = parity if start == 0 else 0
+    else:
+        triangles = []
+        run = list(carried)
+        runParity = parity
+
+        def unroll(run, runParity):
+            for k in range(len(run) - 2):
+                if not strip:
+                    a, b = run[0], run[k + 1]
+                elif (k + runParity) % 2:
+                    a, b = run[k + 1], run[k]
+                else:
+                    a, b = run[k], run[k + 1]
+                c = run[k + 2]
+                if a != b and b != c and a != c:
+                    triangles.extend((a, b, c))
+
+        for idx in indices:
+            if idx == restartIndex:
+                unroll(run, runParity)
+                run = []
+                runParity = 0
+            else:
+                run.append(idx)
+        unroll(run, runParity)
+
+    if final:
+        return triangles, None
+
+    # The next triangles of the open run need its last two vertices, and a fan its first
+    if len(run) < 2:
+        return triangles, (run, runParity)
+    if strip:
+        return triangles, (run[-2:], (runParity + len(run) - 2) % 2)
+    return triangles, ([run[0], run[-1]], 0)
+
+
+# Read count indices of an indexed draw, starting first indices into it, as they are stored. Returns them
+# as a numpy array, or an array.array without NumPy, and the restart index if restart is enabled
+def readIndices(controller, mesh, first, count):
+    stride = mesh.indexByteStride
+    typecode, dtype = INDEX_TYPES.get(stride, INDEX_TYPES[1])
+    stride = struct.calcsize(typecode)
+
+    # Fetch only the indices asked for, starting from the first index of the draw
+    offset = mesh.indexByteOffset + (mesh.indexOffset + first) * stride
+    prof = profiler.current()
+    with prof.stage("GetBufferData"):
+        ibdata = controller.GetBufferData(mesh.indexResourceId, offset, count * stride)
+    count = min(count, len(ibdata) // stride)
+    prof.count("index_bytes", len(ibdata))
+
+    # The restart index is always all ones at the width of the indices
+    restartIndex = None
+    if mesh.allowRestart:
+        restartIndex = mesh.restartIndex & ((1 << (stride * 8)) - 1)
+
+    if np is not None:
+        return np.frombuffer(ibdata, dtype=dtype, count=count), restartIndex
+
+    indices = array.array(typecode)
+    indices.frombytes(ibdata[:count * stride])
+    if sys.byteorder != "little":
+        indices.byteswap()
+    return indices, restartIndex
+
+
+# Apply the baseVertex offset to indices as read by readIndices, giving an int64 array or a list
+def offsetIndices(indices, baseVertex):
+    if np is not None:
+        return indices.astype(np.int64) + baseVertex
+    if baseVertex:
+        return [i + baseVertex for i in indices]
+    return list(indices)
+
+
+# The indices of a draw as a triangle list, strips and fans unrolled
+def getIndices(controller, mesh):
     # If we have an index buffer
     if mesh.indexResourceId != rd.ResourceId.Null():
-        # Fetch the data
-        ibdata = controller.GetBufferData(mesh.indexResourceId, mesh.indexByteOffset, 0)
+        # Decode them all at once, and apply the baseVertex offset
+        indices, restartIndex = readIndices(controller, mesh, 0, mesh.numIndices)
+        if mesh.topology in UNROLLED_TOPOLOGIES:
+            indices = unrollTriangles(indices, mesh.topology, restartIndex)[0]
+        return offsetIndices(indices, mesh.baseVertex)
+    else:
+        # With no index buffer, just generate a range
+        if np is not None:
+            indices = np.arange(mesh.numIndices, dtype=np.int64)
+        else:
+            indices = list(range(mesh.numIndices))
+        if mesh.topology in UNROLLED_TOPOLOGIES:
+            indices = unrollTriangles(indices, mesh.topology)[0]
+        return indices
+
+
+# Smallest and largest index, without a slow python loop over numpy arrays
+def indexBounds(indices):
+    if hasattr(indices, "min"):
+        return int(indices.min()), int(indices.max())
+    return min(indices), max(indices)
+
+
+# Raw bytes of the indices as 64 bit integers, the same with and without NumPy
+def indexBytes(indices):
+    if hasattr(indices, "astype"):
+        return indices.astype("<i8").tobytes()
+
+    values = array.array("q", indices)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tobytes()
+
+
+# A copy of the parts of rd.ResourceFormat the decoders use, as plain python data
+class VertexFormat:
+    def __init__(self, fmt):
+        self.type = int(fmt.type)
+        self.compType = int(fmt.compType)
+        self.compByteWidth = fmt.compByteWidth
+        self.compCount = fmt.compCount
+        self.bgraOrder = fmt.BGRAOrder()
+
+    def Special(self):
+        return self.type != rd.ResourceFormatType.Regular
+
+    def BGRAOrder(self):
+        return self.bgraOrder
+
+
+# The layout of one vertex attribute within a buffer fetched by VertexFetcher
+class VertexAttribute:
+    def __init__(self, meshInput, buffer):
+        self.name = meshInput.name
+        self.format = VertexFormat(meshInput.format)
+        self.vertexByteOffset = meshInput.vertexByteOffset
+        self.vertexByteStride = meshInput.vertexByteStride
+        self.buffer = buffer
+
+
+# Fetches the vertex data of a draw up front, with a single GetBufferData call per
+# vertex buffer covering every vertex referenced by the indices. All attributes
+# sourced from the same buffer share that blob and are decoded from it in memory.
+# Once constructed it holds no reference to the replay, so it can be decoded anywhere
+class VertexFetcher:
+    def __init__(self, controller, meshInputs, indices):
+        self.attributes = []
+        self.blobs = []
+
+        minIndex, maxIndex = indexBounds(indices)
+
+        # Merge the byte range needed by each attribute into one range per buffer
+        buffers = OrderedDict()
+        ranges = []
+        for attr in meshInputs:
+            start = attr.vertexByteOffset + attr.vertexByteStride * minIndex
+            end = attr.vertexByteOffset + attr.vertexByteStride * maxIndex + getFormatByteSize(attr.format)
+
+            if attr.vertexResourceId in buffers:
+                buffer = buffers[attr.vertexResourceId]
+                prevStart, prevEnd = ranges[buffer]
+                ranges[buffer] = (min(start, prevStart), max(end, prevEnd))
+            else:
+                buffer = buffers[attr.vertexResourceId] = len(ranges)
+                ranges.append((start, end))
+
+            self.attributes.append(VertexAttribute(attr, buffer))
+
+        prof = profiler.current()
+        for resourceId, buffer in buffers.items():
+            start, end = ranges[buffer]
+            with prof.stage("GetBufferData"):
+                self.blobs.append((start, controller.GetBufferData(resourceId, start, end - start)))
+            prof.count("vertex_bytes", len(self.blobs[-1][1]))
+
+    # Return the blob holding the given vertex of an attribute, and the offset of it within the blob
+    def locate(self, attr, idx):
+        start, data = self.blobs[attr.buffer]
+        return data, attr.vertexByteOffset + attr.vertexByteStride * idx - start
+
+    # Decode count consecutive vertices of an attribute starting at firstIndex, as a (count, compCount)
+    # array, or a list of tuples without NumPy
+    def decode(self, attr, firstIndex, count):
+        data, offset = self.locate(attr, firstIndex)
+        if np is not None:
+            return unpackArray(attr.format, data, offset, attr.vertexByteStride, count)
 
-        # Unpack all the indices, starting from the first index to fetch
-        offset = mesh.indexOffset * mesh.indexByteStride
-        indices = struct.unpack_from(indexFormat, ibdata, offset)
+        return [unpackData(attr.format, data, offset + attr.vertexByteStride * i) for i in range(count)]
 
-        # Apply the baseVertex offset
-        return [i + mesh.baseVertex for i in indices]
+
+# Everything needed to turn one draw into an FBX file, read from the replay up front.
+# It only holds plain python data so that it can be handed to a worker thread or process
+class DrawSnapshot:
+    def __init__(self, path, indices, fetcher, instances=None):
+        self.path = path
+        self.indices = indices
+        self.fetcher = fetcher
+        self.instances = instances
+        self._digest = None
+
+    # Hash of the fetched bytes and how they are decoded, identical geometry hashes the same
+    # whichever buffers, offsets or draw it was read from
+    def digest(self):
+        if self._digest is None:
+            self._digest = self._hash()
+        return self._digest
+
+    def _hash(self):
+        h = hashlib.blake2b(digest_size=16)
+        h.update(indexBytes(self.indices))
+        for attr in self.fetcher.attributes:
+            fmt = attr.format
+            start = self.fetcher.blobs[attr.buffer][0]
+            layout = (attr.name, fmt.type, fmt.compType, fmt.compByteWidth, fmt.compCount, fmt.bgraOrder,
+                      attr.buffer, attr.vertexByteOffset - start, attr.vertexByteStride)
+            h.update(repr(layout).encode("utf-8"))
+        for start, data in self.fetcher.blobs:
+            h.update(struct.pack("<Q", len(data)))
+            h.update(data)
+        if self.instances is not None:
+            h.update(self.instances.digest().encode("utf-8"))
+        return h.hexdigest()
+
+
+# Decode a draw and compact it to the vertices its indices reference, in the order they are first used
+# check is called between the stages, to stop a cancelled export before decoding all of a big draw.
+# Positions keep x, y and z only: shader outputs are float4 clip space positions, exported as they
+# are without dividing by w, which is 0 or negative for the vertices behind the camera
+def build_mesh(snapshot, check=None):
+    indices = snapshot.indices
+    fetcher = snapshot.fetcher
+
+    minIndex, maxIndex = indexBounds(indices)
+    vertexCount = maxIndex - minIndex + 1
+
+    prof = profiler.current()
+
+    # Work out, in one pass over the indices, which vertices of the referenced range are used
+    # in the order they are first used (order), and the compacted index of every polygon vertex
+    with prof.stage("compact"):
+        if np is not None:
+            local = np.asarray(indices, dtype=np.int64) - minIndex
+            unique, first = np.unique(local, return_index=True)
+            order = unique[np.argsort(first, kind="stable")]
+            remap = np.empty(vertexCount, dtype=np.int32)
+            remap[order] = np.arange(len(order), dtype=np.int32)
+            idx_list = remap[local]
+        else:
+            remap = {}
+            idx_list = [remap.setdefault(idx, len(remap)) for idx in indices]
+            order = [idx - minIndex for idx in remap]
+            local = [idx - minIndex for idx in indices]
+
+    # Decode every vertex in the referenced range of each attribute in one batch
+    with prof.stage("unpack"):
+        decoded = {}
+        for attr in fetcher.attributes:
+            if check is not None:
+                check()
+            decoded[attr.name] = fetcher.decode(attr, minIndex, vertexCount)
+
+    if check is not None:
+        check()
+
+    # change_triangle_orient(idx_list)
+
+    with prof.stage("gather"):
+        mesh = FbxMesh()
+        mesh.indices = idx_list
+
+        if "in_POSITION0" in decoded:
+            mesh.vertices = gatherValues(decoded["in_POSITION0"], order, 3)
+            # mesh.vertices[0::3] = -mesh.vertices[0::3]
+
+        if "in_NORMAL0" in decoded:
+            mesh.normals = gatherValues(decoded["in_NORMAL0"], local, 3)
+
+        if "in_TANGENT0" in decoded:
+            mesh.tangents = gatherValues(decoded["in_TANGENT0"], local)
+
+        for index, name in semantics.sets(decoded, semantics.COLOR):
+            mesh.color_components[index] = len(decoded[name][0])
+            mesh.colors[index] = gatherValues(decoded[name], local, opaque=True)
+
+        for index, name in semantics.sets(decoded, semantics.TEXCOORD):
+            mesh.uvs[index] = gatherValues(decoded[name], order)
+
+    prof.count("indices", len(idx_list))
+    prof.count("vertices", len(order))
+    return mesh
+
+
+# Pick the given rows out of decoded vertex values and flatten them, keeping at most the
+# given number of components. With opaque, the fourth component (alpha) is set to 1
+def gatherValues(values, rows, components=None, opaque=False):
+    if np is not None:
+        values = values[rows, :components]
+        if opaque and values.shape[1] > 3:
+            values[:, 3] = 1.0
+        return values.ravel()
+
+    if opaque:
+        return [v if i % 4 else 1.0 for row in rows for i, v in enumerate(values[row][:components], 1)]
+    return [v for row in rows for v in values[row][:components]]
+
+
+# Draws with more indices than this are decoded and written a chunk of indices at a time
+DEFAULT_CHUNK_SIZE = 1 << 22
+
+
+# The indices of a draw read from the replay a window of chunk_size at a time, as getIndices would return
+# them all. A first pass over the windows finds their bounds and how many indices each one holds once
+# strips and fans are unrolled, after which any window can be read again on its own with load
+class IndexChunks:
+    def __init__(self, controller, mesh, chunk_size):
+        self.controller = controller
+        self.mesh = mesh
+        self.windows = [(first, min(chunk_size, mesh.numIndices - first))
+                        for first in range(0, mesh.numIndices, chunk_size)]
+
+        # The triangles of a strip or fan go on over the end of a window. What the next window continues,
+        # the end of the open run and the parity of its next triangle, is carried over into it
+        self.carries = []
+        self.offsets = [0]
+        self.minIndex = None
+        self.maxIndex = None
+
+        carry = None
+        for k in range(len(self.windows)):
+            self.carries.append(carry)
+            indices, carry = self._read(k, carry)
+            self.offsets.append(self.offsets[-1] + len(indices))
+            if len(indices):
+                minIndex, maxIndex = indexBounds(indices)
+                self.minIndex = minIndex if self.minIndex is None else min(self.minIndex, minIndex)
+                self.maxIndex = maxIndex if self.maxIndex is None else max(self.maxIndex, maxIndex)
+
+    def __len__(self):
+        return len(self.windows)
+
+    def _read(self, k, carry):
+        first, count = self.windows[k]
+        mesh = self.mesh
+        indexed = mesh.indexResourceId != rd.ResourceId.Null()
+        if indexed:
+            indices, restartIndex = readIndices(self.controller, mesh, first, count)
+        else:
+            restartIndex = None
+            if np is not None:
+                indices = np.arange(first, first + count, dtype=np.int64)
+            else:
+                indices = list(range(first, first + count))
+
+        if mesh.topology in UNROLLED_TOPOLOGIES:
+            indices, carry = unrollTriangles(indices, mesh.topology, restartIndex, carry,
+                                             k == len(self.windows) - 1)
+        if indexed:
+            indices = offsetIndices(indices, mesh.baseVertex)
+        return indices, carry
+
+    # The indices of window k
+    def load(self, k):
+        return self._read(k, self.carries[k])[0]
+
+
+# A flat array computed a chunk at a time as the writers ask for slices of it, so that only one chunk
+# is held at once. Chunk k holds the values from offsets[k] to offsets[k + 1] and is returned by load(k)
+class ChunkedArray:
+    def __init__(self, offsets, load):
+        self.offsets = offsets
+        self.load = load
+        self.chunk = None
+        self.values = None
+
+    def __len__(self):
+        return self.offsets[-1]
+
+    def _values(self, k):
+        if self.chunk != k:
+            self.values = None
+            self.values = self.load(k)
+            self.chunk = k
+        return self.values
+
+    def __getitem__(self, s):
+        start, stop, step = s.indices(len(self))
+        parts = []
+        k = bisect.bisect_right(self.offsets, start) - 1
+        while start < stop:
+            end = min(stop, self.offsets[k + 1])
+            if end > start:
+                values = self._values(k)
+                parts.append(values[start - self.offsets[k]:end - self.offsets[k]])
+            start = end
+            k += 1
+
+        if np is not None:
+            if len(parts) == 1:
+                return parts[0]
+            return np.concatenate(parts) if parts else np.zeros(0)
+        return [v for part in parts for v in part]
+
+
+# The vertices of a chunk are read from the replay in runs, along with the vertices lying between the ones
+# of a run. Runs are joined, closest first, while the bytes read in between stay under those of the chunk's
+# own vertices or this many bytes, so what a chunk reads doesn't depend on how far apart its vertices are
+CHUNK_GAP_BYTES = 1 << 20
+
+
+# The runs of sorted, unique vertices to read at once, as (first, last) positions into them, last exclusive
+def vertexRuns(vertices, stride, budget):
+    if np is not None:
+        gaps = (np.diff(vertices) - 1) * stride
+        order = np.argsort(gaps, kind="stable")
+        joined = np.zeros(len(gaps), dtype=bool)
+        joined[order[np.cumsum(gaps[order]) <= budget]] = True
+        cuts = (np.flatnonzero(~joined) + 1).tolist()
     else:
-        # With no index buffer, just generate a range
-        return tuple(range(mesh.numIndices))
+        gaps = [(vertices[i + 1] - vertices[i] - 1) * stride for i in range(len(vertices) - 1)]
+        joined = [False] * len(gaps)
+        total = 0
+        for i in sorted(range(len(gaps)), key=gaps.__getitem__):
+            total += gaps[i]
+            if total > budget:
+                break
+            joined[i] = True
+        cuts = [i + 1 for i in range(len(gaps)) if not joined[i]]
+
+    bounds = [0] + cuts + [len(vertices)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+# Decode an attribute of the given vertices, picking components like gatherValues. Only the distinct
+# vertices are decoded, from runs of them read from the replay, and then spread back over the vertices
+def decodeVertices(controller, meshInput, vertices, components=None, opaque=False):
+    fmt = VertexFormat(meshInput.format)
+    stride = meshInput.vertexByteStride
+    byteSize = getFormatByteSize(fmt)
+
+    if np is not None:
+        unique, rows = np.unique(np.asarray(vertices, dtype=np.int64), return_inverse=True)
+    else:
+        unique = sorted(set(vertices))
+        position = dict((idx, i) for i, idx in enumerate(unique))
+        rows = [position[idx] for idx in vertices]
+    values = []
+
+    prof = profiler.current()
+    runs = vertexRuns(unique, stride, max(len(unique) * stride, CHUNK_GAP_BYTES)) if len(unique) else []
+    for first, last in runs:
+        firstIndex = int(unique[first])
+        start = meshInput.vertexByteOffset + stride * firstIndex
+        length = stride * (int(unique[last - 1]) - firstIndex) + byteSize
+        with prof.stage("GetBufferData"):
+            data = controller.GetBufferData(meshInput.vertexResourceId, start, length)
+        prof.count("vertex_bytes", len(data))
+
+        if np is not None:
+            # Pack the bytes of the run's own vertices together, skipping the ones in between
+            offsets = (unique[first:last] - firstIndex) * stride
+            packed = np.frombuffer(data, dtype=np.uint8)[offsets[:, None] + np.arange(byteSize)]
+            values.append(unpackArray(fmt, packed.tobytes(), 0, byteSize, last - first))
+        else:
+            values.extend(unpackData(fmt, data, stride * (idx - firstIndex)) for idx in unique[first:last])
+
+    if np is not None:
+        values = np.concatenate(values) if values else np.zeros((0, fmt.compCount))
+    return gatherValues(values, rows, components, opaque)
+
+
+# The same mesh as build_mesh would return for a draw, positions limited to x, y and z alike, with
+# every array a ChunkedArray reading and decoding its chunks from the replay as it is written. Only the
+# compacted index of each vertex in the range the draw references is kept in memory. Writing it must
+# happen before the replay moves on to another event
+def build_chunked_mesh(controller, meshInputs, chunk_size, check=None):
+    prof = profiler.current()
+    chunks = IndexChunks(controller, meshInputs[0], chunk_size)
+
+    mesh = FbxMesh()
+    if chunks.minIndex is None:
+        return mesh
+    minIndex = chunks.minIndex
+    vertexCount = chunks.maxIndex - minIndex + 1
+
+    # Number the vertices in the order they are first used, chunk by chunk. bases[k] is the number of
+    # vertices first used before chunk k
+    bases = [0]
+    with prof.stage("compact"):
+        if np is not None:
+            remap = np.full(vertexCount, -1, dtype=np.int32)
+        else:
+            remap = array.array("i", [-1]) * vertexCount
+
+        for k in range(len(chunks)):
+            if check is not None:
+                check()
+
+            indices = chunks.load(k)
+            count = bases[-1]
+            if np is not None:
+                unique, first = np.unique(indices - minIndex, return_index=True)
+                new = remap[unique] < 0
+                order = unique[new][np.argsort(first[new], kind="stable")]
+                remap[order] = np.arange(count, count + len(order), dtype=np.int32)
+                count += len(order)
+            else:
+                for idx in indices:
+                    if remap[idx - minIndex] < 0:
+                        remap[idx - minIndex] = count
+                        count += 1
+            bases.append(count)
+
+    # The vertices first used in chunk k, in order
+    def chunk_vertices(k):
+        indices = chunks.load(k)
+        if np is not None:
+            ranks = remap[indices - minIndex]
+            new = ranks >= bases[k]
+            vertices = np.empty(bases[k + 1] - bases[k], dtype=np.int64)
+            vertices[ranks[new] - bases[k]] = indices[new]
+            return vertices
+
+        vertices = [0] * (bases[k + 1] - bases[k])
+        for idx in indices:
+            rank = remap[idx - minIndex]
+            if rank >= bases[k]:
+                vertices[rank - bases[k]] = idx
+        return vertices
+
+    def compacted(k):
+        indices = chunks.load(k)
+        if np is not None:
+            return remap[indices - minIndex]
+        return [remap[idx - minIndex] for idx in indices]
+
+    # Per compacted vertex and per polygon vertex arrays of an attribute
+    def per_vertex(meshInput, components=None):
+        width = min(components or meshInput.format.compCount, meshInput.format.compCount)
+        return ChunkedArray([base * width for base in bases],
+                            lambda k: decodeVertices(controller, meshInput, chunk_vertices(k), components))
+
+    def per_polygon_vertex(meshInput, components=None, opaque=False):
+        width = min(components or meshInput.format.compCount, meshInput.format.compCount)
+        return ChunkedArray([offset * width for offset in chunks.offsets],
+                            lambda k: decodeVertices(controller, meshInput, chunks.load(k), components, opaque))
+
+    inputs = dict((meshInput.name, meshInput) for meshInput in meshInputs)
+    mesh.indices = ChunkedArray(chunks.offsets, compacted)
+
+    if "in_POSITION0" in inputs:
+        mesh.vertices = per_vertex(inputs["in_POSITION0"], 3)
+
+    if "in_NORMAL0" in inputs:
+        mesh.normals = per_polygon_vertex(inputs["in_NORMAL0"], 3)
+
+    if "in_TANGENT0" in inputs:
+        mesh.tangents = per_polygon_vertex(inputs["in_TANGENT0"])
+
+    for index, name in semantics.sets(inputs, semantics.COLOR):
+        mesh.color_components[index] = inputs[name].format.compCount
+        mesh.colors[index] = per_polygon_vertex(inputs[name], opaque=True)
+
+    for index, name in semantics.sets(inputs, semantics.TEXCOORD):
+        mesh.uvs[index] = per_vertex(inputs[name])
+
+    prof.count("indices", len(mesh.indices))
+    prof.count("vertices", bases[-1])
+    return mesh
+
+
+VERTEX_SOURCE_INPUTS = "inputs"
+VERTEX_SOURCE_VSOUT = "vsout"
+VERTEX_SOURCE_GSOUT = "gsout"
+
+# Prefixes shader compilers give output variables without a semantic, e.g. vs_TEXCOORD0 or out.uv
+OUTPUT_PREFIX = re.compile(r"^(?:.*\.)?(?:vs_|gs_|out_|o_|v_)?", re.IGNORECASE)
+
+
+# The name of the vertex input an output of the vertex or geometry shader stands in for, so that
+# the outputs land in the same FBX layers as the inputs would
+def outputName(sig):
+    if sig.systemValue == rd.ShaderBuiltin.Position:
+        return "in_POSITION0"
+    if sig.semanticName:
+        return "in_%s%d" % (sig.semanticName.upper(), sig.semanticIndex)
+
+    name = OUTPUT_PREFIX.sub("", sig.varName, count=1)
+    if not name[-1:].isdigit():
+        name += "0"
+    return "in_" + name.upper()
+
+
+# The input signature of the vertex shader of a draw, if the replay reflects it
+def inputSignature(state):
+    reflection = state.GetShaderReflection(rd.ShaderStage.Vertex)
+    return reflection.inputSignature if reflection is not None else None
+
+
+# The vertices a draw's vertex or geometry shader output, as mesh inputs over the buffer GetPostVSData
+# returns for its first instance. The outputs are interleaved in that one buffer, position first and the
+# others in signature order, so VertexFetcher reads it with a single GetBufferData call. The position is
+# the float4 clip space one, build_mesh keeps its x, y and z. Returns an empty
+# list when the replay has no such data, e.g. for a draw without a geometry shader
+def getMeshOutputs(controller, state, stage):
+    postvs = controller.GetPostVSData(0, 0, stage)
+    if postvs.vertexResourceId == rd.ResourceId.Null() or postvs.numIndices == 0:
+        return []
+
+    shader = rd.ShaderStage.Geometry if stage == rd.MeshDataStage.GSOut else rd.ShaderStage.Vertex
+    reflection = state.GetShaderReflection(shader)
+    if reflection is None:
+        return []
+
+    signature = list(reflection.outputSignature)
+    for i, sig in enumerate(signature):
+        if sig.systemValue == rd.ShaderBuiltin.Position:
+            signature.insert(0, signature.pop(i))
+            break
+
+    meshOutputs = []
+    offset = postvs.vertexByteOffset
+    for sig in signature:
+        meshOutput = MeshData()
+        meshOutput.indexResourceId = postvs.indexResourceId
+        meshOutput.indexByteOffset = postvs.indexByteOffset
+        meshOutput.indexByteStride = postvs.indexByteStride
+        meshOutput.baseVertex = postvs.baseVertex
+        meshOutput.indexOffset = 0
+        meshOutput.numIndices = postvs.numIndices
+        meshOutput.topology = postvs.topology
+        meshOutput.allowRestart = restartEnabled(postvs.allowRestart, postvs.topology)
+        meshOutput.restartIndex = postvs.restartIndex
+
+        # Older replays describe outputs by component type, newer ones by variable type
+        fmt = rd.ResourceFormat()
+        fmt.type = rd.ResourceFormatType.Regular
+        fmt.compCount = sig.compCount
+        if hasattr(sig, "varType"):
+            fmt.compByteWidth = rd.VarTypeByteSize(sig.varType)
+            fmt.compType = rd.VarTypeCompType(sig.varType)
+        else:
+            fmt.compByteWidth = 4
+            fmt.compType = sig.compType
+
+        meshOutput.format = fmt
+        meshOutput.vertexResourceId = postvs.vertexResourceId
+        meshOutput.vertexByteOffset = offset
+        meshOutput.vertexByteStride = postvs.vertexByteStride
+        meshOutput.name = outputName(sig)
+        meshOutputs.append(meshOutput)
+
+        # Every component takes 4 bytes, or 8 when 64 bit
+        offset += (8 if fmt.compByteWidth > 4 else 4) * sig.compCount
+
+    return meshOutputs
+
+
+INSTANCES_MODELS = "models"
+INSTANCES_MERGED = "merged"
+
+# Merged instances are transformed in batches of about this many polygon vertices
+INSTANCE_BATCH_SIZE = 1 << 16
+
+
+# Whether a draw is drawn as several instances. Vulkan draws and D3D's *Instanced calls are flagged
+# Instanced even for a single instance, those are exported like any other draw
+def isInstanced(draw):
+    return draw.numInstances > 1
+
+
+# The 3x4 affine transform, as rows, held by the per-instance rows of a transform attribute. A single
+# row is a translation, and a 4x4 matrix whose last row isn't (0, 0, 0, 1) is for row vectors
+def instanceMatrix(rows):
+    if len(rows) == 1:
+        x, y, z = rows[0][:3]
+        return [[1.0, 0.0, 0.0, x], [0.0, 1.0, 0.0, y], [0.0, 0.0, 1.0, z]]
+    if len(rows) == 4 and tuple(rows[3][:4]) != (0.0, 0.0, 0.0, 1.0):
+        return [[rows[0][i], rows[1][i], rows[2][i], rows[3][i]] for i in range(3)]
+    return [list(row[:4]) for row in rows[:3]]
+
+
+# The transform of every instance, from the per-instance attributes prefix0, prefix1, ... or without a
+# prefix from the first attributes named alike that make up a 3x4 or 4x4 matrix. Returns a list of
+# instanceMatrix, or None if no attributes hold a transform
+def instanceTransforms(values, count, prefix=None):
+    groups = OrderedDict()
+    for name in values:
+        match = re.match(r"(.*?)(\d+)$", name)
+        if match:
+            groups.setdefault(match.group(1), []).append((int(match.group(2)), name))
+
+    if prefix is not None:
+        names = groups.get(prefix)
+    else:
+        names = next((names for names in groups.values()
+                      if len(names) in (3, 4) and all(len(values[name][0]) == 4 for _, name in names)), None)
+    if not names or len(names) == 2:
+        return None
+
+    columns = [values[name] for _, name in sorted(names)]
+    columns = [column.tolist() if hasattr(column, "tolist") else column for column in columns]
+    return [instanceMatrix([column[i] for column in columns]) for i in range(count)]
+
+
+# Translation, euler rotation in degrees (x, then y, then z, FBX's default order) and scaling of an
+# affine transform, as FBX models hold them. Models can't hold shear, it is lost
+def decomposeTransform(m):
+    translation = [m[0][3], m[1][3], m[2][3]]
+    scaling = [math.sqrt(m[0][c] ** 2 + m[1][c] ** 2 + m[2][c] ** 2) for c in range(3)]
+
+    # A mirroring transform flips the x axis
+    det = (m[0][0] * (m[1][1] * m[2][2] - m[1][2] * m[2][1])
+           - m[0][1] * (m[1][0] * m[2][2] - m[1][2] * m[2][0])
+           + m[0][2] * (m[1][0] * m[2][1] - m[1][1] * m[2][0]))
+    if det < 0:
+        scaling[0] = -scaling[0]
+
+    r = [[m[i][j] / scaling[j] if scaling[j] else float(i == j) for j in range(3)] for i in range(3)]
+    ry = math.asin(max(-1.0, min(1.0, -r[2][0])))
+    if abs(r[2][0]) < 1.0 - 1e-9:
+        rx = math.atan2(r[2][1], r[2][2])
+        rz = math.atan2(r[1][0], r[0][0])
+    else:
+        rx = math.atan2(-r[1][2], r[1][1])
+        rz = 0.0
+    rotation = [math.degrees(rx), math.degrees(ry), math.degrees(rz)]
+
+    return tuple(tuple(round(v, 6) + 0.0 for v in values) for values in (translation, rotation, scaling))
+
+
+# The instances of an instanced draw: the per-instance attributes of every instance, read with one
+# GetBufferData call per buffer, and the transforms they hold. Like DrawSnapshot, it only holds plain
+# python data. merged picks merge_instances over a model per instance
+class DrawInstances:
+    def __init__(self, controller, instanceInputs, count, merged=False, transform=None):
+        self.count = count
+        self.merged = merged
+        self.values = OrderedDict()
+        self._digest = None
+
+        # Attributes stepping at the same rate read the same elements, a rate of 0 never steps
+        rates = OrderedDict()
+        for attr in instanceInputs:
+            rates.setdefault(attr.instanceRate, []).append(attr)
+
+        for rate, attrs in rates.items():
+            elements = (count + rate - 1) // rate if rate > 0 else 1
+            fetcher = VertexFetcher(controller, attrs, [0, elements - 1])
+            for attr in fetcher.attributes:
+                rows = fetcher.decode(attr, 0, elements)
+                if np is not None:
+                    self.values[attr.name] = rows[np.arange(count) // rate if rate > 0 else np.zeros(count, dtype=np.int64)]
+                else:
+                    self.values[attr.name] = [rows[i // rate if rate > 0 else 0] for i in range(count)]
+
+        self.transforms = instanceTransforms(self.values, count, transform)
+        profiler.current().count("instances", count)
+
+    def digest(self):
+        if self._digest is None:
+            h = hashlib.blake2b(digest_size=16)
+            h.update(repr((self.count, self.merged, list(self.values))).encode("utf-8"))
+            for rows in self.values.values():
+                h.update(rows.tobytes() if hasattr(rows, "tobytes") else repr(rows).encode("utf-8"))
+            self._digest = h.hexdigest()
+        return self._digest
+
+    # The name and transform (or None) of the model of every instance, for meshes named name
+    def models(self, name):
+        if self.transforms is None:
+            return [(name + "_" + str(i), None) for i in range(self.count)]
+        return [(name + "_" + str(i), decomposeTransform(m)) for i, m in enumerate(self.transforms)]
+
+
+# Apply affine transforms to x, y, z values, giving every transform its copy of them, rounded like the
+# decoded values. With normals, the values are directions transformed by the inverse transpose, and
+# otherwise with direction, directions transformed as is, both normalized. width is the number of
+# components per value, any past the third are copied
+def transformValues(values, transforms, width=3, direction=False, normals=False):
+    if np is not None:
+        values = np.asarray(values, dtype=np.float64).reshape(-1, width)
+        m = np.asarray(transforms, dtype=np.float64)
+        linear = m[:, :, :3]
+        if normals:
+            # The cofactor matrix, the inverse transpose scaled by the determinant
+            a, b, c = linear[:, 0], linear[:, 1], linear[:, 2]
+            cofactor = np.stack((np.cross(b, c), np.cross(c, a), np.cross(a, b)), axis=1)
+            det = np.einsum("ij,ij->i", a, cofactor[:, 0])
+            linear = cofactor * np.where(det < 0, -1.0, 1.0)[:, None, None]
+
+        # Adding 0.0 turns the -0.0 of a sum of negative zeros into 0.0, both paths must write the same
+        result = np.repeat(values[None], len(m), axis=0)
+        xyz = np.einsum("bij,vj->bvi", linear, values[:, :3]) + 0.0
+        if direction or normals:
+            length = np.linalg.norm(xyz, axis=2, keepdims=True)
+            xyz = np.divide(xyz, length, out=np.zeros_like(xyz), where=length > 0)
+        else:
+            xyz += m[:, None, :, 3]
+        result[:, :, :3] = xyz
+        return roundValues(result.ravel())
+
+    result = []
+    for m in transforms:
+        linear = [row[:3] for row in m]
+        if normals:
+            a, b, c = linear
+            cofactor = [[b[1] * c[2] - b[2] * c[1], b[2] * c[0] - b[0] * c[2], b[0] * c[1] - b[1] * c[0]],
+                        [c[1] * a[2] - c[2] * a[1], c[2] * a[0] - c[0] * a[2], c[0] * a[1] - c[1] * a[0]],
+                        [a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2], a[0] * b[1] - a[1] * b[0]]]
+            sign = -1.0 if sum(x * y for x, y in zip(a, cofactor[0])) < 0 else 1.0
+            linear = [[v * sign for v in row] for row in cofactor]
+
+        for start in range(0, len(values), width):
+            x, y, z = values[start:start + 3]
+            xyz = [row[0] * x + row[1] * y + row[2] * z + 0.0 for row in linear]
+            if direction or normals:
+                length = math.sqrt(sum(v * v for v in xyz))
+                xyz = [v / length if length > 0 else 0.0 for v in xyz]
+            else:
+                xyz = [v + row[3] for v, row in zip(xyz, m)]
+            result.extend(float("%.4f" % v) for v in xyz)
+            result.extend(values[start + 3:start + width])
+    return result
+
+
+# Copies of values, one per instance from first to last
+def repeatValues(values, first, last):
+    if np is not None:
+        return np.tile(np.asarray(values), last - first)
+    return list(values) * (last - first)
+
+
+# Every instance of a draw as one mesh: a copy of the geometry per instance, moved by its transform
+# if the instances have one, with the per-instance colors and uvs baked into its vertices. The copies
+# are made a batch of instances at a time as the mesh is written, so only the geometry of the draw
+# and one batch are held at once
+def merge_instances(mesh, instances):
+    vertexCount = len(mesh.vertices) // 3
+    indexCount = len(mesh.indices)
+    batch = max(1, INSTANCE_BATCH_SIZE // max(indexCount, 1))
+    firsts = list(range(0, instances.count, batch)) + [instances.count]
+    transforms = instances.transforms
+
+    def merged(values, load=None):
+        if load is None:
+            load = lambda first, last: repeatValues(values, first, last)
+        return ChunkedArray([first * len(values) for first in firsts],
+                            lambda k: load(firsts[k], firsts[k + 1]))
+
+    def per_instance(name, repeat, opaque=False):
+        values = instances.values[name]
+
+        def load(first, last):
+            if np is not None:
+                rows = np.repeat(np.arange(first, last), repeat)
+            else:
+                rows = [i for i in range(first, last) for _ in range(repeat)]
+            return gatherValues(values, rows, opaque=opaque)
+        return ChunkedArray([first * repeat * len(values[0]) for first in firsts],
+                            lambda k: load(firsts[k], firsts[k + 1]))
+
+    def offset_indices(first, last):
+        if np is not None:
+            indices = np.asarray(mesh.indices, dtype=np.int64)
+            return (indices[None] + (np.arange(first, last, dtype=np.int64) * vertexCount)[:, None]).ravel()
+        return [idx + i * vertexCount for i in range(first, last) for idx in mesh.indices]
+
+    result = FbxMesh()
+    result.indices = merged(mesh.indices, offset_indices)
+
+    if transforms is None:
+        result.vertices = merged(mesh.vertices)
+        result.normals = merged(mesh.normals)
+        result.tangents = merged(mesh.tangents)
+    else:
+        tangentWidth = len(mesh.tangents) // indexCount if indexCount else 3
+        result.vertices = merged(mesh.vertices, lambda first, last: transformValues(
+            mesh.vertices, transforms[first:last]))
+        result.normals = merged(mesh.normals, lambda first, last: transformValues(
+            mesh.normals, transforms[first:last], normals=True))
+        result.tangents = merged(mesh.tangents, lambda first, last: transformValues(
+            mesh.tangents, transforms[first:last], tangentWidth, direction=True))
+
+    # Per-instance color and uv sets take the place of the geometry's sets of the same number
+    colors = dict(semantics.sets(instances.values, semantics.COLOR))
+    for index in sorted(set(mesh.colors) | set(colors)):
+        if index in colors:
+            result.color_components[index] = len(instances.values[colors[index]][0])
+            result.colors[index] = per_instance(colors[index], indexCount, opaque=True)
+        else:
+            result.color_components[index] = mesh.color_components[index]
+            result.colors[index] = merged(mesh.colors[index])
+
+    uvs = dict(semantics.sets(instances.values, semantics.TEXCOORD))
+    for index in sorted(set(mesh.uvs) | set(uvs)):
+        if index in uvs:
+            result.uvs[index] = per_instance(uvs[index], vertexCount)
+        else:
+            result.uvs[index] = merged(mesh.uvs[index])
+
+    return result
+
+
+# Write a mesh to its own file, returning the size of the file. The instances of an instanced draw are
+# merged into the mesh or each get a model sharing it. It is written next to path first and
+# then moved into place, so an export that is stopped halfway never leaves a partial file behind.
+# check is called between chunks of the arrays, to stop writing a big mesh once the export is cancelled
+def write_mesh(path, mesh, fbx_format, compress_arrays, check=None, instances=None):
+    name = os.path.basename(os.path.splitext(path)[0])
+    models = None
+    if instances is not None:
+        if instances.merged:
+            mesh = merge_instances(mesh, instances)
+        else:
+            models = instances.models(name)
+    mesh.name = name
+    temp_path = path + ".tmp"
+
+    with profiler.current().stage("write"):
+        try:
+            if fbx_format == FBX_FORMAT_BINARY:
+                fbx_binary.write_mesh(temp_path, mesh, compress_arrays, check, models)
+            else:
+                fbx_ascii.write_mesh(temp_path, mesh, check, models)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    return os.path.getsize(path)
+
+
+# Decode and compact one draw, storing the decoded mesh in the export cache if there is one
+def decode_snapshot(snapshot, export_cache=None, cache_key=None, check=None):
+    mesh = build_mesh(snapshot, check)
+
+    if export_cache is not None and cache_key is not None:
+        with profiler.current().stage("cache_store"):
+            export_cache.store(cache_key, mesh, snapshot.digest())
+
+    return mesh
+
+
+# Decode, compact and write out one draw. This is the part of the export that doesn't touch
+# the replay, and it may run on a worker thread or process
+def write_snapshot(snapshot, fbx_format, compress_arrays, export_cache=None, cache_key=None, check=None):
+    mesh = decode_snapshot(snapshot, export_cache, cache_key, check)
+    return write_mesh(snapshot.path, mesh, fbx_format, compress_arrays, check, snapshot.instances)
+
+
+# Object ids of a scene are handed out counting up from here
+SCENE_FIRST_ID = 1 << 32
+
+
+# Streams every draw of an export into a single FBX scene instead of a file per draw. Each draw
+# gets a Model named after it, and draws repeating the geometry of an earlier one share its Geometry
+class SceneExport:
+    # on_written is called with the bytes the file grew by after every draw
+    def __init__(self, path, fbx_format, compress_arrays, on_written=None):
+        if fbx_format == FBX_FORMAT_BINARY:
+            self.writer = fbx_binary.SceneWriter(path, compress_arrays)
+        else:
+            self.writer = fbx_ascii.SceneWriter(path)
+
+        self.path = path
+        self.size = 0
+        self.on_written = on_written
+
+        self.next_id = SCENE_FIRST_ID
+        self.geometry_ids = {}
+        self.written_geometry = set()
+
+    def new_id(self):
+        self.next_id += 1
+        return self.next_id - 1
+
+    # Ids are picked when a draw is queued rather than when it is written, so they don't depend on
+    # the order the workers finish in, and later draws can share a geometry before it is written.
+    # Returns the function that writes the draw once its mesh is decoded. An instanced draw gets a model
+    # per instance, or a single one when its instances are merged
+    def reserve(self, path, source=None, instances=None):
+        if source is None:
+            geometry_id = self.geometry_ids[path] = self.new_id()
+        else:
+            geometry_id = self.geometry_ids[source]
+
+        name = os.path.basename(os.path.splitext(path)[0])
+        if instances is not None and not instances.merged:
+            models = [(self.new_id(), model_name, transform) for model_name, transform in instances.models(name)]
+        else:
+            models = [(self.new_id(), name, None)]
+        return partial(self.add_draw, geometry_id, models, instances)
+
+    # Write a draw, with its geometry unless it reuses the geometry of another draw (mesh is None)
+    def add_draw(self, geometry_id, models, instances=None, mesh=None):
+        # The draw holding the geometry was cancelled before it was written
+        if mesh is None and geometry_id not in self.written_geometry:
+            return
+
+        with profiler.current().stage("write"):
+            if mesh is not None:
+                if instances is not None and instances.merged:
+                    mesh = merge_instances(mesh, instances)
+                self.writer.add_geometry(mesh, geometry_id)
+                self.written_geometry.add(geometry_id)
+            for model_id, name, transform in models:
+                self.writer.add_model(name, model_id, geometry_id, transform=transform)
+
+        if self.on_written is not None:
+            size = os.path.getsize(self.path)
+            self.on_written(size - self.size)
+            self.size = size
+
+    def close(self):
+        self.writer.close()
+
+
+DEDUP_OFF = "off"
+DEDUP_MANIFEST = "manifest"
+DEDUP_HARDLINK = "hardlink"
+
+
+# Tracks the geometry already exported so repeated draws of the same buffers are only
+# decoded and written once. A draw is first matched on the buffers and ranges it reads,
+# with the last event writing each buffer so that a buffer rewritten in place between two
+# draws isn't taken for the same, which skips fetching it at all, then on a hash of the
+# fetched bytes.
+#
+# With DEDUP_MANIFEST repeated draws get no file of their own and manifest.json maps every
+# drawcall to the file holding its geometry, with DEDUP_HARDLINK they are hard linked to it
+class MeshDeduplicator:
+    def __init__(self, mode):
+        self.mode = mode
+        self.by_key = {}
+        self.by_digest = {}
+        self.manifest = OrderedDict()
+        self.links = []
+
+        self.draws = 0
+        self.key_hits = 0
+        self.digest_hits = 0
+
+    # version returns the last event writing a buffer, as BufferCache.version does
+    @staticmethod
+    def key(meshInputs, version):
+        key = []
+        for attr in meshInputs:
+            key.append((attr.name, attr.vertexResourceId, version(attr.vertexResourceId), attr.vertexByteOffset,
+                        attr.vertexByteStride) + formatKey(attr.format))
+
+        mesh = meshInputs[0]
+        indexVersion = version(mesh.indexResourceId) if mesh.indexResourceId != rd.ResourceId.Null() else 0
+        key.append((mesh.indexResourceId, indexVersion, mesh.indexByteOffset, mesh.indexByteStride,
+                    mesh.indexOffset, mesh.numIndices, mesh.baseVertex, int(mesh.topology), mesh.allowRestart,
+                    mesh.restartIndex))
+        return tuple(key)
+
+    # Returns the file already holding this geometry, if any
+    def find(self, key=None, digest=None):
+        if key is not None and key in self.by_key:
+            self.key_hits += 1
+            return self.by_key[key]
+        if digest is not None and digest in self.by_digest:
+            self.digest_hits += 1
+            return self.by_digest[digest]
+        return None
+
+    def add(self, path, key, digest):
+        if key is not None:
+            self.by_key[key] = path
+        if digest is not None:
+            self.by_digest.setdefault(digest, path)
+
+    def record(self, path, source):
+        self.draws += 1
+        self.manifest[os.path.basename(path)] = os.path.basename(source)
+        if source != path and self.mode == DEDUP_HARDLINK:
+            self.links.append((source, path))
+
+    # Called once every file has been written. Draws repeating one that was cancelled before it was
+    # written are left out
+    def finish(self, dir_path):
+        for source, path in self.links:
+            if not os.path.exists(source):
+                continue
+            if os.path.exists(path):
+                os.remove(path)
+            try:
+                os.link(source, path)
+            except OSError:
+                shutil.copyfile(source, path)
+
+        if self.mode == DEDUP_MANIFEST:
+            manifest = OrderedDict((draw, source) for draw, source in self.manifest.items()
+                                   if os.path.exists(os.path.join(dir_path, source)))
+            with open(os.path.join(dir_path, "manifest.json"), "w") as f:
+                json.dump(manifest, f, indent=4)
+
+    def summary(self):
+        hits = self.key_hits + self.digest_hits
+        rate = 100.0 * hits / self.draws if self.draws else 0.0
+        return "%d draws, %d unique meshes, %d reused (%d by binding, %d by content, %.1f%% hit rate)" % (
+            self.draws, self.draws - hits, hits, self.key_hits, self.digest_hits, rate)
+
+
+# The layout of a vertex attribute, comparable and hashable unlike a ResourceFormat
+def formatKey(fmt):
+    return (int(fmt.type), int(fmt.compType), fmt.compByteWidth, fmt.compCount, fmt.BGRAOrder())
+
+
+# The index buffer, vertex buffers and input layout bound at a draw, with the attributes already
+# resolved to the layers they go to. Draws sharing them only differ in the offsets the buffers are
+# bound at and the ranges they read, so the mesh inputs are built once and only those are updated
+class InputBindings:
+    def __init__(self, ib, vbs, attrs, primitive, names):
+        # The mesh input of every attribute, with the vertex buffer, offset and step it is read with
+        self.attributes = []
+        for attr in attrs:
+            meshInput = MeshData()
+            meshInput.indexResourceId = ib.resourceId
+            meshInput.topology, meshInput.allowRestart, meshInput.restartIndex = primitive
+            meshInput.format = attr.format
+            meshInput.vertexResourceId = vbs[attr.vertexBuffer].resourceId
+            meshInput.vertexByteStride = vbs[attr.vertexBuffer].byteStride
+            meshInput.name = names[attr.name]
+            if attr.perInstance:
+                meshInput.instanceRate = attr.instanceRate
+            self.attributes.append((meshInput, attr.vertexBuffer, attr.byteOffset, attr.perInstance))
+
+    # The mesh inputs of a draw reading these bindings, as the lists of per vertex and per instance inputs.
+    # They are updated in place, so only hold until the next draw reading the same bindings
+    def mesh_inputs(self, draw, ib, vbs):
+        meshInputs = []
+        instanceInputs = []
+        for meshInput, vertexBuffer, byteOffset, perInstance in self.attributes:
+            meshInput.indexByteOffset = ib.byteOffset
+            meshInput.indexByteStride = draw.indexByteWidth
+            meshInput.baseVertex = draw.baseVertex
+            meshInput.indexOffset = draw.indexOffset
+            meshInput.numIndices = draw.numIndices
+
+            # If the draw doesn't use an index buffer, don't use it even if bound
+            if draw.flags & rd.DrawFlags.Indexed:
+                meshInput.indexResourceId = ib.resourceId
+            else:
+                meshInput.indexResourceId = rd.ResourceId.Null()
+
+            # Instance data starts at the first instance of the draw, and steps every instanceRate instances
+            byteOffset += vbs[vertexBuffer].byteOffset
+            if perInstance:
+                meshInput.vertexByteOffset = byteOffset + draw.instanceOffset * meshInput.vertexByteStride
+                instanceInputs.append(meshInput)
+            else:
+                meshInput.vertexByteOffset = byteOffset + draw.vertexOffset * meshInput.vertexByteStride
+                meshInputs.append(meshInput)
+        return meshInputs, instanceInputs
+
+
+# The input bindings of the draws exported so far, keyed on the vertex shader and everything bound
+# for it to read but the offsets. Consecutive draws mostly keep the bindings of the one before, so
+# the layout is only walked and its names resolved once for them all
+class BindingsCache:
+    def __init__(self, resolver):
+        self.resolver = resolver
+        self.bindings = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(state, ib, vbs, attrs):
+        return (
+            state.GetShader(rd.ShaderStage.Vertex),
+            ib.resourceId,
+            tuple((vb.resourceId, vb.byteStride) for vb in vbs),
+            tuple((attr.name, attr.vertexBuffer, attr.byteOffset, attr.perInstance, attr.instanceRate)
+                  + formatKey(attr.format) for attr in attrs if attr.used),
+            (state.GetPrimitiveTopology(), restartEnabled(state.IsRestartEnabled(), state.GetPrimitiveTopology()),
+             state.GetRestartIndex()),
+        )
+
+    # The mesh inputs of a draw, as InputBindings.mesh_inputs
+    def mesh_inputs(self, state, draw):
+        ib = state.GetIBuffer()
+        vbs = state.GetVBuffers()
+        attrs = state.GetVertexInputs()
+
+        key = self.key(state, ib, vbs, attrs)
+        bindings = self.bindings.get(key)
+        if bindings is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            attrs = [attr for attr in attrs if attr.used]
+
+            # Vertex inputs are matched to the input signature of the vertex shader
+            names = self.resolver.resolve(key[0], [attr.name for attr in attrs], partial(inputSignature, state))
+            bindings = self.bindings[key] = InputBindings(ib, vbs, attrs, key[-1], names)
+        return bindings.mesh_inputs(draw, ib, vbs)
+
+    def summary(self):
+        return "input bindings: %d built, %d reused" % (self.misses, self.hits)
 
 
 def change_triangle_orient(list):
@@ -182,79 +1601,331 @@ def change_triangle_orient(list):
             list[i - 2] = temp
 
 
+# Seconds between two progress updates
+PROGRESS_INTERVAL = 0.25
+
+TEXTURE_MANIFEST_NAME = "texture_manifest.json"
+
+CACHE_WITHOUT_CAPTURE = "cache: off, the capture file to key its entries on isn't known"
+
+# Number of skipped drawcalls named in the summary of an export
+SKIPPED_LISTED = 10
+
+
+# Raised within an export that has been cancelled
+class ExportCancelled(Exception):
+    pass
+
+
+# Where an export is, as handed to the progress callback
+class ProgressReport:
+    def __init__(self, done, total, bytes_written, seconds, cancelled):
+        self.done = done
+        self.total = total
+        self.bytes_written = bytes_written
+        self.seconds = seconds
+        self.cancelled = cancelled
+
+    # Estimated seconds left, from the time taken by the drawcalls done so far
+    def eta(self):
+        if not self.done or self.done >= self.total:
+            return None
+        return self.seconds / self.done * (self.total - self.done)
+
+    def text(self):
+        text = "%d / %d drawcalls, %.1f MB written" % (self.done, self.total, self.bytes_written / (1 << 20))
+        eta = self.eta()
+        if self.cancelled:
+            text += ", cancelling"
+        elif eta is not None:
+            text += ", %d:%02d left" % divmod(int(eta + 0.5), 60)
+        return text
+
+
+# Progress of an export, reported to callback from the replay thread at most every interval seconds.
+# cancel may be called from any thread, the export then stops before the next drawcall, or the next
+# stage of decoding a big one, and finishes off the files of the drawcalls exported so far
+class ExportProgress:
+    def __init__(self, callback=None, interval=PROGRESS_INTERVAL):
+        self.callback = callback
+        self.interval = interval
+        self.cancelled = False
+
+        self.done = 0
+        self.total = 0
+        self.bytes_written = 0
+        self.start = time.perf_counter()
+        self.last_update = None
+
+    def cancel(self):
+        self.cancelled = True
+
+    def check(self):
+        if self.cancelled:
+            raise ExportCancelled()
+
+    def begin(self, total):
+        self.total = total
+        self.start = time.perf_counter()
+        self.update(force=True)
+
+    def advance(self):
+        self.done += 1
+        self.update()
+
+    def add_bytes(self, n):
+        self.bytes_written += n
+
+    def report(self):
+        return ProgressReport(self.done, self.total, self.bytes_written, time.perf_counter() - self.start,
+                              self.cancelled)
+
+    def update(self, force=False):
+        if self.callback is None:
+            return
+
+        now = time.perf_counter()
+        if not force and self.last_update is not None and now - self.last_update < self.interval:
+            return
+        self.last_update = now
+        self.callback(self.report())
+
+
+# Exports a range of drawcalls through a replay controller. It doesn't need the UI, so the same
+# code runs on the replay thread of RenderDoc (export_wrap) and from the command line (__main__.py)
 class Exporter:
-    def __init__(self, ctx, startDrawcallId, endDrawcallId, is_save_texture, path, r):
-        self.ctx = ctx
+    def __init__(self, r, startDrawcallId, endDrawcallId, is_save_texture, path,
+                 fbx_format=FBX_FORMAT_ASCII, compress_arrays=True, workers=0, use_processes=False,
+                 dedup=DEDUP_OFF, capture_path=None, cache_dir=None, cache_max_bytes=cache.DEFAULT_MAX_BYTES,
+                 invalidate_cache=False, scene=False, texture_format=textures.TEXTURE_FORMAT_PNG,
+                 texture_workers=textures.DEFAULT_WORKERS, texture_dedup=True, profile=False, progress=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE, marker=None, instances=INSTANCES_MODELS, instance_transform=None,
+                 vertex_source=VERTEX_SOURCE_INPUTS, semantic_map=None,
+                 buffer_cache_bytes=buffers.DEFAULT_MAX_BYTES, report_path=None):
         self.path = path
+        # The texture manifest and the profile report go to report_path, the farm gives every shard
+        # of a capture a folder of its own for them
+        self.report_path = report_path if report_path is not None else path
         self.r = r
+        self.progress = progress if progress is not None else ExportProgress()
+
+        # Stages run on this thread report to the export's profiler, which does nothing unless profiling
+        self.profiler = profiler.Profiler(profile)
+        profiler.set_current(self.profiler)
         self.is_save_texture = is_save_texture
+        self.fbx_format = fbx_format
+        self.compress_arrays = compress_arrays
+
+        # With workers, the replay thread only fetches each draw and hands decoding and writing to a pool.
+        # Threads only overlap that with the replay calls, as decoding mostly holds the GIL: on 1000 small
+        # draws two of them were 0.92 times as fast as no workers, and 1.19 times with 0.5 ms per replay
+        # call, so the UI doesn't offer them. Processes sidestep the GIL, but can only be spawned from
+        # standalone python and only pay off with a core each
+        self.workers = workers
+        self.use_processes = use_processes
+        self.pool = None
+        self.pending = []
+
+        # Draws with more indices than chunk_size are exported a chunk at a time on this thread, 0 never does
+        self.chunk_size = chunk_size
+
+        # Instanced draws get a model per instance sharing the geometry, or are merged into one mesh.
+        # instance_transform is the name, without its row number, of the attribute holding their transforms
+        self.instances = instances
+        self.instance_transform = instance_transform
+
+        # Draws are exported from their vertex inputs, or from what their vertex or geometry shader output
+        self.vertex_source = vertex_source
+
+        self.dedup = MeshDeduplicator(dedup) if dedup != DEDUP_OFF else None
+        self.scene = None
+
+        # The export cache needs the capture file to key its entries on
+        self.cache = None
+        self.cache_dir = cache_dir
+        if cache_dir is not None:
+            self.cache = cache.ExportCache(cache_dir, cache_max_bytes)
+            if invalidate_cache:
+                self.cache.clear()
+            if capture_path:
+                self.capture_hash = cache.hash_capture(capture_path)
+            else:
+                self.cache = None
+                print(CACHE_WITHOUT_CAPTURE)
 
+        # result is why the export as a whole failed, skipped the drawcalls it couldn't export and why,
+        # and nothing_selected whether it failed because the range held no drawcalls
         self.result = None
-        self.textures = self.r.GetTextures()
-        self.saved_textures = set()
-
-        root_drawcalls = self.r.GetDrawcalls()
-        drawcalls = {}
-        for draw in root_drawcalls:
-            if len(draw.children) > 0:
-                for child in draw.children:
-                    drawcalls[child.drawcallId] = child
-            else:
-                drawcalls[draw.drawcallId] = draw
+        self.skipped = []
+        self.selected_count = 0
+        self.nothing_selected = False
+
+        self.saved_textures = {}
+        self.draw_textures = OrderedDict()
+        self.texture_saver = None
+        self.draw_count = 0
+
+        # Buffer contents read for one draw are kept for the next ones reading the same buffers,
+        # buffer_cache_bytes 0 reads every draw's ranges from the replay
+        self.buffers = buffers.BufferCache(r, buffer_cache_bytes)
+        self.bindings = None
+
+        # Attributes are matched to the layers they go to by their names, by the semantics of the shader's
+        # signature, and first of all by the patterns of the user's mapping file if given
+        mapping = None
+        if semantic_map is not None:
+            try:
+                mapping = semantics.load_mapping(semantic_map)
+            except (IOError, OSError, ValueError, re.error) as e:
+                self.abort("not a valid semantic map: " + str(e))
+                return
+        self.semantics = semantics.SemanticResolver(mapping)
+        self.bindings = BindingsCache(self.semantics)
+
+        # Index textures and resource names by id once, captures can have tens of thousands of them
+        self.textures = {}
+        for tex in self.r.GetTextures():
+            self.textures[tex.resourceId] = tex
+
+        self.resource_names = {}
+        for res in self.r.GetResources():
+            self.resource_names[res.resourceId] = res.name
+
+        # Every draw of the capture, however deeply nested in markers, is looked up once. Without a
+        # range every drawcall is exported, and with a marker pattern only the draws under matching markers
+        with self.profiler.stage("index_drawcalls"):
+            index = drawcalls.DrawcallIndex(self.r.GetDrawcalls())
+            try:
+                selected = index.select(startDrawcallId, endDrawcallId, marker)
+            except re.error as e:
+                self.abort("not a valid marker pattern: " + str(e))
+                return
 
-        try:
-            drawcalls[startDrawcallId]
-        except:
-            self.result = "not a valid start drawcall id"
+        if not selected:
+            self.nothing_selected = True
+            result = "no drawcalls to export in the given range"
+            if marker is not None:
+                result += " under a marker matching " + marker
+            self.abort(result)
             return
 
+        self.selected_count = len(selected)
+        if startDrawcallId is None:
+            startDrawcallId = selected[0].drawcallId
+        if endDrawcallId is None:
+            endDrawcallId = selected[-1].drawcallId
+
+        # In scene mode the whole range goes to one file, the draws still get their own paths to name them
+        if scene:
+            scene_path = self.path + "/drawcall_" + str(startDrawcallId) + "-" + str(endDrawcallId) + ".fbx"
+            self.scene = SceneExport(scene_path, fbx_format, compress_arrays, self.progress.add_bytes)
+
+        # Textures are matched on their pixels, also across exports, unless texture_dedup is off. Repeated
+        # ones are hard linked to the file holding them with DEDUP_HARDLINK, else referred to that file
+        if self.is_save_texture:
+            index_dir = self.path + "/Textures" if texture_dedup else None
+            self.texture_saver = textures.TextureSaver(self.r, texture_format, texture_workers,
+                                                       index_dir=index_dir, link=dedup == DEDUP_HARDLINK,
+                                                       profiler=self.profiler)
+
+        if self.workers > 0:
+            if use_processes:
+                self.pool = concurrent.futures.ProcessPoolExecutor(self.workers)
+            else:
+                self.pool = concurrent.futures.ThreadPoolExecutor(self.workers)
+
         try:
-            drawcalls[endDrawcallId]
-        except:
-            self.result = "not a valid end drawcall id"
-            return
+            self.progress.begin(len(selected))
+            try:
+                for draw in selected:
+                    self.progress.check()
+                    self.export_by_drawcall(draw)
+                    self.progress.advance()
+            except ExportCancelled:
+                # Drop the draws the workers haven't started on, the ones they have stop at their next check
+                for future, then in self.pending:
+                    future.cancel()
+
+            while self.pending:
+                self.finish_task(*self.pending.pop(0))
+
+            if self.progress.cancelled and self.result is None:
+                self.result = "export cancelled after %d of %d drawcalls" % (self.progress.done, self.progress.total)
+
+            if self.is_save_texture:
+                self.write_texture_manifest()
+
+            if self.dedup is not None:
+                if self.scene is None:
+                    self.dedup.finish(self.path)
+                print(self.dedup.summary())
+
+            if self.cache is not None:
+                self.cache.evict()
+                print(self.cache.summary())
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown()
+            if self.scene is not None:
+                self.scene.close()
+            if self.texture_saver is not None:
+                self.texture_saver.finish()
+
+            self.progress.update(force=True)
+
+            if self.profiler.enabled:
+                self.profiler.finish()
+                self.count_results()
+                self.profiler.write(os.path.join(self.report_path, profiler.REPORT_NAME))
+            profiler.set_current(profiler.NULL_PROFILER)
+
+    # Give up on the export before it starts, for the given reason
+    def abort(self, result):
+        self.result = result
+        profiler.set_current(profiler.NULL_PROFILER)
 
-        for drawcallId in range(startDrawcallId, endDrawcallId + 1):
-            self.export_by_drawcall(drawcalls[drawcallId])
-            
     def get_tex(self, resid: rd.ResourceId):
-        for t in self.textures:
-            if t.resourceId == resid:
-                return t
-        return None
+        return self.textures.get(resid)
 
-    def save_texture(self, resourceId):
-        texsave = rd.TextureSave()
-        texsave.resourceId = resourceId
-        texsave.alpha = rd.AlphaMapping.Preserve
-        texsave.destType = rd.FileType.PNG
+    def get_resource_name(self, resid: rd.ResourceId):
+        return self.resource_names.get(resid, str(resid))
 
-        tex_name = self.ctx.GetResource(resourceId).name
+    def save_texture(self, resourceId):
+        tex_name = self.get_resource_name(resourceId)
 
         dir_path = self.path + "/Textures/"
 
         if not os.path.exists(dir_path):
             os.mkdir(dir_path)
 
-        texture = self.get_tex(resourceId)
-        if texture.arraysize > 1:
-            for index in range(texture.arraysize):
-                texsave.slice.sliceIndex = index
-                filename = dir_path + tex_name + "_" + str(index) + ".png"
-                result = self.r.SaveTexture(texsave, filename)
-                print("save texture," + filename + ",result="+str(result))
-        else:
-            filename = dir_path + tex_name + ".png"
-            result = self.r.SaveTexture(texsave, filename)
-            print("save texture," + filename + ",result="+str(result))
+        # Only the pixels are read here, they are encoded and written on the texture saver's threads
+        return self.texture_saver.save(self.get_tex(resourceId), dir_path + tex_name)
 
-    def save_textures(self, state):
+    # Save the textures a draw reads that aren't saved yet, and note the files it uses for the texture manifest
+    def save_textures(self, state, save_path):
+        files = []
         resourceArray = state.GetReadOnlyResources(rd.ShaderStage.Fragment, True)
         for i, boundResource in enumerate(resourceArray):
             resourceId = boundResource.resources[0].resourceId
-            if resourceId != rd.ResourceId.Null() and resourceId not in self.saved_textures:
-                self.save_texture(resourceId)
-                self.saved_textures.add(resourceId)
+            if resourceId == rd.ResourceId.Null():
+                continue
+            if resourceId not in self.saved_textures:
+                self.saved_textures[resourceId] = self.save_texture(resourceId)
+            files += [os.path.relpath(path, self.path).replace(os.sep, "/") for path in self.saved_textures[resourceId]]
+
+        self.draw_textures[os.path.basename(save_path)] = files
+
+    # Texture paths are relative to the export folder, wherever the manifest goes. Draws cancelled after
+    # their textures were saved but before their file was written are left out, as from the dedup manifest
+    def write_texture_manifest(self):
+        draw_textures = self.draw_textures
+        if self.progress.cancelled and self.scene is None:
+            sources = self.dedup.manifest if self.dedup is not None else {}
+            draw_textures = OrderedDict((draw, files) for draw, files in draw_textures.items()
+                                        if os.path.exists(os.path.join(self.path, sources.get(draw, draw))))
+
+        with open(os.path.join(self.report_path, TEXTURE_MANIFEST_NAME), "w") as f:
+            json.dump(draw_textures, f, indent=4)
 
     def export_constants(self, state, stage):
         shader = state.GetShader(stage)
@@ -297,300 +1968,329 @@ class Exporter:
                 with open(self.path + "/" + name + ".json", "w") as f:
                     f.write(json_str)
         
+    # Options that change the decoded geometry of a draw, and so are part of the export cache key
+    def mesh_options(self):
+        options = {}
+        if self.vertex_source != VERTEX_SOURCE_INPUTS:
+            options["vertex_source"] = self.vertex_source
+        if self.semantics.digest() is not None:
+            options["semantics"] = self.semantics.digest()
+        return options
+
     def export_by_drawcall(self, draw):
-        self.r.SetFrameEvent(draw.eventId, False)
-        state = self.r.GetPipelineState()
+        finalPath = self.path + "/drawcall_" + str(draw.drawcallId) + ".fbx"
+        self.profiler.begin_draw(os.path.basename(finalPath))
+
+        # The cache only holds the geometry, instanced draws need their instances read from the replay
+        # unless exported from their shader output
+        cache_key = None
+        if self.cache is not None and (self.vertex_source != VERTEX_SOURCE_INPUTS or not isInstanced(draw)):
+            cache_key = self.cache.key(self.capture_hash, draw.eventId, draw.drawcallId, self.mesh_options())
+            mesh = FbxMesh()
+            with self.profiler.stage("cache_load"):
+                digest = self.cache.load(cache_key, mesh)
+
+            # Cached draws only need the replay for their textures
+            if digest is not None:
+                if self.is_save_texture:
+                    self.set_frame_event(draw.eventId)
+                    self.save_textures(self.get_pipeline_state(), finalPath)
+                print(finalPath)
+                self.draw_count += 1
+                self.export_cached(finalPath, mesh, digest)
+                return
+
+        self.set_frame_event(draw.eventId)
+        state = self.get_pipeline_state()
 
         # self.export_constants(state, rd.ShaderStage.Vertex)
         # self.export_constants(state, rd.ShaderStage.Fragment)
 
         if self.is_save_texture:
-            self.save_textures(state)
+            self.save_textures(state, finalPath)
+
+        # Shader outputs are already instanced, for the first instance
+        if self.vertex_source != VERTEX_SOURCE_INPUTS:
+            with self.profiler.stage("GetPostVSData"):
+                meshOutputs = self.get_mesh_outputs(state)
+            if not meshOutputs:
+                self.skip(finalPath, "Current Draw Call lack of Vertex")
+                return
+            if meshOutputs[0].topology in UNSUPPORTED_TOPOLOGIES:
+                self.skip(finalPath, "%s can't be exported as triangles" % meshOutputs[0].topology.name)
+                return
+            self.resolve_semantics(meshOutputs)
+
+            print(finalPath)
+            self.draw_count += 1
+            self.export_fbx(finalPath, meshOutputs, cache_key)
+            return
 
         # Get the index & vertex buffers, and fixed vertex inputs
-        ib = state.GetIBuffer()
-        vbs = state.GetVBuffers()
-        attrs = state.GetVertexInputs()
+        with self.profiler.stage("input_bindings"):
+            meshInputs, instanceInputs = self.bindings.mesh_inputs(state, draw)
 
-        meshInputs = []
-        for attr in attrs:
-            if not attr.used:
-                continue
-            elif attr.perInstance:
-                # We don't handle instance attributes
-                self.result = "Instanced properties are not supported!"
-                return
+        if not meshInputs:
+            self.skip(finalPath, "Current Draw Call lack of Vertex")
+            return
 
-            meshInput = MeshData()
-            meshInput.indexResourceId = ib.resourceId
-            meshInput.indexByteOffset = ib.byteOffset
-            meshInput.indexByteStride = draw.indexByteWidth
-            meshInput.baseVertex = draw.baseVertex
-            meshInput.indexOffset = draw.indexOffset
-            meshInput.numIndices = draw.numIndices
+        if meshInputs[0].topology in UNSUPPORTED_TOPOLOGIES:
+            self.skip(finalPath, "%s can't be exported as triangles" % meshInputs[0].topology.name)
+            return
 
-            # If the draw doesn't use an index buffer, don't use it even if bound
-            if not (draw.flags & rd.DrawFlags.Indexed):
-                meshInput.indexResourceId = rd.ResourceId.Null()
+        # Instances without per-instance attributes would all be drawn in the same place, they are
+        # exported as the one mesh they all are
+        instances = None
+        if isInstanced(draw) and instanceInputs:
+            with self.profiler.stage("fetch_instances"):
+                instances = DrawInstances(self.buffers, instanceInputs, draw.numInstances,
+                                          self.instances == INSTANCES_MERGED, self.instance_transform)
 
-            # The total offset is the attribute offset from the base of the vertex
-            meshInput.vertexByteOffset = (
-                attr.byteOffset
-                + vbs[attr.vertexBuffer].byteOffset
-                + draw.vertexOffset * vbs[attr.vertexBuffer].byteStride
-            )
-            meshInput.format = attr.format
-            meshInput.vertexResourceId = vbs[attr.vertexBuffer].resourceId
-            meshInput.vertexByteStride = vbs[attr.vertexBuffer].byteStride
-            meshInput.name = attr.name
+        print(finalPath)
+        self.draw_count += 1
+        self.export_fbx(finalPath, meshInputs, cache_key, instances)
+
+    # Give the shader outputs of a draw the names of the layers they go to, they were already named
+    # after their signature
+    def resolve_semantics(self, meshOutputs):
+        names = self.semantics.resolve(None, [meshOutput.name for meshOutput in meshOutputs])
+        for meshOutput in meshOutputs:
+            meshOutput.name = names[meshOutput.name]
+
+    # Draws without a geometry shader have no GSOut data, their vertex shader output is exported instead
+    def get_mesh_outputs(self, state):
+        meshOutputs = []
+        if self.vertex_source == VERTEX_SOURCE_GSOUT:
+            meshOutputs = getMeshOutputs(self.r, state, rd.MeshDataStage.GSOut)
+        if not meshOutputs:
+            meshOutputs = getMeshOutputs(self.r, state, rd.MeshDataStage.VSOut)
+        return meshOutputs
+
+    def set_frame_event(self, eventId):
+        with self.profiler.stage("SetFrameEvent"):
+            self.r.SetFrameEvent(eventId, False)
+        self.buffers.set_event(eventId)
+
+    def get_pipeline_state(self):
+        with self.profiler.stage("GetPipelineState"):
+            return self.r.GetPipelineState()
+
+    # Run part of the export that doesn't need the replay, on the worker pool if there is one.
+    # then is called with the result back on the replay thread, in the order the tasks were queued
+    def run_task(self, task, *args, then=None):
+        if self.pool is None:
+            result = task(*args)
+            if then is not None:
+                then(result)
+            return
 
-            meshInputs.append(meshInput)
+        # Don't let the replay thread run too far ahead of the workers, each queued draw holds its buffer data
+        if len(self.pending) >= self.workers * 2:
+            self.finish_task(*self.pending.pop(0))
 
-        finalPath = self.path + "/drawcall_" + str(draw.drawcallId) + ".fbx"
-        print(finalPath)
-        self.export_fbx(finalPath, meshInputs)
+        # Workers measure the task with a profiler of their own, merged in with the result
+        if self.profiler.enabled:
+            then = partial(self.finish_profiled, self.profiler.draw, then)
+            self.pending.append((self.pool.submit(profiler.run_profiled, task, *args), then))
+        else:
+            self.pending.append((self.pool.submit(task, *args), then))
+
+    def finish_profiled(self, draw, then, result):
+        result, data = result
+        self.profiler.merge(data, draw)
+        if then is not None:
+            then(result)
+
+    # Queue a result that is already known behind the running tasks, to keep the order of the results
+    def queue_result(self, result, then):
+        if self.pool is None:
+            then(result)
+            return
 
-    def export_fbx(self, save_path, meshInputs):
-        indices = getIndices(self.r, meshInputs[0])
-        if not indices:
-            self.result = "Current Draw Call lack of Vertex"
+        future = concurrent.futures.Future()
+        future.set_result(result)
+        self.pending.append((future, then))
+
+    def finish_task(self, future, then):
+        try:
+            result = future.result()
+        except (concurrent.futures.CancelledError, ExportCancelled):
             return
+        if then is not None:
+            then(result)
+
+    # The cancel check handed to decoding, worker processes can't see the flag of this process
+    def cancel_check(self):
+        if self.pool is not None and self.use_processes:
+            return None
+        return self.progress.check
+
+    # A draw repeating the geometry of an earlier draw, exported at source
+    def export_repeat(self, save_path, source, instances=None):
+        self.dedup.record(save_path, source)
+        if self.scene is not None:
+            self.queue_result(None, self.scene.reserve(save_path, source, instances))
+
+    def export_cached(self, save_path, mesh, digest):
+        if self.dedup is not None:
+            source = self.dedup.find(digest=digest)
+            if source is not None:
+                self.export_repeat(save_path, source)
+                return
 
-        save_name = os.path.basename(os.path.splitext(save_path)[0])
+            self.dedup.add(save_path, None, digest)
+            self.dedup.record(save_path, save_path)
 
-        idx_list = []
-        self.value_dict = defaultdict(list)
-        self.vertex_data = defaultdict(OrderedDict)
-        idx2newIdx = defaultdict(list)
-        newIdx = 0
-        for i, idx in enumerate(indices):
+        if self.scene is not None:
+            self.queue_result(mesh, self.scene.reserve(save_path))
+        else:
+            self.run_task(write_mesh, save_path, mesh, self.fbx_format, self.compress_arrays, self.cancel_check(),
+                          then=self.progress.add_bytes)
+
+    def export_fbx(self, save_path, meshInputs, cache_key=None, instances=None):
+        key = None
+        if self.dedup is not None:
+            # Instanced draws only repeat each other with the same instances. The replay reuses the buffers
+            # it writes shader outputs to, so those can only be matched by their contents
+            if self.vertex_source == VERTEX_SOURCE_INPUTS:
+                key = MeshDeduplicator.key(meshInputs, self.buffers.version)
+                if instances is not None:
+                    key += (instances.digest(),)
+            source = self.dedup.find(key=key)
+            if source is not None:
+                self.export_repeat(save_path, source, instances)
+                return
 
-            if idx not in idx2newIdx:
-                idx2newIdx[idx] = newIdx
-                newIdx = newIdx + 1
+        # Merging instances needs the whole geometry, instanced draws are never chunked
+        if instances is None and self.chunk_size > 0 and meshInputs[0].numIndices > self.chunk_size:
+            self.export_chunked(save_path, meshInputs, key)
+            return
 
-            idx_list.append(idx2newIdx[idx])
+        indices = getIndices(self.buffers, meshInputs[0])
+        if not len(indices):
+            self.skip(save_path, "Current Draw Call lack of Vertex")
+            return
 
-            for attr in meshInputs:
+        snapshot = DrawSnapshot(save_path, indices, VertexFetcher(self.buffers, meshInputs, indices), instances)
 
-                if idx not in self.vertex_data[attr.name]:
-                    
-                    # This is the data we're reading from. This would be good to cache instead of
-                    # re-fetching for every attribute for every index
-                    offset = attr.vertexByteOffset + attr.vertexByteStride * idx
-                    data = self.r.GetBufferData(attr.vertexResourceId, offset, attr.vertexByteStride)
-
-                    # Get the value from the data
-                    value = unpackData(attr.format, data)
-
-                    self.vertex_data[attr.name][idx] = value
-
-                self.value_dict[attr.name].append(self.vertex_data[attr.name][idx])
-
-        # change_triangle_orient(idx_list)
-
-        self.idx_data = ",".join([str(v) for v in idx_list])
-        self.idx_len = len(idx_list)
-
-        ARGS = {"model_name": save_name}
-        vertices = [str(v) for values in self.vertex_data["in_POSITION0"].values() for v in values]
-        # vertices = [str(-v) if i == 0 else str(v) for values in self.vertex_data["in_POSITION0"].values() for i, v in enumerate(values)]
-        ARGS["vertices"] = ",".join(vertices)
-        ARGS["vertices_num"] = len(vertices)
-
-        polygons = [str(v) if i % 3 else str(-(v + 1)) for i, v in enumerate(idx_list, 1)]
-        ARGS["polygons"] = ",".join(polygons)
-        ARGS["polygons_num"] = len(polygons)
-
-        self.build_normal()
-        self.build_tangent()
-        self.build_color()
-        self.build_uv0()
-        self.build_uv1()
-
-        ARGS.update(
-            {
-                "LayerElementNormal": self.LayerElementNormal,
-                "LayerElementNormalInsert": self.LayerElementNormalInsert,
-                "LayerElementTangent": self.LayerElementTangent,
-                "LayerElementTangentInsert": self.LayerElementTangentInsert,
-                "LayerElementColor": self.LayerElementColor,
-                "LayerElementColorInsert": self.LayerElementColorInsert,
-                "LayerElementUV": self.LayerElementUV,
-                "LayerElementUVInsert": self.LayerElementUVInsert,
-                "LayerElementUV1": self.LayerElementUV1,
-                "LayerElementUV1Insert": self.LayerElementUV1Insert,
-            }
-        )
+        if self.dedup is not None:
+            digest = snapshot.digest()
+            source = self.dedup.find(digest=digest)
+            if source is not None:
+                self.dedup.add(source, key, digest)
+                self.export_repeat(save_path, source, instances)
+                return
+
+            self.dedup.add(save_path, key, digest)
+            self.dedup.record(save_path, save_path)
+
+        if self.scene is not None:
+            self.run_task(decode_snapshot, snapshot, self.cache, cache_key, self.cancel_check(),
+                          then=self.scene.reserve(save_path, instances=instances))
+        else:
+            self.run_task(write_snapshot, snapshot, self.fbx_format, self.compress_arrays, self.cache, cache_key,
+                          self.cancel_check(), then=self.progress.add_bytes)
+
+    # Export a huge draw reading and writing it a chunk of indices at a time. The chunks are read from
+    # the replay as they are written, so this runs on the replay thread after the queued draws. It is
+    # never hashed or cached, that would need all of it at once
+    def export_chunked(self, save_path, meshInputs, key):
+        mesh = build_chunked_mesh(self.buffers, meshInputs, self.chunk_size, self.progress.check)
+        if not len(mesh.indices):
+            self.skip(save_path, "Current Draw Call lack of Vertex")
+            return
 
-        fbx = FBX_ASCII_TEMPLETE % ARGS
-
-        with open(save_path, "w") as f:
-            f.write(dedent(fbx).strip())
-
-    def build_normal(self):
-        self.LayerElementNormal = ""
-        self.LayerElementNormalInsert = ""
-        has_normal = self.vertex_data.get("in_NORMAL0")
-        if has_normal:
-            normals = [str(values[v]) for values in self.value_dict["in_NORMAL0"] for v in [0,1,2]]
-
-            self.LayerElementNormal = """
-            LayerElementNormal: 0 {
-                Version: 101
-                Name: ""
-                MappingInformationType: "ByPolygonVertex"
-                ReferenceInformationType: "Direct"
-                Normals: *%(normals_num)s {
-                    a: %(normals)s
-                }
-            }""" % {
-                "normals": ",".join(normals),
-                "normals_num": len(normals),
-            }
-            self.LayerElementNormalInsert = """
-                LayerElement:  {
-                    Type: "LayerElementNormal"
-                    TypedIndex: 0
-                }"""
-    
-    def build_tangent(self):
-        self.LayerElementTangent = ""
-        self.LayerElementTangentInsert = ""
-        has_tangent = self.vertex_data.get("in_TANGENT0")
-        if has_tangent:
-            tangents = [str(v) for values in self.value_dict["in_TANGENT0"] for v in values]
-            self.LayerElementTangent = """
-            LayerElementTangent: 0 {
-                Version: 101
-                Name: ""
-                MappingInformationType: "ByPolygonVertex"
-                ReferenceInformationType: "Direct"
-                Tangents: *%(tangents_num)s {
-                    a: %(tangents)s
-                } 
-            }""" % {
-                "tangents": ",".join(tangents),
-                "tangents_num": len(tangents),
-            }
-
-            self.LayerElementTangentInsert = """
-                LayerElement:  {
-                    Type: "LayerElementTangent"
-                    TypedIndex: 0
-                }"""
-
-    def build_color(self):
-        self.LayerElementColor = ""
-        self.LayerElementColorInsert = ""
-        has_color = self.vertex_data.get("in_COLOR0")
-        if has_color:
-            colors = [
-                str(v) if i % 4 else "1"
-                for values in self.value_dict["in_COLOR0"]
-                for i, v in enumerate(values, 1)
-            ]
-
-            self.LayerElementColor = """
-                LayerElementColor: 0 {
-                    Version: 101
-                    Name: "colorSet1"
-                    MappingInformationType: "ByPolygonVertex"
-                    ReferenceInformationType: "IndexToDirect"
-                    Colors: *%(colors_num)s {
-                        a: %(colors)s
-                    } 
-                    ColorIndex: *%(colors_indices_num)s {
-                        a: %(colors_indices)s
-                    } 
-                }""" % {
-                "colors": ",".join(colors),
-                "colors_num": len(colors),
-                "colors_indices": ",".join([str(i) for i in range(self.idx_len)]),
-                "colors_indices_num": self.idx_len,
-            }
-            self.LayerElementColorInsert = """
-                LayerElement:  {
-                    Type: "LayerElementColor"
-                    TypedIndex: 0
-                }"""
-
-    def build_uv0(self):
-        self.LayerElementUV = ""
-        self.LayerElementUVInsert = ""
-        has_uv = self.vertex_data.get("in_TEXCOORD0")
-        if has_uv:
-            uvs = [str(v) for values in self.vertex_data["in_TEXCOORD0"].values() for v in values]
-
-            self.LayerElementUV = """
-            LayerElementUV: 0 {
-                Version: 101
-                Name: ""
-                MappingInformationType: "ByPolygonVertex"
-                ReferenceInformationType: "IndexToDirect"
-                UV: *%(uvs_num)s {
-                    a: %(uvs)s
-                } 
-                UVIndex: *%(uvs_indices_num)s {
-                    a: %(uvs_indices)s
-                } 
-            }""" % {
-                "uvs": ",".join(uvs),
-                "uvs_num": len(uvs),
-                "uvs_indices": self.idx_data,
-                "uvs_indices_num": self.idx_len,
-            }
-
-            self.LayerElementUVInsert = """
-                LayerElement:  {
-                    Type: "LayerElementUV"
-                    TypedIndex: 0
-                }"""
-    
-    def build_uv1(self):
-        self.LayerElementUV1 = ""
-        self.LayerElementUV1Insert = ""
-        has_uv1 = self.vertex_data.get("in_TEXCOORD1")
-        if has_uv1:
-            uvs = [str(v) for values in self.vertex_data["in_TEXCOORD1"].values() for v in values]
-
-            self.LayerElementUV1 = """
-            LayerElementUV: 1 {
-                Version: 101
-                Name: ""
-                MappingInformationType: "ByPolygonVertex"
-                ReferenceInformationType: "IndexToDirect"
-                UV: *%(uvs_num)s {
-                    a: %(uvs)s
-                } 
-                UVIndex: *%(uvs_indices_num)s {
-                    a: %(uvs_indices)s
-                } 
-            }""" % {
-                "uvs": ",".join(uvs),
-                "uvs_num": len(uvs),
-                "uvs_indices": self.idx_data,
-                "uvs_indices_num": self.idx_len,
-            }
-
-            self.LayerElementUV1Insert = """
-            Layer: 1 {
-                Version: 100
-                LayerElement:  {
-                    Type: "LayerElementUV"
-                    TypedIndex: 1
-                }
-            }"""
+        if self.dedup is not None:
+            self.dedup.add(save_path, key, None)
+            self.dedup.record(save_path, save_path)
 
+        while self.pending:
+            self.finish_task(*self.pending.pop(0))
+
+        if self.scene is not None:
+            self.scene.reserve(save_path)(mesh)
+        else:
+            self.progress.add_bytes(write_mesh(save_path, mesh, self.fbx_format, self.compress_arrays,
+                                               self.progress.check))
+
+    # A drawcall that can't be exported, such as a fullscreen pass without vertex inputs, is skipped
+    # without failing the export
+    def skip(self, save_path, reason):
+        self.skipped.append((os.path.basename(save_path), reason))
+
+    # Why the export failed, or None. An export skipping every drawcall fails with the last reason
     def get_result(self):
+        if self.result is None and self.skipped and len(self.skipped) >= self.selected_count:
+            return self.skipped[-1][1]
         return self.result
 
-def export_wrap(ctx, startDrawcallId, endDrawcallId, is_save_texture, save_path, finished_callback):
+    def get_summary(self):
+        summary = []
+        if self.dedup is not None:
+            summary.append(self.dedup.summary())
+        if self.cache is not None:
+            summary.append(self.cache.summary())
+        elif self.cache_dir is not None:
+            summary.append(CACHE_WITHOUT_CAPTURE)
+        if self.bindings is not None:
+            summary.append(self.bindings.summary())
+            summary.append(self.buffers.summary())
+        if self.texture_saver is not None:
+            summary.append(self.texture_saver.summary())
+        if self.skipped:
+            summary.append("%d drawcalls skipped: %s" % (len(self.skipped), ", ".join(
+                "%s (%s)" % skipped for skipped in self.skipped[:SKIPPED_LISTED])
+                + (", ..." if len(self.skipped) > SKIPPED_LISTED else "")))
+        if self.profiler.enabled:
+            summary.append(self.profiler.summary())
+        return "\n".join(summary)
+
+    # Counters kept by the other parts of the export, copied into the profile report
+    def count_results(self):
+        self.profiler.count("draws", self.draw_count)
+        if self.cache is not None:
+            self.profiler.count("cache_hits", self.cache.hits)
+            self.profiler.count("cache_misses", self.cache.misses)
+        if self.dedup is not None:
+            self.profiler.count("dedup_hits", self.dedup.key_hits + self.dedup.digest_hits)
+        self.profiler.count("semantic_layouts", self.semantics.misses)
+        self.profiler.count("input_bindings_reused", self.bindings.hits)
+        self.profiler.count("buffer_reads", self.buffers.requests)
+        self.profiler.count("buffer_reads_served", self.buffers.served)
+        if self.texture_saver is not None:
+            self.profiler.count("textures_encoded", self.texture_saver.encoded)
+            self.profiler.count("textures_saved_by_renderdoc", self.texture_saver.saved)
+            self.profiler.count("textures_reused", self.texture_saver.reused)
+
+# Start an export on the replay thread. progress_callback is called on the UI thread with a ProgressReport
+# as the export goes. Returns the ExportProgress of the export, to cancel it with
+def export_wrap(ctx, startDrawcallId, endDrawcallId, is_save_texture, save_path, finished_callback,
+                progress_callback=None, **options):
+    mqt = ctx.Extensions().GetMiniQtHelper()
+
+    callback = None
+    if progress_callback is not None:
+        callback = lambda report: mqt.InvokeOntoUIThread(lambda: progress_callback(report))
+    progress = ExportProgress(callback)
+
     # define a local function that wraps the detail of needing to invoke back/forth onto replay thread
+    # The UI waits for finished_callback to allow another export, so it is called however the export ends
     def _replay_callback(r: rd.ReplayController):
-        exporter = Exporter(ctx, startDrawcallId, endDrawcallId, is_save_texture, save_path, r)
-
-        # Invoke back onto the UI thread to display the results
-        ctx.Extensions().GetMiniQtHelper().InvokeOntoUIThread(lambda: finished_callback(exporter.get_result()))
-
-    ctx.Replay().AsyncInvoke('fbx_exporter', _replay_callback)
\ No newline at end of file
+        result = "export stopped unexpectedly"
+        summary = ""
+        try:
+            options.setdefault("capture_path", ctx.GetCaptureFilename())
+            exporter = Exporter(r, startDrawcallId, endDrawcallId, is_save_texture, save_path, progress=progress,
+                                **options)
+            result = exporter.get_result()
+            summary = exporter.get_summary()
+        except Exception as e:
+            result = "%s: %s" % (type(e).__name__, e)
+        finally:
+            profiler.set_current(profiler.NULL_PROFILER)
+
+            # Invoke back onto the UI thread to display the results
+            ctx.Extensions().GetMiniQtHelper().InvokeOntoUIThread(lambda: finished_callback(result, summary))
+
+    ctx.Replay().AsyncInvoke('fbx_exporter', _replay_callback)
+    return progress
\ No newline at end of file
@@ -0,0 +1,331 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+###############################################################################
+
+# Batch export of many captures. Captures, and optionally drawcall ranges of a
+# capture, are handed out as jobs to a pool of worker processes that each open
+# their own replay, so a farm machine replays one capture per core. Every
+# capture gets a manifest of how its export went, and failed jobs are retried
+# and then skipped without stopping the batch. Drawcalls an export skips, such
+# as fullscreen passes without vertex inputs, don't fail its job.
+#
+# The shards of a capture share its folder, each writes its texture manifest
+# and profile report into a folder of its own under SHARDS_DIR, and the texture
+# manifests are merged into the capture's once every shard is done.
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os
+import json
+import time
+import atexit
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+from collections import OrderedDict
+
+import renderdoc as rd
+
+from . import exporter
+
+MANIFEST_NAME = "export_manifest.json"
+SHARDS_DIR = "shards"
+
+
+class CaptureError(Exception):
+    pass
+
+
+# Initialise the replay once per process, the default initializer of the worker processes
+def init_replay():
+    rd.InitialiseReplay(rd.GlobalEnvironment(), [])
+    atexit.register(rd.ShutdownReplay)
+
+
+# Open a capture for local replay, the default controller factory. Returns the controller and
+# a function that shuts it down again, and raises CaptureError if the capture can't be replayed
+def open_capture(path):
+    cap = rd.OpenCaptureFile()
+
+    status = cap.OpenFile(path, "", None)
+    if status != rd.ReplayStatus.Succeeded:
+        cap.Shutdown()
+        raise CaptureError("couldn't open file: " + str(status))
+
+    if cap.LocalReplaySupport() != rd.ReplaySupport.Supported:
+        cap.Shutdown()
+        raise CaptureError("capture can't be replayed on this machine")
+
+    status, controller = cap.OpenCapture(rd.ReplayOptions(), None)
+    if status != rd.ReplayStatus.Succeeded:
+        cap.Shutdown()
+        raise CaptureError("couldn't initialise replay: " + str(status))
+
+    def shutdown():
+        controller.Shutdown()
+        cap.Shutdown()
+
+    return controller, shutdown
+
+
+# One capture, or a drawcall range of one, to export into path. A range of None exports every drawcall.
+# The reports of the export go to report_path if given. A shard is one of several jobs splitting a capture's range
+class Job:
+    def __init__(self, capture, path, startDrawcallId=None, endDrawcallId=None, report_path=None, shard=False):
+        self.capture = capture
+        self.path = path
+        self.startDrawcallId = startDrawcallId
+        self.endDrawcallId = endDrawcallId
+        self.report_path = report_path
+        self.shard = shard
+
+    def range(self):
+        if self.startDrawcallId is None and self.endDrawcallId is None:
+            return None
+        return [self.startDrawcallId, self.endDrawcallId]
+
+    def label(self):
+        if self.range() is None:
+            return self.capture
+        return "%s [%s-%s]" % (self.capture, self.startDrawcallId, self.endDrawcallId)
+
+
+# Destination folder of each capture, captures with the same file name are numbered
+def output_paths(captures, out):
+    if len(captures) == 1:
+        return [out]
+
+    paths = []
+    used = set()
+    for capture in captures:
+        name = os.path.splitext(os.path.basename(capture))[0]
+        path = os.path.join(out, name)
+        suffix = 1
+        while path in used:
+            suffix += 1
+            path = os.path.join(out, "%s_%d" % (name, suffix))
+        used.add(path)
+        paths.append(path)
+    return paths
+
+
+# Jobs for every capture over the same drawcall range, split into shards of shard_size drawcalls if
+# given, so that the draws of one big capture can also be spread over several processes
+def make_jobs(captures, out, startDrawcallId=None, endDrawcallId=None, shard_size=0):
+    jobs = []
+    for capture, path in zip(captures, output_paths(captures, out)):
+        if shard_size > 0 and startDrawcallId is not None and endDrawcallId is not None:
+            starts = range(startDrawcallId, endDrawcallId + 1, shard_size)
+            for start in starts:
+                end = min(start + shard_size - 1, endDrawcallId)
+                jobs.append(Job(capture, path, start, end, os.path.join(path, SHARDS_DIR, "%d-%d" % (start, end)),
+                                shard=len(starts) > 1))
+        else:
+            jobs.append(Job(capture, path, startDrawcallId, endDrawcallId))
+    return jobs
+
+
+# Export one job with its own replay controller, returning how it went instead of raising. Only a
+# failure of the export as a whole is a result, the drawcalls it skipped are counted. A shard whose range
+# holds no draws, as sparse drawcall ids and markers leave some, exports 0 draws rather than failing
+def run_job(job, options, controller_factory=open_capture):
+    outcome = {"result": None, "draws": 0, "skipped": 0, "seconds": 0.0}
+    start = time.perf_counter()
+    try:
+        controller, shutdown = controller_factory(job.capture)
+        try:
+            for path in (job.path, job.report_path):
+                if path is not None and not os.path.exists(path):
+                    os.makedirs(path)
+
+            exp = exporter.Exporter(controller, job.startDrawcallId, job.endDrawcallId,
+                                    options.get("is_save_texture", False), job.path,
+                                    capture_path=job.capture, report_path=job.report_path,
+                                    **options.get("exporter", {}))
+            if not (exp.nothing_selected and job.shard):
+                outcome["result"] = exp.result
+            outcome["draws"] = exp.draw_count
+            outcome["skipped"] = len(exp.skipped)
+        finally:
+            shutdown()
+    except Exception as e:
+        outcome["result"] = "%s: %s" % (type(e).__name__, e)
+
+    outcome["seconds"] = time.perf_counter() - start
+    return outcome
+
+
+class Farm:
+    # options holds is_save_texture and the keyword arguments of the Exporter ("exporter"). With processes
+    # of 0 the jobs run one after another in this process. controller_factory and initializer must be
+    # module level functions so that they can be sent to the worker processes
+    def __init__(self, jobs, options=None, processes=0, retries=1, controller_factory=open_capture,
+                 initializer=init_replay):
+        self.jobs = list(jobs)
+        self.options = options or {}
+        self.processes = processes
+        self.retries = retries
+        self.controller_factory = controller_factory
+        self.initializer = initializer
+
+        self.attempts = {}
+        self.captures = OrderedDict()
+        self.remaining = {}
+        for job in self.jobs:
+            self.attempts[id(job)] = 0
+            self.remaining[job.capture] = self.remaining.get(job.capture, 0) + 1
+            self.captures.setdefault(job.capture, {"capture": job.capture, "output": job.path, "shards": []})
+
+        self.draws = 0
+        self.failed = 0
+        self.completed = 0
+        self.seconds = 0.0
+
+    def run(self):
+        start = time.perf_counter()
+
+        queue = self.jobs
+        if self.processes > 0:
+            while queue:
+                queue, crashed = self._run_pool(queue, self.processes)
+
+                # Find out which of the jobs took the pool down by running them one at a time
+                for job in crashed:
+                    queue.extend(self._run_pool([job], 1)[0])
+        else:
+            if self.initializer is not None:
+                self.initializer()
+            while queue:
+                retry = []
+                for job in queue:
+                    self._finish(job, run_job(job, self.options, self.controller_factory), retry)
+                queue = retry
+
+        self.seconds = time.perf_counter() - start
+        return self
+
+    # Run the jobs on a fresh pool, returning the ones to retry and the ones lost to a crash. A replay
+    # that crashes takes its worker process and the whole pool down with it, so when several jobs were
+    # running it isn't known which of them crashed
+    def _run_pool(self, queue, processes):
+        retry = []
+        crashed = []
+        pool = concurrent.futures.ProcessPoolExecutor(processes, initializer=self.initializer)
+        try:
+            futures = {}
+            for job in queue:
+                futures[pool.submit(run_job, job, self.options, self.controller_factory)] = job
+
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    outcome = future.result()
+                except BrokenProcessPool:
+                    if len(futures) > 1:
+                        crashed.append(futures[future])
+                        continue
+                    outcome = {"result": "replay process crashed", "draws": 0, "skipped": 0, "seconds": 0.0}
+                self._finish(futures[future], outcome, retry)
+        finally:
+            pool.shutdown()
+        return retry, crashed
+
+    def _finish(self, job, outcome, retry):
+        self.attempts[id(job)] += 1
+        attempts = self.attempts[id(job)]
+
+        if outcome["result"] and attempts <= self.retries:
+            print("Retrying %s: %s" % (job.label(), outcome["result"]))
+            retry.append(job)
+            return
+
+        if outcome["result"]:
+            status = "failed: " + outcome["result"]
+        else:
+            status = "%d draws" % outcome["draws"]
+            if outcome["skipped"]:
+                status += ", %d skipped" % outcome["skipped"]
+        print("%s: %s in %.1fs" % (job.label(), status, outcome["seconds"]))
+
+        self.draws += outcome["draws"]
+        record = self.captures[job.capture]
+        record["shards"].append({
+            "range": job.range(),
+            "result": outcome["result"],
+            "attempts": attempts,
+            "draws": outcome["draws"],
+            "skipped": outcome["skipped"],
+            "seconds": round(outcome["seconds"], 3),
+        })
+        if job.report_path is not None:
+            record["shards"][-1]["reports"] = os.path.relpath(job.report_path, job.path).replace(os.sep, "/")
+
+        self.remaining[job.capture] -= 1
+        if self.remaining[job.capture] == 0:
+            self._write_manifest(record)
+
+    # Written as soon as every job of a capture is done, so a batch that is stopped early still leaves them
+    def _write_manifest(self, record):
+        failures = [shard for shard in record["shards"] if shard["result"]]
+        if not failures:
+            record["status"] = "ok"
+            self.completed += 1
+        else:
+            record["status"] = "failed" if len(failures) == len(record["shards"]) else "partial"
+            self.failed += 1
+
+        record["draws"] = sum(shard["draws"] for shard in record["shards"])
+        record["skipped"] = sum(shard["skipped"] for shard in record["shards"])
+        record["shards"].sort(key=lambda shard: shard["range"] or [])
+
+        if not os.path.exists(record["output"]):
+            os.makedirs(record["output"])
+        with open(os.path.join(record["output"], MANIFEST_NAME), "w") as f:
+            json.dump(record, f, indent=4)
+        self._merge_texture_manifests(record)
+
+    # The texture manifest of a sharded capture, as the shards' in drawcall order. Their texture paths
+    # are relative to the capture's folder already
+    def _merge_texture_manifests(self, record):
+        manifest = OrderedDict()
+        found = False
+        for shard in record["shards"]:
+            if "reports" not in shard:
+                continue
+            path = os.path.join(record["output"], shard["reports"], exporter.TEXTURE_MANIFEST_NAME)
+            try:
+                with open(path) as f:
+                    manifest.update(json.load(f, object_pairs_hook=OrderedDict))
+                found = True
+            except (IOError, OSError, ValueError):
+                continue
+
+        if found:
+            with open(os.path.join(record["output"], exporter.TEXTURE_MANIFEST_NAME), "w") as f:
+                json.dump(manifest, f, indent=4)
+
+    def summary(self):
+        seconds = max(self.seconds, 1e-6)
+        return "%d of %d captures exported, %d draws in %.1fs (%.1f draws/sec, %.1f captures/min)" % (
+            self.completed, len(self.captures), self.draws, self.seconds,
+            self.draws / seconds, self.completed * 60 / seconds)
@@ -0,0 +1,392 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 timmyliang
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+###############################################################################
+
+# Streaming ascii FBX writer. The document is written section by section
+# straight to the file, with the big arrays converted to text a chunk at a
+# time, so memory use does not grow with the size of the text.
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import re
+from functools import partial
+
+# Arrays are converted to text and written this many elements at a time
+ARRAY_CHUNK_SIZE = 65536
+
+# Object ids used for the single mesh of a drawcall file
+GEOMETRY_ID = 2035541511296
+MODEL_ID = 2035615390896
+
+# A scene is FBX_DEFINITIONS, then a FBX_GEOMETRY and FBX_MODEL per mesh, then FBX_CONNECTIONS_BEGIN,
+# a FBX_CONNECTION per model, and FBX_END
+FBX_DEFINITIONS = """; FBX 7.3.0 project file
+; ----------------------------------------------------
+
+; Object definitions
+;------------------------------------------------------------------
+
+Definitions:  {
+    ObjectType: "Geometry" {
+        Count: %(geometry_count)s
+        PropertyTemplate: "FbxMesh" {
+            Properties70:  {
+                P: "Primary Visibility", "bool", "", "",1
+            }
+        }
+    }
+    ObjectType: "Model" {
+        Count: %(model_count)s
+        PropertyTemplate: "FbxNode" {
+            Properties70:  {
+                P: "Visibility", "Visibility", "", "A",1
+            }
+        }
+    }
+}
+
+; Object properties
+;------------------------------------------------------------------
+
+Objects:  {"""
+
+FBX_GEOMETRY = """
+    Geometry: %(geometry_id)s, "Geometry::", "Mesh" {
+        Vertices: *%(vertices_num)s {
+            a: %(vertices)s
+        } 
+        PolygonVertexIndex: *%(polygons_num)s {
+            a: %(polygons)s
+        } 
+        GeometryVersion: 124%(LayerElementNormal)s%(LayerElementTangent)s%(LayerElementColor)s%(LayerElementUV)s
+        Layer: 0 {
+            Version: 100%(LayerElementNormalInsert)s%(LayerElementTangentInsert)s%(LayerElementColorInsert)s%(LayerElementUVInsert)s
+        }%(Layers)s
+    }"""
+
+FBX_MODEL = """
+    Model: %(model_id)s, "Model::%(model_name)s", "Mesh" {
+        Properties70:  {
+            P: "DefaultAttributeIndex", "int", "Integer", "",0%(model_transform)s
+        }
+    }"""
+
+MODEL_TRANSFORM = """
+            P: "Lcl Translation", "Lcl Translation", "", "A",%s,%s,%s
+            P: "Lcl Rotation", "Lcl Rotation", "", "A",%s,%s,%s
+            P: "Lcl Scaling", "Lcl Scaling", "", "A",%s,%s,%s"""
+
+FBX_CONNECTIONS_BEGIN = """
+}
+
+; Object connections
+;------------------------------------------------------------------
+
+Connections:  {"""
+
+FBX_CONNECTION = """
+    ;Model::%(comment_name)s, Model::RootNode
+    C: "OO",%(model_id)s,0
+    ;Geometry::, Model::%(comment_name)s
+    C: "OO",%(geometry_id)s,%(model_id)s"""
+
+FBX_END = """
+}"""
+
+# The document of a single mesh
+FBX_ASCII_TEMPLETE = FBX_DEFINITIONS + FBX_GEOMETRY + FBX_MODEL + FBX_CONNECTIONS_BEGIN + FBX_CONNECTION + FBX_END
+
+LAYER_ELEMENT_NORMAL = """
+            LayerElementNormal: 0 {
+                Version: 101
+                Name: ""
+                MappingInformationType: "ByPolygonVertex"
+                ReferenceInformationType: "Direct"
+                Normals: *%(normals_num)s {
+                    a: %(normals)s
+                }
+            }"""
+
+LAYER_ELEMENT_TANGENT = """
+            LayerElementTangent: 0 {
+                Version: 101
+                Name: ""
+                MappingInformationType: "ByPolygonVertex"
+                ReferenceInformationType: "Direct"
+                Tangents: *%(tangents_num)s {
+                    a: %(tangents)s
+                } 
+            }"""
+
+LAYER_ELEMENT_COLOR = """
+                LayerElementColor: %(color_index)s {
+                    Version: 101
+                    Name: "colorSet%(color_set)s"
+                    MappingInformationType: "ByPolygonVertex"
+                    ReferenceInformationType: "IndexToDirect"
+                    Colors: *%(colors_num)s {
+                        a: %(colors)s
+                    } 
+                    ColorIndex: *%(colors_indices_num)s {
+                        a: %(colors_indices)s
+                    } 
+                }"""
+
+LAYER_ELEMENT_UV = """
+            LayerElementUV: %(uv_index)s {
+                Version: 101
+                Name: ""
+                MappingInformationType: "ByPolygonVertex"
+                ReferenceInformationType: "IndexToDirect"
+                UV: *%(uvs_num)s {
+                    a: %(uvs)s
+                } 
+                UVIndex: *%(uvs_indices_num)s {
+                    a: %(uvs_indices)s
+                } 
+            }"""
+
+LAYER_ELEMENT_INSERT = """
+                LayerElement:  {
+                    Type: "%(element)s"
+                    TypedIndex: %(typed_index)s
+                }"""
+
+LAYER = """
+            Layer: %(layer_index)s {
+                Version: 100%(elements)s
+            }"""
+
+_PLACEHOLDER = re.compile(r"%\((\w+)\)s")
+
+
+def array_text(chunk, start):
+    return ",".join(map(str, chunk))
+
+
+# Earlier versions wrote the alpha of every rgba color as a literal 1, keep doing so
+def opaque_color_text(chunk, start):
+    parts = list(map(str, chunk))
+    alpha = (3 - start) % 4
+    parts[alpha::4] = ["1"] * len(parts[alpha::4])
+    return ",".join(parts)
+
+
+# check, if given, is called before every chunk and may raise to stop the write
+def write_array(f, values, text=array_text, check=None):
+    for start in range(0, len(values), ARRAY_CHUNK_SIZE):
+        if check is not None:
+            check()
+        chunk = values[start:start + ARRAY_CHUNK_SIZE]
+        if hasattr(chunk, "tolist"):
+            chunk = chunk.tolist()
+        if start:
+            f.write(",")
+        f.write(text(chunk, start))
+
+
+# Write a template to the file, expanding its %(name)s placeholders from args as it goes.
+# Strings and numbers are written as is, callables are called to write themselves out,
+# and anything else is an array that is streamed in chunks
+def write_template(f, template, args):
+    for i, part in enumerate(_PLACEHOLDER.split(template)):
+        if i % 2 == 0:
+            f.write(part)
+            continue
+
+        value = args[part]
+        if isinstance(value, (str, int)):
+            f.write(str(value))
+        elif callable(value):
+            value(f)
+        else:
+            write_array(f, value)
+
+
+def _layer_element(template, args):
+    return partial(write_template, template=template, args=args)
+
+
+def _layer_elements(elements):
+    def write(f):
+        for element in elements:
+            element(f)
+    return write
+
+
+# Placeholder values of FBX_GEOMETRY for an exporter.FbxMesh
+def _geometry_args(mesh, check=None):
+    # With a check, arrays are written through write_array explicitly to pass it on
+    def array(values, text=array_text):
+        if check is None and text is array_text:
+            return values
+        return partial(write_array, values=values, text=text, check=check)
+
+    polygons = mesh.polygons()
+
+    args = {
+        "vertices": array(mesh.vertices),
+        "vertices_num": len(mesh.vertices),
+        "polygons": array(polygons),
+        "polygons_num": len(polygons),
+    }
+
+    for name in ["Normal", "Tangent", "Color", "UV"]:
+        args["LayerElement" + name] = ""
+        args["LayerElement" + name + "Insert"] = ""
+    args["Layers"] = ""
+
+    if len(mesh.normals):
+        args["LayerElementNormal"] = _layer_element(LAYER_ELEMENT_NORMAL, {
+            "normals": array(mesh.normals),
+            "normals_num": len(mesh.normals),
+        })
+        args["LayerElementNormalInsert"] = LAYER_ELEMENT_INSERT % {"element": "LayerElementNormal", "typed_index": 0}
+
+    if len(mesh.tangents):
+        args["LayerElementTangent"] = _layer_element(LAYER_ELEMENT_TANGENT, {
+            "tangents": array(mesh.tangents),
+            "tangents_num": len(mesh.tangents),
+        })
+        args["LayerElementTangentInsert"] = LAYER_ELEMENT_INSERT % {"element": "LayerElementTangent", "typed_index": 0}
+
+    color_elements = []
+    for index, (colors, components) in enumerate(zip(mesh.colors.values(), mesh.color_components.values())):
+        color_elements.append(_layer_element(LAYER_ELEMENT_COLOR, {
+            "color_index": index,
+            "color_set": index + 1,
+            "colors": array(colors, opaque_color_text if components == 4 else array_text),
+            "colors_num": len(colors),
+            "colors_indices": array(range(len(mesh.indices))),
+            "colors_indices_num": len(mesh.indices),
+        }))
+
+    if color_elements:
+        args["LayerElementColor"] = _layer_elements(color_elements)
+        args["LayerElementColorInsert"] = LAYER_ELEMENT_INSERT % {"element": "LayerElementColor", "typed_index": 0}
+
+    uv_elements = []
+    for index, uvs in enumerate(mesh.uvs.values()):
+        uv_elements.append(_layer_element(LAYER_ELEMENT_UV, {
+            "uv_index": index,
+            "uvs": array(uvs),
+            "uvs_num": len(uvs),
+            "uvs_indices": array(mesh.indices),
+            "uvs_indices_num": len(mesh.indices),
+        }))
+
+    if uv_elements:
+        args["LayerElementUV"] = _layer_elements(uv_elements)
+        args["LayerElementUVInsert"] = LAYER_ELEMENT_INSERT % {"element": "LayerElementUV", "typed_index": 0}
+
+    # The first color and uv sets live in layer 0 with the other elements, every further set gets the
+    # layer of its number
+    layers = []
+    for index in range(1, max(len(color_elements), len(uv_elements))):
+        elements = ""
+        if index < len(color_elements):
+            elements += LAYER_ELEMENT_INSERT % {"element": "LayerElementColor", "typed_index": index}
+        if index < len(uv_elements):
+            elements += LAYER_ELEMENT_INSERT % {"element": "LayerElementUV", "typed_index": index}
+        layers.append(LAYER % {"layer_index": index, "elements": elements})
+    args["Layers"] = "".join(layers)
+
+    return args
+
+
+# Streams a scene of many meshes into one ascii FBX file. Each geometry is written out as soon
+# as it is added, only the connections are kept until the end. Without counts the object counts
+# of the Definitions aren't known up front, so room is left for them and they are filled in on close
+class SceneWriter:
+    _COUNT_WIDTH = 20
+
+    # check is handed on to write_array
+    def __init__(self, path, counts=None, check=None):
+        self.f = open(path, "w", buffering=1 << 16)
+        self.check = check
+        self.connections = []
+        self.geometry_count = 0
+        self.model_count = 0
+        self.count_offsets = {}
+
+        if counts is not None:
+            geometry_count, model_count = counts
+        else:
+            geometry_count = partial(self._reserve_count, "geometry")
+            model_count = partial(self._reserve_count, "model")
+
+        write_template(self.f, FBX_DEFINITIONS, {"geometry_count": geometry_count, "model_count": model_count})
+
+    def _reserve_count(self, name, f):
+        self.count_offsets[name] = f.tell()
+        f.write(" " * self._COUNT_WIDTH)
+
+    def add_geometry(self, mesh, geometry_id):
+        args = _geometry_args(mesh, self.check)
+        args["geometry_id"] = geometry_id
+        write_template(self.f, FBX_GEOMETRY, args)
+        self.geometry_count += 1
+
+    # transform, if given, is the translation, rotation (euler angles in degrees) and scaling of the model
+    def add_model(self, name, model_id, geometry_id, comment_name=None, transform=None):
+        model_transform = ""
+        if transform is not None:
+            model_transform = MODEL_TRANSFORM % tuple(v for values in transform for v in values)
+        write_template(self.f, FBX_MODEL, {"model_id": model_id, "model_name": name, "model_transform": model_transform})
+        self.connections.append({
+            "model_id": model_id,
+            "geometry_id": geometry_id,
+            "comment_name": name if comment_name is None else comment_name,
+        })
+        self.model_count += 1
+
+    def close(self):
+        self.f.write(FBX_CONNECTIONS_BEGIN)
+        for connection in self.connections:
+            write_template(self.f, FBX_CONNECTION, connection)
+        self.f.write(FBX_END)
+
+        for name, offset in self.count_offsets.items():
+            self.f.seek(offset)
+            self.f.write(str(getattr(self, name + "_count")))
+
+        self.f.close()
+
+
+# Write an exporter.FbxMesh as an ascii FBX file. With models, a list of (name, transform), the mesh is
+# shared by a model of each instead of the single default one
+def write_mesh(path, mesh, check=None, models=None):
+    scene = SceneWriter(path, counts=(1, len(models) if models is not None else 1), check=check)
+    try:
+        scene.add_geometry(mesh, GEOMETRY_ID)
+        if models is None:
+            scene.add_model(mesh.name, MODEL_ID, GEOMETRY_ID, comment_name="pCube1")
+        for index, (name, transform) in enumerate(models or ()):
+            scene.add_model(name, MODEL_ID + index, GEOMETRY_ID, transform=transform)
+    except BaseException:
+        scene.f.close()
+        raise
+    scene.close()
@@ -0,0 +1,345 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+###############################################################################
+
+# Binary FBX 7.x writer. It emits the same document as FBX_ASCII_TEMPLETE in
+# fbx_ascii.py, but as node records with typed (and optionally zlib compressed)
+# array properties instead of comma separated text.
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import sys
+import zlib
+import array
+import struct
+
+FBX_BINARY_VERSION = 7400
+
+# Object ids used for the single mesh of a drawcall file, the same as the ascii template
+GEOMETRY_ID = 2035541511296
+MODEL_ID = 2035615390896
+
+_MAGIC = b"Kaydara FBX Binary  \x00\x1a\x00"
+_FOOTER_ID = b"\xfa\xbc\xab\x09\xd0\xc8\xd4\x66\xb1\x76\xfb\x83\x1c\xf7\x26\x7e"
+_FOOTER_MAGIC = b"\xf8\x5a\x8c\x6a\xde\xf5\xd9\x7e\xec\xe9\x0c\xe3\x75\x8f\x29\x0b"
+
+# Arrays are converted and written this many elements at a time
+ARRAY_CHUNK_SIZE = 65536
+
+# Arrays smaller than this many bytes are not worth compressing
+_COMPRESS_MIN_BYTES = 128
+
+# array.array typecode and numpy dtype for each FBX array property type
+_ARRAY_TYPES = {
+    "d": ("d", "<f8"),
+    "f": ("f", "<f4"),
+    "i": ("i", "<i4"),
+    "l": ("q", "<i8"),
+}
+
+
+# An integer property that must be stored as 64 bits even if it would fit in 32, such as an object id
+class Int64(int):
+    pass
+
+
+# Binary FBX stores "Class::Name" object names as "Name\x00\x01Class"
+def object_name(cls, name=""):
+    return name + "\x00\x01" + cls
+
+
+def _encode_property(value):
+    if isinstance(value, bool):
+        return b"C" + struct.pack("<B", value)
+    elif isinstance(value, Int64):
+        return b"L" + struct.pack("<q", value)
+    elif isinstance(value, int):
+        if -2 ** 31 <= value < 2 ** 31:
+            return b"I" + struct.pack("<i", value)
+        return b"L" + struct.pack("<q", value)
+    elif isinstance(value, float):
+        return b"D" + struct.pack("<d", value)
+    elif isinstance(value, str):
+        data = value.encode("utf-8")
+        return b"S" + struct.pack("<I", len(data)) + data
+    elif isinstance(value, bytes):
+        return b"R" + struct.pack("<I", len(value)) + value
+
+    raise TypeError("Unsupported FBX property type: " + type(value).__name__)
+
+
+def _array_bytes(typecode, chunk):
+    # numpy arrays convert directly, anything else goes through array.array
+    if hasattr(chunk, "astype"):
+        return chunk.astype(_ARRAY_TYPES[typecode][1]).tobytes()
+
+    values = array.array(_ARRAY_TYPES[typecode][0], chunk)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tobytes()
+
+
+class BinaryFbxWriter:
+    # check, if given, is called before every array chunk and may raise to stop the write
+    def __init__(self, f, version=FBX_BINARY_VERSION, compress=True, check=None):
+        self.f = f
+        self.version = version
+        self.compress = compress
+        self.check = check
+
+        # 7.5 and later use 64 bit offsets in the node record headers
+        self.offset_format = "<Q" if version >= 7500 else "<I"
+        self.offset_size = struct.calcsize(self.offset_format)
+        self.null_record = b"\x00" * (self.offset_size * 3 + 1)
+
+        # one [start offset, child count, property count] entry per open node
+        self.stack = []
+
+        self.f.write(_MAGIC)
+        self.f.write(struct.pack("<I", version))
+
+    def _begin_record(self, name, num_properties, properties_length):
+        if self.stack:
+            self.stack[-1][1] += 1
+
+        start = self.f.tell()
+        name = name.encode("utf-8")
+        for value in (0, num_properties, properties_length):
+            self.f.write(struct.pack(self.offset_format, value))
+        self.f.write(struct.pack("<B", len(name)))
+        self.f.write(name)
+        self.stack.append([start, 0, num_properties])
+        return start
+
+    def _patch(self, offset, fmt, *values):
+        end = self.f.tell()
+        self.f.seek(offset)
+        self.f.write(struct.pack(fmt, *values))
+        self.f.seek(end)
+
+    def begin_node(self, name, *properties):
+        encoded = b"".join(_encode_property(p) for p in properties)
+        self._begin_record(name, len(properties), len(encoded))
+        self.f.write(encoded)
+
+    def end_node(self):
+        start, children, num_properties = self.stack.pop()
+
+        # nested lists (and nodes that would otherwise be empty) are closed by a null record
+        if children or not num_properties:
+            self.f.write(self.null_record)
+
+        self._patch(start, self.offset_format, self.f.tell())
+
+    def node(self, name, *properties):
+        self.begin_node(name, *properties)
+        self.end_node()
+
+    # Write a node holding a single typed array, converting and compressing values in chunks
+    def array_node(self, name, typecode, values):
+        start = self._begin_record(name, 1, 0)
+        properties_start = self.f.tell()
+
+        self.f.write(typecode.encode("ascii"))
+        array_header = self.f.tell()
+        self.f.write(struct.pack("<III", 0, 0, 0))
+
+        itemsize = struct.calcsize(_ARRAY_TYPES[typecode][0])
+        encoding = 1 if self.compress and len(values) * itemsize >= _COMPRESS_MIN_BYTES else 0
+        compressor = zlib.compressobj() if encoding else None
+
+        length = 0
+        for i in range(0, len(values), ARRAY_CHUNK_SIZE):
+            if self.check is not None:
+                self.check()
+            data = _array_bytes(typecode, values[i:i + ARRAY_CHUNK_SIZE])
+            length += len(data) // itemsize
+            self.f.write(compressor.compress(data) if compressor else data)
+        if compressor:
+            self.f.write(compressor.flush())
+
+        end = self.f.tell()
+        self._patch(array_header, "<III", length, encoding, end - array_header - 12)
+
+        # the property list length is the third field of the record header
+        self._patch(start + self.offset_size * 2, self.offset_format, end - properties_start)
+        self.end_node()
+
+    def close(self):
+        # the top level node list is closed by a null record, followed by the footer
+        self.f.write(self.null_record)
+        self.f.write(_FOOTER_ID)
+        self.f.write(b"\x00" * 4)
+        padding = (16 - self.f.tell() % 16) or 16
+        self.f.write(b"\x00" * padding)
+        self.f.write(struct.pack("<I", self.version))
+        self.f.write(b"\x00" * 120)
+        self.f.write(_FOOTER_MAGIC)
+
+
+# Returns the file offset of the object count, which is patched once the count is known
+def _write_property_template(writer, object_type, template, name, *value):
+    writer.begin_node("ObjectType", object_type)
+    writer.begin_node("Count", 0)
+    count_offset = writer.f.tell() - 4
+    writer.end_node()
+    writer.begin_node("PropertyTemplate", template)
+    writer.begin_node("Properties70")
+    writer.node("P", name, *value)
+    writer.end_node()
+    writer.end_node()
+    writer.end_node()
+    return count_offset
+
+
+def _write_layer_element(writer, element, index, name, reference, arrays):
+    writer.begin_node(element, index)
+    writer.node("Version", 101)
+    writer.node("Name", name)
+    writer.node("MappingInformationType", "ByPolygonVertex")
+    writer.node("ReferenceInformationType", reference)
+    for array_name, typecode, values in arrays:
+        writer.array_node(array_name, typecode, values)
+    writer.end_node()
+
+
+def _write_layer(writer, index, elements):
+    writer.begin_node("Layer", index)
+    writer.node("Version", 100)
+    for element, typed_index in elements:
+        writer.begin_node("LayerElement")
+        writer.node("Type", element)
+        writer.node("TypedIndex", typed_index)
+        writer.end_node()
+    writer.end_node()
+
+
+# Streams a scene of many meshes into one binary FBX file. Each geometry is written out as soon as
+# it is added, only the connections are kept until the end, and the object counts of the
+# Definitions are patched in on close
+class SceneWriter:
+    def __init__(self, path, compress=True, check=None):
+        self.f = open(path, "wb")
+        self.writer = BinaryFbxWriter(self.f, compress=compress, check=check)
+        self.connections = []
+        self.geometry_count = 0
+        self.model_count = 0
+
+        writer = self.writer
+        writer.begin_node("FBXHeaderExtension")
+        writer.node("FBXHeaderVersion", 1003)
+        writer.node("FBXVersion", writer.version)
+        writer.end_node()
+
+        writer.begin_node("Definitions")
+        self.geometry_count_offset = _write_property_template(
+            writer, "Geometry", "FbxMesh", "Primary Visibility", "bool", "", "", 1)
+        self.model_count_offset = _write_property_template(
+            writer, "Model", "FbxNode", "Visibility", "Visibility", "", "A", 1)
+        writer.end_node()
+
+        writer.begin_node("Objects")
+
+    def add_geometry(self, mesh, geometry_id):
+        writer = self.writer
+        writer.begin_node("Geometry", Int64(geometry_id), object_name("Geometry"), "Mesh")
+        writer.array_node("Vertices", "d", mesh.vertices)
+        writer.array_node("PolygonVertexIndex", "i", mesh.polygons())
+        writer.node("GeometryVersion", 124)
+
+        layer0 = []
+        if len(mesh.normals):
+            _write_layer_element(writer, "LayerElementNormal", 0, "", "Direct", [("Normals", "d", mesh.normals)])
+            layer0.append(("LayerElementNormal", 0))
+        if len(mesh.tangents):
+            _write_layer_element(writer, "LayerElementTangent", 0, "", "Direct", [("Tangents", "d", mesh.tangents)])
+            layer0.append(("LayerElementTangent", 0))
+        for index, colors in enumerate(mesh.colors.values()):
+            _write_layer_element(writer, "LayerElementColor", index, "colorSet%d" % (index + 1), "IndexToDirect", [
+                ("Colors", "d", colors),
+                ("ColorIndex", "i", range(len(mesh.indices))),
+            ])
+        if mesh.colors:
+            layer0.append(("LayerElementColor", 0))
+        for index, uvs in enumerate(mesh.uvs.values()):
+            _write_layer_element(writer, "LayerElementUV", index, "", "IndexToDirect", [
+                ("UV", "d", uvs),
+                ("UVIndex", "i", mesh.indices),
+            ])
+        if mesh.uvs:
+            layer0.append(("LayerElementUV", 0))
+
+        # Every further color and uv set gets the layer of its number
+        _write_layer(writer, 0, layer0)
+        for index in range(1, max(len(mesh.colors), len(mesh.uvs))):
+            elements = [(element, index) for element, sets in (("LayerElementColor", mesh.colors),
+                                                                ("LayerElementUV", mesh.uvs)) if index < len(sets)]
+            _write_layer(writer, index, elements)
+        writer.end_node()
+        self.geometry_count += 1
+
+    # transform, if given, is the translation, rotation (euler angles in degrees) and scaling of the model
+    def add_model(self, name, model_id, geometry_id, transform=None):
+        writer = self.writer
+        writer.begin_node("Model", Int64(model_id), object_name("Model", name), "Mesh")
+        writer.begin_node("Properties70")
+        writer.node("P", "DefaultAttributeIndex", "int", "Integer", "", 0)
+        if transform is not None:
+            for prop, values in zip(("Lcl Translation", "Lcl Rotation", "Lcl Scaling"), transform):
+                writer.node("P", prop, prop, "", "A", *(float(v) for v in values))
+        writer.end_node()
+        writer.end_node()
+        self.connections.append((model_id, geometry_id))
+        self.model_count += 1
+
+    def close(self):
+        writer = self.writer
+        writer.end_node()
+
+        writer.begin_node("Connections")
+        for model_id, geometry_id in self.connections:
+            writer.node("C", "OO", Int64(model_id), Int64(0))
+            writer.node("C", "OO", Int64(geometry_id), Int64(model_id))
+        writer.end_node()
+
+        writer.close()
+        writer._patch(self.geometry_count_offset, "<i", self.geometry_count)
+        writer._patch(self.model_count_offset, "<i", self.model_count)
+        self.f.close()
+
+
+# Write an exporter.FbxMesh as a binary FBX file, with the same content as the ascii output
+def write_mesh(path, mesh, compress=True, check=None, models=None):
+    scene = SceneWriter(path, compress, check)
+    try:
+        scene.add_geometry(mesh, GEOMETRY_ID)
+        if models is None:
+            scene.add_model(mesh.name, MODEL_ID, GEOMETRY_ID)
+        for index, (name, transform) in enumerate(models or ()):
+            scene.add_model(name, MODEL_ID + index, GEOMETRY_ID, transform)
+    except BaseException:
+        scene.f.close()
+        raise
+    scene.close()
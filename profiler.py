@@ -0,0 +1,185 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+###############################################################################
+
+# Timing and counters of the stages of an export. Code being measured asks for
+# the profiler of its thread with current(), which is a disabled one costing a
+# method call per stage unless an export turned profiling on. Work done on
+# worker threads or processes is measured by a profiler of its own, and its
+# numbers are merged back into the export's when the result is collected.
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import json
+import time
+import threading
+from collections import OrderedDict
+
+REPORT_NAME = "export_profile.json"
+
+
+class _Stage:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+# Charge a stage to the draw being exported
+_CURRENT_DRAW = object()
+
+
+class Profiler:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.start = time.perf_counter()
+        self.end = None
+
+        # stage name -> [seconds, calls, longest call]
+        self.stages = OrderedDict()
+        self.counters = OrderedDict()
+
+        # per draw, stage name -> seconds. Stages are charged to the draw being exported
+        self.draws = OrderedDict()
+        self.draw = None
+
+    # Time a block: with profiler.stage("decode"): ...
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def add_time(self, name, seconds, calls=1, longest=None, draw=_CURRENT_DRAW):
+        with self.lock:
+            stats = self.stages.setdefault(name, [0.0, 0, 0.0])
+            stats[0] += seconds
+            stats[1] += calls
+            stats[2] = max(stats[2], seconds if longest is None else longest)
+
+            if draw is _CURRENT_DRAW:
+                draw = self.draw
+            if draw is not None:
+                times = self.draws.setdefault(draw, OrderedDict())
+                times[name] = times.get(name, 0.0) + seconds
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def begin_draw(self, draw):
+        self.draw = draw
+
+    # Stop the clock of the whole export
+    def finish(self):
+        self.draw = None
+        self.end = time.perf_counter()
+
+    # Plain data of what was measured, to send back from a worker process
+    def data(self):
+        return {"stages": dict(self.stages), "counters": dict(self.counters)}
+
+    # Add what another profiler measured, charging its stages to the given draw, if any
+    def merge(self, data, draw=None):
+        for name, (seconds, calls, longest) in data["stages"].items():
+            self.add_time(name, seconds, calls, longest, draw)
+        for name, n in data["counters"].items():
+            self.count(name, n)
+
+    def report(self):
+        stages = OrderedDict()
+        for name, (seconds, calls, longest) in sorted(self.stages.items(), key=lambda item: -item[1][0]):
+            stages[name] = {"seconds": round(seconds, 6), "calls": calls, "max_seconds": round(longest, 6)}
+
+        draws = OrderedDict()
+        for draw, times in self.draws.items():
+            draws[draw] = OrderedDict((name, round(seconds, 6)) for name, seconds in times.items())
+
+        return OrderedDict([
+            ("total_seconds", round((self.end or time.perf_counter()) - self.start, 6)),
+            ("stages", stages),
+            ("counters", self.counters),
+            ("draws", draws),
+        ])
+
+    def write(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=4)
+
+    # The stages taking the most time, for the finish dialog
+    def summary(self, top=6):
+        report = self.report()
+        lines = ["profile: %.2fs total" % report["total_seconds"]]
+        for name, stats in list(report["stages"].items())[:top]:
+            lines.append("  %s: %.2fs in %d calls" % (name, stats["seconds"], stats["calls"]))
+        return "\n".join(lines)
+
+
+NULL_PROFILER = Profiler(enabled=False)
+
+_local = threading.local()
+
+
+# The profiler of the calling thread
+def current():
+    return getattr(_local, "profiler", NULL_PROFILER)
+
+
+def set_current(profiler):
+    _local.profiler = profiler
+
+
+# Run a task with a profiler of its own, returning its result and what was measured.
+# Used for tasks running on worker threads or processes
+def run_profiled(task, *args):
+    profiler = Profiler()
+    previous = current()
+    set_current(profiler)
+    try:
+        result = task(*args)
+    finally:
+        set_current(previous)
+    return result, profiler.data()
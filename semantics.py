@@ -0,0 +1,189 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+###############################################################################
+
+# Which FBX layer each vertex attribute of a draw goes to. Shader compilers name
+# vertex inputs in their own ways: in_POSITION0 from HLSL translated to GLSL,
+# POSITION from D3D, in.var.POSITION from DXC's SPIR-V, inPosition or a_position
+# from hand written GLSL. Each attribute is resolved to the exporter's names,
+# in_POSITION0, in_NORMAL0, in_TANGENT0, in_COLORn and in_TEXCOORDn, trying in
+# order a mapping file given by the user, the semantic the shader's signature
+# gives it, and patterns on its name. Attributes matching none keep their name.
+#
+# A mapping file is a JSON object of regular expressions matching whole
+# attribute names to the semantic they stand for, with the set as a number,
+# tried in the order of the file:
+#
+#   {"in_var_ATTRIBUTE0": "POSITION", "inLightmapUV": "TEXCOORD1", "inColor(\\d)": "COLOR"}
+#
+# A COLOR or TEXCOORD without a number takes the set from the last number in the
+# attribute name, if it has one.
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import re
+import json
+import hashlib
+
+POSITION = "POSITION"
+NORMAL = "NORMAL"
+TANGENT = "TANGENT"
+COLOR = "COLOR"
+TEXCOORD = "TEXCOORD"
+
+# Names each semantic goes by, in lower case
+ALIASES = {
+    POSITION: ["position", "pos", "vertex", "sv_position"],
+    NORMAL: ["normal", "norm", "nrm"],
+    TANGENT: ["tangent", "tan"],
+    COLOR: ["color", "colour", "col", "diffuse"],
+    TEXCOORD: ["texcoord", "texcoords", "uv", "tex", "st"],
+}
+
+# The semantics a draw can have several sets of
+SETS = (COLOR, TEXCOORD)
+
+_SEMANTICS = dict((alias, semantic) for semantic, aliases in ALIASES.items() for alias in aliases)
+
+# Prefixes compilers and conventions put in front of an input's name, the camel case ones only
+# when followed by an upper case letter so that e.g. "tangent" keeps its "t"
+_PREFIX = re.compile(r"^(?:in\.var\.|in_var_|in_|in(?=[A-Z])|a_|a(?=[A-Z])|attr_|i_|v_|_)")
+
+_NAME = re.compile(r"^([A-Za-z_]+?)_?(\d*)$")
+
+
+def canonical_name(semantic, index=0):
+    return "in_%s%d" % (semantic, index)
+
+
+# The semantic and set a name or semantic names, as a (semantic, index) pair, or None
+def parse_semantic(text, index=None):
+    match = _NAME.match(_PREFIX.sub("", text, count=1))
+    if match is None:
+        return None
+    semantic = _SEMANTICS.get(match.group(1).lower())
+    if semantic is None:
+        return None
+    if index is None:
+        index = int(match.group(2) or 0)
+    return semantic, index
+
+
+# The sets of a semantic among resolved attribute names, as (set number, name) pairs in set order
+def sets(names, semantic):
+    prefix = canonical_name(semantic, 0)[:-1]
+    return sorted((int(name[len(prefix):]), name) for name in names
+                  if name.startswith(prefix) and name[len(prefix):].isdigit())
+
+
+# The mapping of a mapping file, as a list of (compiled pattern, semantic) pairs. Raises
+# IOError, ValueError or re.error when the file can't be read or isn't a valid mapping
+def load_mapping(path):
+    with open(path) as f:
+        mapping = json.load(f)
+    if not isinstance(mapping, dict):
+        raise ValueError("expected an object of attribute name patterns to semantics")
+
+    result = []
+    for pattern, semantic in mapping.items():
+        if parse_semantic(semantic) is None:
+            raise ValueError("unknown semantic %r for %r" % (semantic, pattern))
+        result.append((re.compile(pattern), semantic))
+    return result
+
+
+class SemanticResolver:
+    def __init__(self, mapping=None):
+        self.mapping = mapping or []
+
+        # (shader, attribute names) -> {attribute name: resolved name}
+        self.resolved = {}
+        self.hits = 0
+        self.misses = 0
+
+    # Identifies the mapping for cache keys, or None when there is none
+    def digest(self):
+        if not self.mapping:
+            return None
+        text = repr([(pattern.pattern, semantic) for pattern, semantic in self.mapping])
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+    # Returns {attribute name: resolved name} for the attributes of a draw, read by the given shader.
+    # signature is a function returning the input signature of the shader, or None, called only the
+    # first time a shader is seen with these attributes. Draws sharing a shader and input layout
+    # share the result
+    def resolve(self, shader, names, signature=None):
+        key = (shader, tuple(names))
+        result = self.resolved.get(key)
+        if result is not None:
+            self.hits += 1
+            return result
+        self.misses += 1
+
+        # The semantic the signature gives each variable
+        semantics = {}
+        signature = signature() if signature is not None else None
+        for sig in signature or []:
+            if sig.semanticName:
+                semantics[sig.varName] = parse_semantic(sig.semanticName, sig.semanticIndex)
+
+        # A canonical name goes to the first attribute resolving to it
+        resolved = {}
+        for name in names:
+            semantic = self.match(name, semantics)
+            if semantic is not None and canonical_name(*semantic) not in resolved.values():
+                resolved[name] = canonical_name(*semantic)
+
+        # The others keep their own names, numbered when an attribute already has that name
+        taken = set(resolved.values())
+        for name in names:
+            if name not in resolved:
+                unique = name
+                number = 1
+                while unique in taken:
+                    unique = "%s_%d" % (name, number)
+                    number += 1
+                resolved[name] = unique
+                taken.add(unique)
+
+        result = dict((name, resolved[name]) for name in names)
+
+        self.resolved[key] = result
+        return result
+
+    def match(self, name, semantics):
+        for pattern, semantic in self.mapping:
+            if pattern.fullmatch(name) is not None:
+                result = parse_semantic(semantic)
+                numbers = re.findall(r"\d+", name)
+                if result[0] in SETS and not semantic[-1:].isdigit() and numbers:
+                    result = (result[0], int(numbers[-1]))
+                return result
+
+        if semantics.get(name) is not None:
+            return semantics[name]
+
+        return parse_semantic(name)
+
@@ -0,0 +1,65 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+###############################################################################
+
+# Tests of the exporter outside of RenderDoc, on the synthetic captures of the
+# benchmark, which puts stand-ins for the renderdoc modules in place on import:
+#
+#   python -m unittest discover -s renderdoc2fbx/tests -t .
+#
+# run from the folder holding the extension. They run with and without numpy,
+# hiding it with RENDERDOC2FBX_NO_NUMPY=1.
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import io
+import os
+import sys
+import shutil
+import tempfile
+import contextlib
+
+if os.environ.get("RENDERDOC2FBX_NO_NUMPY"):
+    sys.modules["numpy"] = None
+
+from .. import benchmark
+from ..benchmark.replay import StubController
+from .. import exporter
+
+
+# Export every draw of a synthetic capture into a new folder, returns the folder, the controller and
+# the exporter. The folder is removed when the test ends. controller replaces the StubController of the capture
+def export(test, capture, controller=None, **options):
+    out = tempfile.mkdtemp(prefix="renderdoc2fbx_test_")
+    test.addCleanup(shutil.rmtree, out, True)
+    controller = controller if controller is not None else StubController(capture)
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = exporter.Exporter(controller, None, None, False, out, **options)
+    return out, controller, result
+
+
+def read(folder, name):
+    with open(os.path.join(folder, name), "rb") as f:
+        return f.read()
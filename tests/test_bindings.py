@@ -0,0 +1,79 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+###############################################################################
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os
+import unittest
+
+import renderdoc as rd
+
+from . import export, read
+from ..benchmark.replay import SyntheticCapture, grid_indices
+from ..benchmark.scenarios import FLOAT_LAYOUT
+
+COUNT = 64
+
+
+# Three meshes drawn either from one vertex and index buffer bound at other offsets for each draw,
+# or from buffers of their own holding the same data
+def offset_capture(shared):
+    capture = SyntheticCapture()
+    vb, stride, inputs = capture.add_vertex_buffer("vb", FLOAT_LAYOUT, COUNT * 3, 8, seed=1)
+    indices = grid_indices(8, 8)
+    ib = capture.add_index_buffer("ib", indices * 3, 2)
+    vertexData = capture.buffers[vb]
+    indexData = capture.buffers[ib]
+
+    for i in range(3):
+        vbOffset = stride * COUNT * i
+        ibOffset = 2 * len(indices) * i
+        if shared:
+            state = rd.PipeState(rd.BoundVBuffer(ib, ibOffset, 2), [rd.BoundVBuffer(vb, vbOffset, stride)], inputs)
+        else:
+            ownVb = capture.add_buffer("vb%d" % i, vertexData[vbOffset:vbOffset + stride * COUNT])
+            ownIb = capture.add_buffer("ib%d" % i, indexData[ibOffset:ibOffset + 2 * len(indices)])
+            state = rd.PipeState(rd.BoundVBuffer(ownIb, 0, 2), [rd.BoundVBuffer(ownVb, 0, stride)], inputs)
+        capture.add_draw(state, len(indices), 2)
+    return capture
+
+
+class BindingsTest(unittest.TestCase):
+    # Binding the same buffers at other offsets reuses the bindings, each draw reading its own range
+    def test_offsets_are_applied_per_draw(self):
+        expected, _, result = export(self, offset_capture(False))
+        self.assertEqual((result.bindings.misses, result.bindings.hits), (3, 0))
+
+        for chunk_size in (0, 10):
+            out, _, result = export(self, offset_capture(True), chunk_size=chunk_size)
+            self.assertEqual((result.bindings.misses, result.bindings.hits), (1, 2))
+            self.assertEqual(sorted(os.listdir(out)), sorted(os.listdir(expected)))
+            for name in os.listdir(expected):
+                self.assertEqual(read(out, name), read(expected, name), name)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+###############################################################################
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+from unittest import mock
+
+from . import export, read
+from .. import cache
+from ..benchmark.scenarios import many_small_draws
+
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="renderdoc2fbx_test_")
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.cache_dir = os.path.join(self.dir, "cache")
+        self.capture_path = os.path.join(self.dir, "frame.rdc")
+        with open(self.capture_path, "wb") as f:
+            f.write(b"capture")
+        self.capture = many_small_draws(0.001)
+
+    def export(self):
+        out, _, result = export(self, self.capture, cache_dir=self.cache_dir, capture_path=self.capture_path)
+        return out, result.cache
+
+    def entries(self):
+        return sorted(os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir))
+
+    # Replay calls of an export, with the cache on
+    def replay_calls(self, **options):
+        out, controller, result = export(self, self.capture, cache_dir=self.cache_dir,
+                                         capture_path=self.capture_path, **options)
+        return controller.calls["SetFrameEvent"], controller.calls["GetBufferData"], result.cache
+
+    # An unchanged capture exported again doesn't replay a single draw, until the cache is invalidated
+    # or the capture changes
+    def test_hits_skip_the_replay(self):
+        events, reads, result = self.replay_calls()
+        self.assertEqual((result.hits, result.misses), (0, 5))
+        self.assertGreaterEqual(events, 5)
+        self.assertGreater(reads, 0)
+
+        self.assertEqual(self.replay_calls()[:2], (0, 0))
+
+        self.assertEqual(self.replay_calls(invalidate_cache=True)[:2], (events, reads))
+        self.assertEqual(self.replay_calls()[:2], (0, 0))
+
+        with open(self.capture_path, "ab") as f:
+            f.write(b"saved again")
+        self.assertEqual(self.replay_calls()[:2], (events, reads))
+        self.assertEqual(self.replay_calls()[:2], (0, 0))
+
+    # Entries cut short anywhere, or damaged, are misses and the draws are exported again from the replay
+    def test_damaged_entries_are_misses(self):
+        expected, first = self.export()
+        self.assertEqual((first.hits, first.misses), (0, 5))
+        with open(self.entries()[0], "rb") as f:
+            entry = f.read()
+
+        header = len(cache._MAGIC) + 1 + entry[len(cache._MAGIC)] + 2
+        damaged = [
+            entry[:len(entry) // 2],
+            entry[:-1],
+            entry + b"\x00",
+            # a digest that isn't ascii
+            entry[:len(cache._MAGIC) + 1] + b"\xff" + entry[len(cache._MAGIC) + 2:],
+            # an index count running past the end of the file
+            entry[:header] + struct.pack("<Q", 1 << 60) + entry[header + 8:],
+            # one index less, which leaves the vertices read as the end of the indices
+            entry[:header] + struct.pack("<Q", struct.unpack_from("<Q", entry, header)[0] - 1) + entry[header + 8:],
+            # a uv set more than the entry holds
+            entry[:header - 1] + b"\x09" + entry[header:],
+        ]
+        for data in damaged:
+            for path in self.entries():
+                with open(path, "wb") as f:
+                    f.write(data)
+            out, result = self.export()
+            self.assertEqual((result.hits, result.misses), (0, 5))
+            for name in os.listdir(expected):
+                self.assertEqual(read(out, name), read(expected, name), name)
+
+        out, result = self.export()
+        self.assertEqual((result.hits, result.misses), (5, 0))
+
+    # A capture saved again is exported again, even with the same size and sampled content
+    def test_modified_capture_is_a_miss(self):
+        self.export()
+        stat = os.stat(self.capture_path)
+        os.utime(self.capture_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        out, result = self.export()
+        self.assertEqual((result.hits, result.misses), (0, 5))
+
+    # Entries another export sharing the cache removes while this one evicts or clears it are skipped
+    def test_entries_removed_by_another_export(self):
+        self.export()
+        stat, remove = os.stat, os.remove
+
+        def removed_before(function):
+            paths = set(self.entries())
+
+            def call(path, *args, **kwargs):
+                if path in paths:
+                    paths.discard(path)
+                    remove(path)
+                return function(path, *args, **kwargs)
+            return call
+
+        with mock.patch.object(cache.os, "stat", removed_before(stat)):
+            cache.ExportCache(self.cache_dir, 0).evict()
+        self.assertEqual(self.entries(), [])
+
+        self.export()
+        with mock.patch.object(cache.os, "remove", removed_before(remove)):
+            cache.ExportCache(self.cache_dir, 0).evict()
+        self.assertEqual(self.entries(), [])
+
+        self.export()
+        with mock.patch.object(cache.os, "remove", removed_before(remove)):
+            cache.ExportCache(self.cache_dir).clear()
+        self.assertEqual(self.entries(), [])
+
+    # Without the capture file the cache is off, and the summary says so
+    def test_cache_without_capture_is_reported(self):
+        out, _, result = export(self, self.capture, cache_dir=self.cache_dir)
+        self.assertIsNone(result.cache)
+        self.assertIn("cache: off", result.get_summary())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+###############################################################################
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import io
+import os
+import json
+import shutil
+import tempfile
+import unittest
+import contextlib
+
+import renderdoc as rd
+
+from .. import exporter
+from ..benchmark.replay import StubController, SyntheticCapture, grid_indices
+from ..benchmark.scenarios import FLOAT_LAYOUT
+
+DRAWS = 6
+
+
+# Draws of geometry and a texture of their own, except the fourth repeating the third
+def cancel_capture():
+    capture = SyntheticCapture()
+    indices = grid_indices(8, 8)
+    ib = capture.add_index_buffer("ib", indices, 2)
+    for i in range(DRAWS):
+        if i != 3:
+            vb, stride, inputs = capture.add_vertex_buffer("vb%d" % i, FLOAT_LAYOUT, 64, 8, seed=i)
+            texture = capture.add_texture("Texture%d" % i, 8, 8)
+            state = rd.PipeState(rd.BoundVBuffer(ib, 0, 2), [rd.BoundVBuffer(vb, 0, stride)], inputs, [texture])
+        capture.add_draw(state, len(indices), 2)
+    return capture
+
+
+# Cancels itself at its checks-th check, wherever in the export that falls
+class CancelAtCheck(exporter.ExportProgress):
+    def __init__(self, checks):
+        exporter.ExportProgress.__init__(self)
+        self.checks = checks
+
+    def check(self):
+        self.checks -= 1
+        if self.checks == 0:
+            self.cancel()
+        exporter.ExportProgress.check(self)
+
+
+class CancelTest(unittest.TestCase):
+    def export(self, progress, **options):
+        out = tempfile.mkdtemp(prefix="renderdoc2fbx_test_")
+        self.addCleanup(shutil.rmtree, out, True)
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = exporter.Exporter(StubController(cancel_capture()), None, None, True, out, progress=progress,
+                                       dedup=exporter.DEDUP_MANIFEST, **options)
+        return out, result
+
+    # The export stopped after the first done draws, with their files and no others, nothing half
+    # written, and manifests of just those draws
+    def assertStoppedAfter(self, out, result, done):
+        report = result.progress.report()
+        self.assertTrue(report.cancelled)
+        self.assertEqual((report.done, report.total), (done, DRAWS))
+        self.assertEqual(result.get_result(), "export cancelled after %d of %d drawcalls" % (done, DRAWS))
+
+        names = ["drawcall_%d.fbx" % (i + 1) for i in range(done)]
+        files = [name for name in names if name != "drawcall_4.fbx"]
+        self.assertEqual(sorted(name for name in os.listdir(out) if name.endswith(".fbx")), sorted(files))
+        self.assertEqual(report.bytes_written, sum(os.path.getsize(os.path.join(out, name)) for name in files))
+        for root, dirs, names_in_dir in os.walk(out):
+            self.assertEqual([name for name in names_in_dir if name.endswith(".tmp")], [])
+
+        with open(os.path.join(out, "manifest.json")) as f:
+            manifest = json.load(f)
+        self.assertEqual(manifest, dict((name, "drawcall_3.fbx" if name == "drawcall_4.fbx" else name)
+                                        for name in names))
+
+        with open(os.path.join(out, exporter.TEXTURE_MANIFEST_NAME)) as f:
+            textures = json.load(f)
+        self.assertEqual(sorted(textures), sorted(names))
+        for name, paths in textures.items():
+            self.assertEqual(len(paths), 1, name)
+            self.assertTrue(os.path.isfile(os.path.join(out, paths[0])), paths[0])
+
+    # Cancelled from the progress callback once n draws are done, as the UI does
+    def test_cancel_from_callback(self):
+        for n in range(DRAWS):
+            reports = []
+
+            def callback(report):
+                reports.append(report)
+                if report.done == n:
+                    progress.cancel()
+
+            progress = exporter.ExportProgress(callback, 0)
+            out, result = self.export(progress)
+            self.assertStoppedAfter(out, result, n)
+            self.assertEqual([report.done for report in reports], list(range(n + 1)) + [n])
+            last = reports[-1]
+            self.assertEqual((last.done, last.total, last.bytes_written, last.cancelled),
+                             (n, DRAWS, progress.bytes_written, True))
+
+    # Cancelled at any of the checks, between draws, while one is decoded or while it is written
+    def test_cancel_anywhere(self):
+        for fbx_format in (exporter.FBX_FORMAT_ASCII, exporter.FBX_FORMAT_BINARY):
+            checks = 1
+            while True:
+                progress = CancelAtCheck(checks)
+                out, result = self.export(progress, fbx_format=fbx_format, chunk_size=128)
+                if not progress.cancelled:
+                    break
+                self.assertStoppedAfter(out, result, progress.done)
+                checks += 1
+            self.assertGreater(checks, DRAWS * 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
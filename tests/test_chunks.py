@@ -0,0 +1,97 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+###############################################################################
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import unittest
+from unittest import mock
+
+import renderdoc as rd
+
+from . import export, read
+from .. import exporter
+from ..benchmark.replay import StubController, SyntheticCapture
+from ..benchmark.scenarios import FLOAT_LAYOUT, PACKED_LAYOUT
+
+QUADS = 200
+CHUNK_QUADS = 10
+
+
+# A strip of quads, each made of two vertices from the start of the vertex buffer and two from its
+# end, so that the vertices of any few quads lie as far apart as the buffer is long
+def spread_capture(layout):
+    capture = SyntheticCapture()
+    count = QUADS * 4
+    vb, stride, inputs = capture.add_vertex_buffer("vb", layout, count, 8)
+    indices = []
+    for q in range(QUADS):
+        a, b, c, d = 2 * q, 2 * q + 1, count - 1 - 2 * q, count - 2 - 2 * q
+        indices += (a, b, c, c, b, d)
+    ib = capture.add_index_buffer("ib", indices, 2)
+    state = rd.PipeState(rd.BoundVBuffer(ib, 0, 2), [rd.BoundVBuffer(vb, 0, stride)], inputs)
+    capture.add_draw(state, len(indices), 2)
+    return capture, vb, stride
+
+
+# Keeps the length of every read of one buffer
+class ReadLengths(StubController):
+    def __init__(self, capture, resourceId):
+        StubController.__init__(self, capture)
+        self.resourceId = resourceId
+        self.lengths = []
+
+    def GetBufferData(self, resourceId, offset, length):
+        data = StubController.GetBufferData(self, resourceId, offset, length)
+        if resourceId == self.resourceId:
+            self.lengths.append(len(data))
+        return data
+
+
+class ChunkedExportTest(unittest.TestCase):
+    # A chunk only reads the vertices it references, and the ones between them it joins into runs,
+    # not the whole range of the draw. The same file is written as by an export of the whole draw
+    def test_chunks_read_their_own_vertices(self):
+        for numpy in (True, False):
+            if numpy and exporter.np is None:
+                continue
+            for layout in (FLOAT_LAYOUT, PACKED_LAYOUT):
+                with mock.patch.object(exporter, "np", exporter.np if numpy else None), \
+                        mock.patch.object(exporter, "CHUNK_GAP_BYTES", 0):
+                    capture, vb, stride = spread_capture(layout)
+                    expected, _, _ = export(self, capture, chunk_size=0)
+                    controller = ReadLengths(capture, vb)
+                    out, _, result = export(self, capture, chunk_size=CHUNK_QUADS * 6, buffer_cache_bytes=0,
+                                            controller=controller)
+                    self.assertIsNone(result.get_result())
+                    self.assertEqual(read(out, "drawcall_1.fbx"), read(expected, "drawcall_1.fbx"), numpy)
+
+                    # A chunk's quads use 4 vertices each, its runs read at most as many in between
+                    self.assertLessEqual(max(controller.lengths), CHUNK_QUADS * 4 * 2 * stride, numpy)
+                    self.assertLess(sum(controller.lengths), len(controller.lengths) * QUADS * stride, numpy)
+
+
+if __name__ == "__main__":
+    unittest.main()
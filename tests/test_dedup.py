@@ -0,0 +1,121 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+###############################################################################
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import contextlib
+
+import renderdoc as rd
+
+from . import export, read
+from .. import exporter
+from ..benchmark.replay import StubController, SyntheticCapture, grid_indices
+from ..benchmark.scenarios import FLOAT_LAYOUT
+
+
+# Three draws of the same bindings, the vertex buffer rewritten in place after the first if rewritten
+def repeated_capture(rewritten):
+    capture = SyntheticCapture()
+    vb, stride, inputs = capture.add_vertex_buffer("vb", FLOAT_LAYOUT, 64, 8, seed=1)
+    other, _, _ = capture.add_vertex_buffer("other", FLOAT_LAYOUT, 64, 8, seed=2)
+    indices = grid_indices(8, 8)
+    ib = capture.add_index_buffer("ib", indices, 2)
+    state = rd.PipeState(rd.BoundVBuffer(ib, 0, 2), [rd.BoundVBuffer(vb, 0, stride)], inputs)
+
+    capture.add_draw(state, len(indices), 2)
+    if rewritten:
+        capture.write_buffer(vb, capture.buffers[other])
+    capture.add_draw(state, len(indices), 2)
+    capture.add_draw(state, len(indices), 2)
+    return capture
+
+
+class DeduplicationTest(unittest.TestCase):
+    def test_repeated_bindings_are_reused(self):
+        out, _, result = export(self, repeated_capture(False), dedup=exporter.DEDUP_HARDLINK)
+        self.assertEqual((result.dedup.key_hits, result.dedup.digest_hits), (2, 0))
+
+    # A buffer written between two draws binding it alike holds other geometry
+    def test_rewritten_buffer_is_not_reused(self):
+        capture = repeated_capture(True)
+        expected, _, _ = export(self, capture)
+        for buffer_cache_bytes in (0, 1 << 20):
+            out, _, result = export(self, capture, dedup=exporter.DEDUP_HARDLINK,
+                                    buffer_cache_bytes=buffer_cache_bytes)
+            self.assertEqual((result.dedup.key_hits, result.dedup.digest_hits), (1, 0))
+            # The third draw is linked to the second, model name and all
+            for name, source in [("drawcall_1.fbx", "drawcall_1.fbx"), ("drawcall_2.fbx", "drawcall_2.fbx"),
+                                 ("drawcall_3.fbx", "drawcall_2.fbx")]:
+                self.assertEqual(read(out, name), read(expected, source), name)
+        self.assertNotEqual(read(expected, "drawcall_1.fbx"), read(expected, "drawcall_2.fbx"))
+
+
+# Two draws binding an atlas, the second a copy of it under another resource id
+def atlas_capture():
+    capture = SyntheticCapture()
+    vb, stride, inputs = capture.add_vertex_buffer("vb", FLOAT_LAYOUT, 16, 4)
+    indices = grid_indices(4, 4)
+    ib = capture.add_index_buffer("ib", indices, 2)
+    atlas = capture.add_texture("Atlas", 16, 16)
+    for texture in (atlas, capture.add_texture("AtlasCopy", 16, 16, copy_of=atlas)):
+        state = rd.PipeState(rd.BoundVBuffer(ib, 0, 2), [rd.BoundVBuffer(vb, 0, stride)], inputs, [texture])
+        capture.add_draw(state, len(indices), 2)
+    return capture
+
+
+class TextureDeduplicationTest(unittest.TestCase):
+    def setUp(self):
+        self.out = tempfile.mkdtemp(prefix="renderdoc2fbx_test_")
+        self.addCleanup(shutil.rmtree, self.out, True)
+
+    def export(self, capture, **options):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return exporter.Exporter(StubController(capture), None, None, True, self.out, **options).texture_saver
+
+    # Without mesh deduplication, the same pixels under another resource id or from an earlier export
+    # into the same folder are referred to the file already holding them
+    def test_repeated_textures_are_reused(self):
+        capture = atlas_capture()
+        saver = self.export(capture)
+        self.assertEqual((saver.encoded, saver.reused), (1, 1))
+        self.assertEqual(sorted(os.listdir(os.path.join(self.out, "Textures"))), ["Atlas.png", "texture_index.json"])
+
+        saver = self.export(capture)
+        self.assertEqual((saver.encoded, saver.reused), (0, 2))
+
+    def test_switched_off(self):
+        saver = self.export(atlas_capture(), texture_dedup=False)
+        self.assertEqual((saver.encoded, saver.reused), (2, 0))
+        self.assertEqual(sorted(os.listdir(os.path.join(self.out, "Textures"))), ["Atlas.png", "AtlasCopy.png"])
+
+
+if __name__ == "__main__":
+    unittest.main()
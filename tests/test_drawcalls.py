@@ -0,0 +1,185 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+###############################################################################
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os
+import re
+import random
+import unittest
+
+import renderdoc as rd
+
+from . import export
+from .. import drawcalls
+from ..benchmark.scenarios import many_small_draws
+
+DRAW = rd.DrawFlags.Drawcall | rd.DrawFlags.Indexed
+NON_DRAWS = [rd.DrawFlags.Clear, rd.DrawFlags.Copy, rd.DrawFlags.Present, rd.DrawFlags.Dispatch,
+             rd.DrawFlags.Resolve | rd.DrawFlags.GenMips]
+MARKER_NAMES = ["Shadows", "GBuffer", "Opaque", "Transparent", "Post", "UI"]
+
+
+# A random tree of actions, draws and others under up to depth levels of markers. Drawcall and event
+# ids count up in pre-order with random gaps, as they do for actions the capture doesn't list
+class RandomTree:
+    def __init__(self, seed, depth=4):
+        self.rng = random.Random(seed)
+        self.next_id = 0
+        self.roots = self.children(depth, 40)
+
+    def new_id(self):
+        self.next_id += self.rng.choice((1, 1, 1, 2, 5, 40))
+        return self.next_id
+
+    def action(self, name, flags):
+        drawcallId = self.new_id()
+        return rd.DrawcallDescription(drawcallId, drawcallId * 3, name, flags)
+
+    def children(self, depth, count=6):
+        actions = []
+        for _ in range(self.rng.randrange(count)):
+            kind = self.rng.random()
+            if depth > 0 and kind < 0.3:
+                marker = self.action(self.rng.choice(MARKER_NAMES), rd.DrawFlags.PushMarker)
+                marker.children = self.children(depth - 1)
+                actions.append(marker)
+            elif kind < 0.75:
+                actions.append(self.action("DrawIndexed", DRAW))
+            else:
+                actions.append(self.action("Other", self.rng.choice(NON_DRAWS)))
+        return actions
+
+
+# Every draw of a tree with the names of the markers it's nested under, in event order
+def scan(roots, markers=()):
+    draws = []
+    for action in roots:
+        if action.flags & rd.DrawFlags.Drawcall:
+            draws.append((action, markers))
+        if action.flags & rd.DrawFlags.PushMarker:
+            draws += scan(action.children, markers + (action.name,))
+        else:
+            draws += scan(action.children, markers)
+    return sorted(draws, key=lambda draw: draw[0].eventId)
+
+
+# What select returns, looking at every draw of the tree
+def scan_select(roots, start=None, end=None, marker=None):
+    return [action for action, markers in scan(roots)
+            if (start is None or action.drawcallId >= start) and (end is None or action.drawcallId <= end)
+            and (marker is None or any(re.search(marker, name) for name in markers))]
+
+
+class DrawcallIndexTest(unittest.TestCase):
+    # Draws are found under any depth of markers, in pre-order, and nothing else is a draw
+    def test_nested_markers(self):
+        def action(drawcallId, flags, children=(), name="Draw"):
+            return rd.DrawcallDescription(drawcallId, drawcallId, name, flags, children=children)
+
+        roots = [
+            action(1, rd.DrawFlags.Clear),
+            action(2, rd.DrawFlags.PushMarker, [
+                action(3, DRAW),
+                action(4, rd.DrawFlags.PushMarker, [
+                    action(5, DRAW),
+                    action(6, rd.DrawFlags.Copy),
+                    action(7, rd.DrawFlags.PushMarker, [action(8, DRAW)], "Inner"),
+                ], "Middle"),
+                action(9, DRAW),
+            ], "Outer"),
+            action(10, DRAW),
+            action(11, rd.DrawFlags.Present),
+        ]
+        index = drawcalls.DrawcallIndex(roots)
+        self.assertEqual(index.ids, [3, 5, 8, 9, 10])
+        self.assertEqual(len(index), 5)
+        self.assertEqual(sorted(index.actions), list(range(1, 12)))
+        self.assertIs(index.find(6), roots[1].children[1].children[1])
+        self.assertIsNone(index.find(12))
+
+        self.assertEqual([d.drawcallId for d in index.select(marker="^Middle$")], [5, 8])
+        self.assertEqual([d.drawcallId for d in index.select(marker="Inner")], [8])
+        self.assertEqual([d.drawcallId for d in index.select(marker="Outer")], [3, 5, 8, 9])
+        self.assertEqual([d.drawcallId for d in index.select(4, 8, marker="Outer")], [5, 8])
+        self.assertEqual(index.select(marker="Shadows"), [])
+
+        # Deeper than the recursion limit
+        root = leaf = action(1, rd.DrawFlags.PushMarker, name="Level")
+        for drawcallId in range(2, 5000):
+            child = action(drawcallId, rd.DrawFlags.PushMarker, name="Level")
+            leaf.children = [child]
+            leaf = child
+        leaf.children = [action(5000, DRAW)]
+        self.assertEqual(drawcalls.DrawcallIndex([root]).ids, [5000])
+
+    # Ranges with bounds on, between and beyond the ids of sparse draws, with and without marker
+    # patterns, select what looking at every draw selects
+    def test_select_matches_scan(self):
+        patterns = [None, "Shadows", "^G", "Opaque|Post", "ent$", "Nothing", "^$"]
+        for seed in range(30):
+            tree = RandomTree(seed)
+            index = drawcalls.DrawcallIndex(tree.roots)
+            draws = [action for action, markers in scan(tree.roots)]
+            self.assertEqual(index.draws, draws)
+            self.assertTrue(all(action.flags & rd.DrawFlags.Drawcall for action in index.draws))
+
+            bounds = [None, 0, 1, tree.next_id, tree.next_id + 1]
+            for action in draws:
+                bounds += [action.drawcallId - 1, action.drawcallId, action.drawcallId + 1]
+            rng = random.Random(seed)
+            for _ in range(100):
+                start, end = rng.choice(bounds), rng.choice(bounds)
+                marker = rng.choice(patterns)
+                self.assertEqual(index.select(start, end, marker), scan_select(tree.roots, start, end, marker),
+                                 (seed, start, end, marker))
+
+    # Children listed out of event order are still selected in event order
+    def test_event_order(self):
+        draws = [rd.DrawcallDescription(i, i, "Draw", DRAW) for i in (4, 2, 3)]
+        marker = rd.DrawcallDescription(1, 1, "Pass", rd.DrawFlags.PushMarker, children=draws)
+        index = drawcalls.DrawcallIndex([marker])
+        self.assertEqual([d.drawcallId for d in index.select(2, 3, "Pass")], [2, 3])
+
+    # A pattern matching no marker, or not a pattern at all, exports nothing and says why
+    def test_export_by_marker(self):
+        capture = many_small_draws(0.001)
+        out, _, result = export(self, capture, marker="^Pass 0$")
+        self.assertIsNone(result.get_result())
+        self.assertEqual(sorted(os.listdir(out)), ["drawcall_%d.fbx" % i for i in range(1, 6)])
+
+        out, _, result = export(self, capture, marker="Shadows")
+        self.assertEqual(result.get_result(),
+                         "no drawcalls to export in the given range under a marker matching Shadows")
+        self.assertEqual(os.listdir(out), [])
+
+        out, _, result = export(self, capture, marker="(")
+        self.assertTrue(result.get_result().startswith("not a valid marker pattern"))
+        self.assertEqual(os.listdir(out), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+###############################################################################
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import io
+import shutil
+import tempfile
+import unittest
+import contextlib
+
+from .. import exporter
+from .. import profiler
+from ..benchmark import fake_qrenderdoc
+from ..benchmark.replay import StubController
+from ..benchmark.scenarios import many_small_draws
+
+
+class BrokenController(StubController):
+    def GetDrawcalls(self):
+        raise RuntimeError("Packed format D24S8 is not supported!")
+
+
+class ExportWrapTest(unittest.TestCase):
+    # Run export_wrap like the UI does, returns what finished_callback was called with
+    def export_wrap(self, controller, **options):
+        out = tempfile.mkdtemp(prefix="renderdoc2fbx_test_")
+        self.addCleanup(shutil.rmtree, out, True)
+        finished = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            exporter.export_wrap(fake_qrenderdoc.CaptureContext(controller), None, None, False, out,
+                                 lambda result, summary: finished.append(result), **options)
+        return finished
+
+    # The UI only allows another export once finished_callback is called
+    def test_failed_export_finishes(self):
+        finished = self.export_wrap(BrokenController(many_small_draws(0.001)), profile=True)
+        self.assertEqual(finished, ["RuntimeError: Packed format D24S8 is not supported!"])
+        self.assertIs(profiler.current(), profiler.NULL_PROFILER)
+
+    def test_aborted_export_resets_the_profiler(self):
+        finished = self.export_wrap(StubController(many_small_draws(0.001)), profile=True, marker="(")
+        self.assertEqual(len(finished), 1)
+        self.assertTrue(finished[0].startswith("not a valid marker pattern"))
+        self.assertIs(profiler.current(), profiler.NULL_PROFILER)
+
+    def test_export_finishes(self):
+        finished = self.export_wrap(StubController(many_small_draws(0.001)))
+        self.assertEqual(finished, [None])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+###############################################################################
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import io
+import os
+import json
+import shutil
+import tempfile
+import unittest
+import contextlib
+
+import renderdoc as rd
+
+from .. import exporter
+from .. import farm
+from ..benchmark.replay import StubController, SyntheticCapture, grid_indices
+from ..benchmark.scenarios import FLOAT_LAYOUT
+
+# Capture path -> SyntheticCapture, for stub_capture
+CAPTURES = {}
+
+
+def stub_capture(path):
+    return StubController(CAPTURES[path]), lambda: None
+
+
+# Draws each binding a texture of their own, every third one a fullscreen pass without vertex inputs
+def textured_capture(draws):
+    capture = SyntheticCapture()
+    vb, stride, inputs = capture.add_vertex_buffer("vb", FLOAT_LAYOUT, 16, 4)
+    indices = grid_indices(4, 4)
+    ib = capture.add_index_buffer("ib", indices, 2)
+    for i in range(draws):
+        texture = capture.add_texture("Texture%d" % i, 4, 4)
+        state = rd.PipeState(rd.BoundVBuffer(ib, 0, 2), [rd.BoundVBuffer(vb, 0, stride)],
+                             [] if i % 3 == 2 else inputs, [texture])
+        capture.add_draw(state, len(indices), 2)
+    return capture
+
+
+class FarmTest(unittest.TestCase):
+    def setUp(self):
+        self.out = tempfile.mkdtemp(prefix="renderdoc2fbx_test_")
+        self.addCleanup(shutil.rmtree, self.out, True)
+        CAPTURES["capture.rdc"] = textured_capture(6)
+        self.addCleanup(CAPTURES.clear)
+
+    def run_farm(self, jobs, **options):
+        options = {"is_save_texture": True, "exporter": options}
+        with contextlib.redirect_stdout(io.StringIO()):
+            return farm.Farm(jobs, options, controller_factory=stub_capture, initializer=None).run()
+
+    def manifest(self, name=farm.MANIFEST_NAME):
+        with open(os.path.join(self.out, name)) as f:
+            return json.load(f)
+
+    # Skipped drawcalls are counted, they don't fail or retry the job
+    def test_skipped_draws_are_not_failures(self):
+        batch = self.run_farm(farm.make_jobs(["capture.rdc"], self.out))
+        self.assertEqual((batch.completed, batch.failed), (1, 0))
+        record = self.manifest()
+        self.assertEqual(record["status"], "ok")
+        self.assertEqual((record["draws"], record["skipped"]), (4, 2))
+        self.assertEqual(record["shards"][0]["attempts"], 1)
+
+    def test_shards_keep_their_reports(self):
+        jobs = farm.make_jobs(["capture.rdc"], self.out, 1, 6, shard_size=2)
+        batch = self.run_farm(jobs, profile=True)
+        self.assertEqual((batch.completed, batch.failed), (1, 0))
+
+        record = self.manifest()
+        self.assertEqual([shard["reports"] for shard in record["shards"]],
+                         ["shards/1-2", "shards/3-4", "shards/5-6"])
+        for shard in record["shards"]:
+            self.assertTrue(os.path.exists(os.path.join(self.out, shard["reports"], "export_profile.json")))
+
+        # The manifest of every shard is merged into the capture's, textures of all of them still exist
+        textures = self.manifest(exporter.TEXTURE_MANIFEST_NAME)
+        self.assertEqual(list(textures), ["drawcall_%d.fbx" % i for i in range(1, 7)])
+        for files in textures.values():
+            for path in files:
+                self.assertTrue(os.path.exists(os.path.join(self.out, path)), path)
+
+    # A shard whose range holds no draws exports none, the capture is still complete
+    def test_empty_shard_is_not_a_failure(self):
+        jobs = farm.make_jobs(["capture.rdc"], self.out, 1, 12, shard_size=6)
+        batch = self.run_farm(jobs)
+        self.assertEqual((batch.completed, batch.failed), (1, 0))
+
+        record = self.manifest()
+        self.assertEqual(record["status"], "ok")
+        self.assertEqual([(shard["range"], shard["result"], shard["draws"], shard["attempts"])
+                          for shard in record["shards"]], [([1, 6], None, 4, 1), ([7, 12], None, 0, 1)])
+
+    # A range holding no draws at all still fails its capture
+    def test_empty_range_fails(self):
+        batch = self.run_farm(farm.make_jobs(["capture.rdc"], self.out, 7, 12, shard_size=6))
+        self.assertEqual((batch.completed, batch.failed), (0, 1))
+
+    # Shards saving textures into the same folder at once keep the entries of each other in its index
+    def test_texture_index_keeps_other_shards(self):
+        jobs = farm.make_jobs(["capture.rdc"], self.out, 1, 6, shard_size=2)
+        self.run_farm(jobs, dedup=exporter.DEDUP_HARDLINK)
+        with open(os.path.join(self.out, "Textures", "texture_index.json")) as f:
+            index = json.load(f)
+        self.assertEqual(len(index["textures"]), 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,296 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+###############################################################################
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import io
+import os
+import re
+import zlib
+import shutil
+import struct
+import tempfile
+import unittest
+from unittest import mock
+
+import renderdoc as rd
+
+from . import export, read
+from .. import exporter
+from .. import fbx_binary
+from ..benchmark.replay import SyntheticCapture, grid_indices, vertex_format
+from ..benchmark.scenarios import FLOAT_LAYOUT
+
+_PROPERTY_FORMATS = {"Y": "<h", "C": "<B", "I": "<i", "F": "<f", "D": "<d", "L": "<q"}
+_ARRAY_FORMATS = {"d": "d", "f": "f", "i": "i", "l": "q", "b": "B"}
+
+
+# Parse a binary FBX file into its version and a tree of (name, properties, children) nodes, checking
+# every record length, array header, null record and the footer on the way. "Name\x00\x01Class"
+# object names are turned back into the "Class::Name" of the ascii files
+def parse_binary(data):
+    assert data[:23] == fbx_binary._MAGIC, "bad magic"
+    version = struct.unpack_from("<I", data, 23)[0]
+    header = "<QQQ" if version >= 7500 else "<III"
+    headerSize = struct.calcsize(header)
+    null = b"\x00" * (headerSize + 1)
+
+    def read_property(pos):
+        code = chr(data[pos])
+        pos += 1
+        if code in _PROPERTY_FORMATS:
+            value = struct.unpack_from(_PROPERTY_FORMATS[code], data, pos)[0]
+            return value, pos + struct.calcsize(_PROPERTY_FORMATS[code])
+        if code in "SR":
+            length = struct.unpack_from("<I", data, pos)[0]
+            value = data[pos + 4:pos + 4 + length]
+            if code == "S":
+                value = value.decode("utf-8")
+                if "\x00\x01" in value:
+                    name, cls = value.split("\x00\x01")
+                    value = cls + "::" + name
+            return value, pos + 4 + length
+
+        count, encoding, length = struct.unpack_from("<III", data, pos)
+        raw = data[pos + 12:pos + 12 + length]
+        assert encoding in (0, 1), encoding
+        if encoding:
+            raw = zlib.decompress(raw)
+        itemFormat = "<%d%s" % (count, _ARRAY_FORMATS[code])
+        assert len(raw) == struct.calcsize(itemFormat), "array length"
+        return list(struct.unpack(itemFormat, raw)), pos + 12 + length
+
+    def read_node(pos):
+        end, numProperties, propertiesLength = struct.unpack_from(header, data, pos)
+        if end == 0:
+            assert data[pos:pos + len(null)] == null
+            return None, pos + len(null)
+        pos += headerSize
+        name = data[pos + 1:pos + 1 + data[pos]].decode("ascii")
+        pos += 1 + data[pos]
+
+        properties = []
+        propertiesStart = pos
+        for _ in range(numProperties):
+            value, pos = read_property(pos)
+            properties.append(value)
+        assert pos - propertiesStart == propertiesLength, (name, "property list length")
+
+        children = []
+        if pos < end:
+            while True:
+                child, pos = read_node(pos)
+                if child is None:
+                    break
+                children.append(child)
+        assert pos == end, (name, "record end")
+        return (name, properties, children), pos
+
+    nodes = []
+    pos = 27
+    while True:
+        node, pos = read_node(pos)
+        if node is None:
+            break
+        nodes.append(node)
+
+    # The footer id, 4 zero bytes and zero padding up to a multiple of 16, then the version, 120 zero
+    # bytes and the footer magic
+    assert data[pos:pos + 16] == fbx_binary._FOOTER_ID, "footer id"
+    pos += 20
+    padding = (16 - pos % 16) or 16
+    assert data[pos - 4:pos + padding] == b"\x00" * (4 + padding), "footer padding"
+    pos += padding
+    assert struct.unpack_from("<I", data, pos)[0] == version, "footer version"
+    assert data[pos + 4:pos + 124] == b"\x00" * 120
+    assert data[pos + 124:] == fbx_binary._FOOTER_MAGIC, "footer magic"
+    return version, nodes
+
+
+_ASCII_TOKEN = re.compile(r'''\s*(?:(?P<name>[A-Za-z_]\w*):|"(?P<string>[^"]*)"|\*(?P<count>\d+)'''
+                          r'''|(?P<number>[-+.\w]+)|(?P<punct>[{},]))''')
+
+
+def _number(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+# Parse an ascii FBX file into the same tree, arrays being nodes with the list as their one property
+def parse_ascii(text):
+    text = "\n".join(line for line in text.splitlines() if not line.lstrip().startswith(";"))
+    tokens = []
+    pos = 0
+    while text[pos:].strip():
+        match = _ASCII_TOKEN.match(text, pos)
+        assert match, text[pos:pos + 40]
+        tokens.append((match.lastgroup, match.group(match.lastgroup)))
+        pos = match.end()
+    tokens.append(("end", None))
+
+    def read_nodes(i):
+        nodes = []
+        while tokens[i][0] == "name":
+            name = tokens[i][1]
+            i += 1
+            properties = []
+            count = None
+            while tokens[i][0] in ("string", "number", "count") or tokens[i][1] == ",":
+                kind, value = tokens[i]
+                if kind == "string":
+                    properties.append(value)
+                elif kind == "number":
+                    properties.append(_number(value))
+                elif kind == "count":
+                    count = int(value)
+                i += 1
+
+            children = []
+            if tokens[i][1] == "{":
+                children, i = read_nodes(i + 1)
+                assert tokens[i][1] == "}", (name, tokens[i])
+                i += 1
+
+            if count is not None:
+                assert [child[0] for child in children] == ["a"], name
+                properties = [children[0][1]]
+                assert len(properties[0]) == count, (name, "array length")
+                children = []
+            nodes.append((name, properties, children))
+        return nodes, i
+
+    nodes, i = read_nodes(0)
+    assert tokens[i][0] == "end", tokens[i]
+    return nodes
+
+
+def find(nodes, name):
+    return [node for node in nodes if node[0] == name]
+
+
+# Two colour and uv sets, the second of each in a layer of its own
+LAYOUT = FLOAT_LAYOUT + [
+    ("in_COLOR1", vertex_format(rd.CompType.UNorm, 4, 1)),
+    ("in_TEXCOORD1", vertex_format(rd.CompType.Float, 2, 4)),
+]
+
+
+def layered_capture(draws=3):
+    capture = SyntheticCapture()
+    for i in range(draws):
+        vb, stride, inputs = capture.add_vertex_buffer("vb%d" % i, LAYOUT, 6 * 5, 6, seed=i)
+        indices = grid_indices(6, 5)
+        ib = capture.add_index_buffer("ib%d" % i, indices, 2)
+        state = rd.PipeState(rd.BoundVBuffer(ib, 0, 2), [rd.BoundVBuffer(vb, 0, stride)], inputs)
+        capture.add_draw(state, len(indices), 2)
+    return capture
+
+
+class BinaryWriterTest(unittest.TestCase):
+    def write(self, version, compress, np=None):
+        f = io.BytesIO()
+        writer = fbx_binary.BinaryFbxWriter(f, version, compress)
+        writer.begin_node("Top", True, 7, -2 ** 31, 2 ** 40, fbx_binary.Int64(1), 0.25, "text", b"\x00raw",
+                          fbx_binary.object_name("Model", "cube"))
+        writer.node("Empty")
+        writer.begin_node("Nested", 1)
+        writer.node("Leaf", "a", 2)
+        writer.array_node("Short", "d", [0.5, -1.5])
+        writer.end_node()
+        for typecode in "dfil":
+            writer.array_node("Array_" + typecode, typecode, list(range(-50, 50)))
+        if np is not None:
+            writer.array_node("NumPy", "d", np.linspace(-1.0, 1.0, 101))
+        writer.end_node()
+        writer.node("Last", 3)
+        writer.close()
+        return f.getvalue()
+
+    # Every property type, empty and nested nodes and arrays written over several chunks, compressed
+    # or not, read back as they were written
+    def test_round_trip(self):
+        np = exporter.np
+        expected = [
+            ("Top", [True, 7, -2 ** 31, 2 ** 40, 1, 0.25, "text", b"\x00raw", "Model::cube"], [
+                ("Empty", [], []),
+                ("Nested", [1], [("Leaf", ["a", 2], []), ("Short", [[0.5, -1.5]], [])]),
+            ] + [("Array_" + typecode, [list(range(-50, 50))], []) for typecode in "dfil"]
+              + ([("NumPy", [np.linspace(-1.0, 1.0, 101).tolist()], [])] if np is not None else [])),
+            ("Last", [3], []),
+        ]
+        for version in (7400, 7500):
+            for compress in (False, True):
+                with mock.patch.object(fbx_binary, "ARRAY_CHUNK_SIZE", 7):
+                    data = self.write(version, compress, np)
+                self.assertEqual(parse_binary(data), (version, expected), (version, compress))
+
+    # The object counts are only known once every mesh is added, and patched into the Definitions
+    def test_scene_counts(self):
+        mesh = exporter.FbxMesh()
+        mesh.indices = [0, 1, 2]
+        mesh.vertices = [0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0, 0.0]
+
+        path = os.path.join(self.mkdtemp(), "scene.fbx")
+        scene = fbx_binary.SceneWriter(path)
+        for geometry in range(2):
+            scene.add_geometry(mesh, 100 + geometry)
+        for model in range(3):
+            scene.add_model("m%d" % model, 200 + model, 100 + model % 2)
+        scene.close()
+
+        version, nodes = parse_binary(read(*os.path.split(path)))
+        definitions = find(nodes, "Definitions")[0][2]
+        counts = {node[1][0]: find(node[2], "Count")[0][1] for node in find(definitions, "ObjectType")}
+        self.assertEqual(counts, {"Geometry": [2], "Model": [3]})
+        self.assertEqual(len(find(find(nodes, "Objects")[0][2], "Geometry")), 2)
+        self.assertEqual(find(find(nodes, "Connections")[0][2], "C")[-1], ("C", ["OO", 100, 202], []))
+
+    def mkdtemp(self):
+        path = tempfile.mkdtemp(prefix="renderdoc2fbx_test_")
+        self.addCleanup(shutil.rmtree, path, True)
+        return path
+
+    # The binary files hold the document of the ascii ones, arrays and all
+    def test_matches_ascii(self):
+        capture = layered_capture()
+        for options in [{}, {"chunk_size": 10}, {"scene": True}]:
+            ascii, _, _ = export(self, capture, **options)
+            binary, _, _ = export(self, capture, fbx_format=exporter.FBX_FORMAT_BINARY, **options)
+            names = sorted(name for name in os.listdir(ascii) if name.endswith(".fbx"))
+            self.assertEqual(names, sorted(name for name in os.listdir(binary) if name.endswith(".fbx")))
+            for name in names:
+                version, nodes = parse_binary(read(binary, name))
+                self.assertEqual(version, fbx_binary.FBX_BINARY_VERSION)
+                self.assertEqual(find(nodes, "FBXHeaderExtension")[0][2],
+                                 [("FBXHeaderVersion", [1003], []), ("FBXVersion", [version], [])])
+                nodes = [node for node in nodes if node[0] != "FBXHeaderExtension"]
+                self.assertEqual(nodes, parse_ascii(read(ascii, name).decode("utf-8")), (options, name))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,209 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+###############################################################################
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os
+import struct
+import random
+import unittest
+from unittest import mock
+
+import renderdoc as rd
+
+from . import export, read
+from .. import exporter
+from ..benchmark.replay import StubController, SyntheticCapture, vertex_format
+from ..benchmark.scenarios import FLOAT_LAYOUT
+
+RESTART = 0xFFFF
+
+
+# Random strip or fan indices into 16 vertices, with restarts among them
+def random_indices(rng):
+    return [RESTART if rng.random() < 0.15 else rng.randrange(16) for _ in range(rng.randrange(60))]
+
+
+# The triangles of the strips or fans between restarts, one run at a time
+def unrolled(indices, topology):
+    result = []
+    runs = [[]]
+    for idx in indices:
+        if idx == RESTART:
+            runs.append([])
+        else:
+            runs[-1].append(idx)
+    for run in runs:
+        for k in range(len(run) - 2):
+            if topology == rd.Topology.TriangleFan:
+                triangle = (run[0], run[k + 1], run[k + 2])
+            elif k % 2:
+                triangle = (run[k + 1], run[k], run[k + 2])
+            else:
+                triangle = (run[k], run[k + 1], run[k + 2])
+            if len(set(triangle)) == 3:
+                result += triangle
+    return result
+
+
+# A capture of strips or fans with random restarts, reading 16 vertices
+def restart_capture(seed, draws=20, topology=rd.Topology.TriangleStrip):
+    rng = random.Random(seed)
+    capture = SyntheticCapture()
+    vb, stride, inputs = capture.add_vertex_buffer("vb", FLOAT_LAYOUT, 16, 4)
+    for i in range(draws):
+        indices = random_indices(rng)
+        ib = capture.add_index_buffer("ib%d" % i, indices, 2)
+        state = rd.PipeState(rd.BoundVBuffer(ib, 0, 2), [rd.BoundVBuffer(vb, 0, stride)], inputs,
+                             restartEnabled=True, topology=topology)
+        capture.add_draw(state, len(indices), 2)
+    return capture
+
+
+# A triangle list using the last vertex a 16 bit index reaches, with restart enabled as RenderDoc reports
+# it for D3D11 or not at all
+def list_capture(restartEnabled):
+    capture = SyntheticCapture()
+    vb, stride, inputs = capture.add_vertex_buffer("vb", [("in_POSITION0", vertex_format(rd.CompType.Float, 3, 4))],
+                                                   RESTART + 1, 256)
+    indices = [0, 1, RESTART, RESTART, 1, 2, 2, RESTART, 3]
+    ib = capture.add_index_buffer("ib", indices, 2)
+    state = rd.PipeState(rd.BoundVBuffer(ib, 0, 2), [rd.BoundVBuffer(vb, 0, stride)], inputs,
+                         restartEnabled=restartEnabled)
+    capture.add_draw(state, len(indices), 2)
+    return capture
+
+
+def index_mesh(capture, draw):
+    state = capture.states[draw.eventId]
+    mesh = exporter.MeshData()
+    mesh.topology = state.topology
+    mesh.indexResourceId = state.ibuffer.resourceId
+    mesh.indexByteStride = 2
+    mesh.numIndices = draw.numIndices
+    mesh.allowRestart = True
+    mesh.restartIndex = RESTART
+    return mesh
+
+
+# The indices a draw of a synthetic capture reads, as stored
+def capture_indices(capture, draw):
+    data = capture.buffers[capture.states[draw.eventId].ibuffer.resourceId]
+    return list(struct.unpack("<%dH" % (len(data) // 2), data))
+
+
+def without_numpy():
+    return mock.patch.object(exporter, "np", None)
+
+
+class RestartTest(unittest.TestCase):
+    # Strips alternate their winding and fans turn around their first vertex, from every restart on.
+    # The degenerate triangle joining two strips is dropped
+    def test_unroll_known_runs(self):
+        R = RESTART
+        cases = [
+            (rd.Topology.TriangleStrip, [0, 1, 2, 3, R, 4, 5, 6, 7, 8, R, 9],
+             [0, 1, 2, 2, 1, 3, 4, 5, 6, 6, 5, 7, 6, 7, 8]),
+            (rd.Topology.TriangleStrip, [0, 1, 2, 3, 3, 4, 4, 5, 6], [0, 1, 2, 2, 1, 3, 4, 5, 6]),
+            (rd.Topology.TriangleFan, [0, 1, 2, 3, R, 4, 5, 6, R, 7, 8], [0, 1, 2, 0, 2, 3, 4, 5, 6]),
+        ]
+        for topology, indices, expected in cases:
+            self.assertEqual(unrolled(indices, topology), expected)
+            with without_numpy():
+                self.assertEqual(list(exporter.unrollTriangles(indices, topology, RESTART)[0]), expected)
+            if exporter.np is not None:
+                array = exporter.np.asarray(indices, dtype=exporter.np.uint16)
+                self.assertEqual(exporter.unrollTriangles(array, topology, RESTART)[0].tolist(), expected)
+
+    def test_unroll_random_runs(self):
+        rng = random.Random(1)
+        for topology in (rd.Topology.TriangleStrip, rd.Topology.TriangleFan):
+            for _ in range(500):
+                indices = random_indices(rng)
+                expected = unrolled(indices, topology)
+                with without_numpy():
+                    self.assertEqual(list(exporter.unrollTriangles(indices, topology, RESTART)[0]), expected)
+                if exporter.np is not None:
+                    array = exporter.np.asarray(indices, dtype=exporter.np.uint16)
+                    self.assertEqual(exporter.unrollTriangles(array, topology, RESTART)[0].tolist(), expected)
+
+    # Reading a draw a chunk at a time gives the same indices as reading it whole, strips and fans going
+    # on over the end of a chunk
+    def test_chunks_match_whole_draw(self):
+        for numpy in (True, False):
+            if numpy and exporter.np is None:
+                continue
+            with mock.patch.object(exporter, "np", exporter.np if numpy else None):
+                for topology in (rd.Topology.TriangleStrip, rd.Topology.TriangleFan):
+                    capture = restart_capture(2, 40, topology)
+                    controller = StubController(capture)
+                    for draw in capture.draws:
+                        mesh = index_mesh(capture, draw)
+                        expected = list(exporter.getIndices(controller, mesh))
+                        self.assertEqual(expected, unrolled(capture_indices(capture, draw), topology))
+                        for chunk_size in (1, 2, 3, 5, 7, 64):
+                            chunks = exporter.IndexChunks(controller, mesh, chunk_size)
+                            indices = [int(i) for k in range(len(chunks)) for i in chunks.load(k)]
+                            self.assertEqual(indices, expected, (topology, draw.drawcallId, chunk_size))
+
+    # Lists aren't cut by restart, an index of all ones is a vertex like any other
+    def test_lists_keep_restart_index(self):
+        expected, _, _ = export(self, list_capture(False))
+        out, _, result = export(self, list_capture(True))
+        self.assertIsNone(result.get_result())
+        self.assertIn(b"PolygonVertexIndex: *9 ", read(out, "drawcall_1.fbx"))
+        self.assertEqual(read(out, "drawcall_1.fbx"), read(expected, "drawcall_1.fbx"))
+
+    # A strip is written as the triangles it unrolls to, a line strip can't be written as triangles
+    def test_strip_draws(self):
+        capture = restart_capture(4, 3)
+        out, _, result = export(self, capture)
+        self.assertIsNone(result.get_result())
+        for draw in capture.draws:
+            count = len(unrolled(capture_indices(capture, draw), rd.Topology.TriangleStrip))
+            if count:
+                self.assertIn(b"PolygonVertexIndex: *%d " % count, read(out, "drawcall_%d.fbx" % draw.drawcallId))
+
+        capture = restart_capture(4, 1, rd.Topology.LineStrip)
+        out, _, result = export(self, capture)
+        self.assertEqual(result.skipped, [("drawcall_1.fbx", "LineStrip can't be exported as triangles")])
+        self.assertEqual(os.listdir(out), [])
+
+    # With and without numpy, the same files are written
+    @unittest.skipIf(exporter.np is None, "needs numpy")
+    def test_export_without_numpy(self):
+        for seed, topology in ((3, rd.Topology.TriangleStrip), (6, rd.Topology.TriangleFan)):
+            capture = restart_capture(seed, topology=topology)
+            expected, _, _ = export(self, capture)
+            with without_numpy():
+                out, _, _ = export(self, capture)
+            self.assertEqual(sorted(os.listdir(out)), sorted(os.listdir(expected)))
+            for name in os.listdir(expected):
+                self.assertEqual(read(out, name), read(expected, name), (seed, name))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,194 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+###############################################################################
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import re
+import math
+import struct
+import tempfile
+import unittest
+from unittest import mock
+
+import renderdoc as rd
+
+from . import export, read
+from .. import exporter
+from ..benchmark.replay import SyntheticCapture, grid_indices, vertex_format
+from ..benchmark.scenarios import FLOAT_LAYOUT
+
+
+# One 8x8 grid draw of numInstances instances, with a per-instance translation if translated
+def instanced_capture(numInstances, flags=rd.DrawFlags.Instanced, translated=False):
+    capture = SyntheticCapture()
+    vb, stride, inputs = capture.add_vertex_buffer("vb", FLOAT_LAYOUT, 64, 8)
+    indices = grid_indices(8, 8)
+    ib = capture.add_index_buffer("ib", indices, 2)
+    vbs = [rd.BoundVBuffer(vb, 0, stride)]
+    if translated:
+        offsets = b"".join(struct.pack("<4f", 10.0 * i, 0.0, 0.0, 1.0) for i in range(numInstances))
+        vbs.append(rd.BoundVBuffer(capture.add_buffer("instances", offsets), 0, 16))
+        inputs.append(rd.VertexInputAttribute("in_OFFSET0", 1, 0, vertex_format(rd.CompType.Float, 4, 4),
+                                              True, 1))
+
+    draw = capture.add_draw(rd.PipeState(rd.BoundVBuffer(ib, 0, 2), vbs, inputs), len(indices), 2)
+    draw.flags |= flags
+    draw.numInstances = numInstances
+    return capture
+
+
+# Scale of y and of x of every instance of merged_capture, each also moved 10 along x from the last
+MERGED_SCALES = [(1.0, 1.0), (1.0, 2.0), (-1.0, 1.0)]
+
+
+# One 8x8 grid draw of an instance per MERGED_SCALES, with a 3x4 transform and a uv of their own
+def merged_capture():
+    capture = SyntheticCapture()
+    vb, stride, inputs = capture.add_vertex_buffer("vb", FLOAT_LAYOUT, 64, 8)
+    indices = grid_indices(8, 8)
+    ib = capture.add_index_buffer("ib", indices, 2)
+
+    data = b""
+    for i, (sx, sy) in enumerate(MERGED_SCALES):
+        data += struct.pack("<12f", sx, 0.0, 0.0, 10.0 * i, 0.0, sy, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0)
+        data += struct.pack("<2f", 0.5 * i, 0.25)
+    vbs = [rd.BoundVBuffer(vb, 0, stride), rd.BoundVBuffer(capture.add_buffer("instances", data), 0, 56)]
+    for row in range(3):
+        inputs.append(rd.VertexInputAttribute("in_WORLD%d" % row, 1, row * 16, vertex_format(rd.CompType.Float, 4, 4),
+                                              True, 1))
+    inputs.append(rd.VertexInputAttribute("in_TEXCOORD1", 1, 48, vertex_format(rd.CompType.Float, 2, 4), True, 1))
+
+    draw = capture.add_draw(rd.PipeState(rd.BoundVBuffer(ib, 0, 2), vbs, inputs), len(indices), 2)
+    draw.flags |= rd.DrawFlags.Instanced
+    draw.numInstances = len(MERGED_SCALES)
+    return capture
+
+
+# The arrays of an ascii FBX file by name, in the order they are written
+def ascii_arrays(data):
+    arrays = {}
+    for name, values in re.findall(r"(\w+): \*\d+ \{\s*a: ([^\n]*)", data.decode("utf-8")):
+        arrays.setdefault(name, []).append([float(v) for v in values.split(",")])
+    return arrays
+
+
+def normalized(v):
+    length = math.sqrt(sum(x * x for x in v))
+    return [x / length for x in v]
+
+
+class InstancedDrawTest(unittest.TestCase):
+    def assertSameOutput(self, capture, **options):
+        expected, _, _ = export(self, instanced_capture(1, rd.DrawFlags.NoFlags), **options)
+        out, _, result = export(self, capture, **options)
+        self.assertIsNone(result.get_result())
+        self.assertEqual(read(out, "drawcall_1.fbx"), read(expected, "drawcall_1.fbx"))
+
+    # Vulkan draws and D3D *Instanced calls are flagged Instanced with a single instance
+    def test_single_instance_is_a_plain_draw(self):
+        self.assertSameOutput(instanced_capture(1))
+        self.assertSameOutput(instanced_capture(1, translated=True))
+
+    def test_single_instance_is_chunked(self):
+        self.assertSameOutput(instanced_capture(1), chunk_size=10)
+
+    def test_single_instance_is_cached(self):
+        capture = instanced_capture(1)
+        with tempfile.NamedTemporaryFile(suffix=".rdc") as rdc, tempfile.TemporaryDirectory() as cache_dir:
+            options = dict(cache_dir=cache_dir, capture_path=rdc.name)
+            export(self, capture, **options)
+            out, _, result = export(self, capture, **options)
+            self.assertEqual((result.cache.hits, result.cache.misses), (1, 0))
+
+    # Instances without per-instance attributes are all the same mesh in the same place
+    def test_instances_without_attributes_are_one_mesh(self):
+        self.assertSameOutput(instanced_capture(4))
+
+    def test_instances_get_a_model_each(self):
+        out, _, result = export(self, instanced_capture(3, translated=True), instance_transform="in_OFFSET")
+        self.assertIsNone(result.get_result())
+        text = read(out, "drawcall_1.fbx").decode("utf-8")
+        self.assertEqual([name for name in ("drawcall_1_0", "drawcall_1_1", "drawcall_1_2", "drawcall_1_3")
+                          if '"Model::%s"' % name in text], ["drawcall_1_0", "drawcall_1_1", "drawcall_1_2"])
+        self.assertTrue('P: "Lcl Translation", "Lcl Translation", "", "A",20.0,0.0,0.0' in text)
+
+    # Merged instances are copies of the geometry moved by their transforms, with normals transformed
+    # by the inverse transpose, also of a mirroring transform, and their per-instance uvs as a set of
+    # their own. The same file is written with and without numpy, however the instances are batched
+    def test_merged_instances(self):
+        expected, _, _ = export(self, instanced_capture(1, rd.DrawFlags.NoFlags))
+        geometry = ascii_arrays(read(expected, "drawcall_1.fbx"))
+        vertices, normals, tangents = (geometry[name][0] for name in ("Vertices", "Normals", "Tangents"))
+
+        outputs = []
+        for numpy in (True, False):
+            if numpy and exporter.np is None:
+                continue
+            for batch_size in (exporter.INSTANCE_BATCH_SIZE, 1):
+                with mock.patch.object(exporter, "np", exporter.np if numpy else None), \
+                        mock.patch.object(exporter, "INSTANCE_BATCH_SIZE", batch_size):
+                    out, _, result = export(self, merged_capture(), instances=exporter.INSTANCES_MERGED,
+                                            instance_transform="in_WORLD")
+                self.assertIsNone(result.get_result())
+                outputs.append(read(out, "drawcall_1.fbx"))
+        for output in outputs[1:]:
+            self.assertEqual(output, outputs[0])
+
+        arrays = ascii_arrays(outputs[0])
+        count = len(MERGED_SCALES)
+        self.assertEqual(len(arrays["Vertices"][0]), len(vertices) * count)
+        self.assertEqual(len(arrays["PolygonVertexIndex"][0]), len(geometry["PolygonVertexIndex"][0]) * count)
+
+        vertexCount = len(vertices) // 3
+        for i, (sx, sy) in enumerate(MERGED_SCALES):
+            scale = (sx, sy, 1.0)
+            merged = arrays["Vertices"][0][i * len(vertices):(i + 1) * len(vertices)]
+            for v in range(0, len(vertices), 3):
+                x, y, z = vertices[v:v + 3]
+                self.assertEqual(merged[v:v + 3], [round(sx * x + 10.0 * i, 4), round(sy * y, 4), z], (i, v))
+
+            merged = arrays["Normals"][0][i * len(normals):(i + 1) * len(normals)]
+            for v in range(0, len(normals), 3):
+                for a, b in zip(merged[v:v + 3], normalized([n / s for n, s in zip(normals[v:v + 3], scale)])):
+                    self.assertAlmostEqual(a, b, 3, (i, v))
+
+            merged = arrays["Tangents"][0][i * len(tangents):(i + 1) * len(tangents)]
+            for v in range(0, len(tangents), 4):
+                for a, b in zip(merged[v:v + 3], normalized([t * s for t, s in zip(tangents[v:v + 3], scale)])):
+                    self.assertAlmostEqual(a, b, 3, (i, v))
+                self.assertEqual(merged[v + 3], tangents[v + 3])
+
+            # The uv of the instance, for every vertex of its copy
+            uvs = arrays["UV"][1]
+            self.assertEqual(len(uvs), vertexCount * count * 2)
+            self.assertEqual(set(zip(uvs[i * vertexCount * 2:(i + 1) * vertexCount * 2:2],
+                                     uvs[i * vertexCount * 2 + 1:(i + 1) * vertexCount * 2:2])),
+                             {(0.5 * i, 0.25)})
+        self.assertEqual(arrays["UV"][0], geometry["UV"][0] * count)
+
+
+if __name__ == "__main__":
+    unittest.main()
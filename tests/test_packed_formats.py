@@ -0,0 +1,170 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+###############################################################################
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import math
+import struct
+import unittest
+
+import renderdoc as rd
+
+from .. import exporter
+from ..benchmark.replay import texture_format
+
+np = exporter.np
+
+
+# Words holding every value of each field, the other fields running through theirs in other orders
+def field_words(widths):
+    count = 1 << max(widths)
+    words = []
+    for i in range(count):
+        word = 0
+        shift = 0
+        for field, bits in enumerate(widths):
+            word |= ((i * (2 * field + 1) + field) % (1 << bits)) << shift
+            shift += bits
+        words.append(word)
+    return words
+
+
+def fields(word, widths):
+    values = []
+    for bits in widths:
+        values.append(word & ((1 << bits) - 1))
+        word >>= bits
+    return values
+
+
+# Reference decodes, straight from the format definitions
+
+def integer_reference(compType, widths):
+    def decode(word):
+        value = []
+        for v, bits in zip(fields(word, widths), widths):
+            if compType in (rd.CompType.SNorm, rd.CompType.SInt, rd.CompType.SScaled) and v >= 1 << (bits - 1):
+                v -= 1 << bits
+            if compType == rd.CompType.UNorm:
+                v = v / ((1 << bits) - 1)
+            elif compType == rd.CompType.SNorm:
+                v = max(v / ((1 << (bits - 1)) - 1), -1.0)
+            value.append(float(v))
+        return value
+    return decode
+
+
+# An unsigned float of 5 exponent bits, with denormals below exponent 1 and infinity or NaN at 31
+def small_float(v, mantissaBits):
+    exponent = v >> mantissaBits
+    mantissa = v & ((1 << mantissaBits) - 1)
+    if exponent == 0:
+        return math.ldexp(mantissa, -14 - mantissaBits)
+    if exponent == 31:
+        return float("nan") if mantissa else float("inf")
+    return math.ldexp((1 << mantissaBits) + mantissa, exponent - 15 - mantissaBits)
+
+
+def r11g11b10_reference(word):
+    r, g, b = fields(word, [11, 11, 10])
+    return [small_float(r, 6), small_float(g, 6), small_float(b, 5)]
+
+
+# Mantissas without an implicit one, all scaled by 2^(exponent - 15 - 9), exponent 31 included
+def r9g9b9e5_reference(word):
+    r, g, b, exponent = fields(word, [9, 9, 9, 5])
+    return [math.ldexp(v, exponent - 24) for v in (r, g, b)]
+
+
+def packed_format(formatType, compType):
+    return texture_format(compType, type=formatType)
+
+
+class PackedFormatTest(unittest.TestCase):
+    def assertBitExact(self, fmt, words, reference):
+        decode = exporter.getPackedFormat(fmt)[1]
+        decoded = [decode(fmt, words)]
+        if np is not None:
+            decoded.append(decode(fmt, np.array(words, dtype=np.uint32)).tolist())
+
+        for values in decoded:
+            self.assertEqual(len(values), len(words))
+            for word, value in zip(words, values):
+                expected = reference(word)
+                self.assertEqual(len(value), len(expected))
+                for v, e in zip(value, expected):
+                    if math.isnan(e):
+                        self.assertTrue(math.isnan(v), (fmt.Name(), hex(word)))
+                    else:
+                        self.assertEqual(struct.pack("<d", v), struct.pack("<d", e), (fmt.Name(), hex(word), v, e))
+
+    def test_r10g10b10a2(self):
+        widths = [10, 10, 10, 2]
+        words = field_words(widths)
+        for compType in (rd.CompType.UNorm, rd.CompType.UInt, rd.CompType.UScaled,
+                         rd.CompType.SNorm, rd.CompType.SInt, rd.CompType.SScaled):
+            fmt = packed_format(rd.ResourceFormatType.R10G10B10A2, compType)
+            self.assertBitExact(fmt, words, integer_reference(compType, widths))
+
+    def test_a8(self):
+        words = list(range(256))
+        for compType in (rd.CompType.UNorm, rd.CompType.UInt, rd.CompType.SNorm, rd.CompType.SInt):
+            fmt = packed_format(rd.ResourceFormatType.A8, compType)
+            self.assertBitExact(fmt, words, integer_reference(compType, [8]))
+
+    # Every 11 and 10 bit float, denormals, infinities and NaNs included
+    def test_r11g11b10(self):
+        words = field_words([11, 11, 10])
+        for r, g, b in [(0x7C0, 0x7C1, 0x3E0), (0x7FF, 0x7C0, 0x3FF), (0x03F, 0x001, 0x01F)]:
+            words.append(r | g << 11 | b << 22)
+        fmt = packed_format(rd.ResourceFormatType.R11G11B10, rd.CompType.Float)
+        self.assertBitExact(fmt, words, r11g11b10_reference)
+
+    # Every mantissa with every shared exponent, 0 and 31 included
+    def test_r9g9b9e5(self):
+        words = [word | exponent << 27 for exponent in range(32) for word in field_words([9, 9, 9])]
+        fmt = packed_format(rd.ResourceFormatType.R9G9B9E5, rd.CompType.Float)
+        self.assertBitExact(fmt, words, r9g9b9e5_reference)
+
+    # A whole buffer of them decodes as one at a time does, component swap and rounding included
+    @unittest.skipIf(np is None, "needs numpy")
+    def test_arrays_match_elements(self):
+        cases = [(rd.ResourceFormatType.R10G10B10A2, rd.CompType.UNorm, False, [10, 10, 10, 2]),
+                 (rd.ResourceFormatType.R10G10B10A2, rd.CompType.SNorm, True, [10, 10, 10, 2]),
+                 (rd.ResourceFormatType.R11G11B10, rd.CompType.Float, False, [11, 11, 10]),
+                 (rd.ResourceFormatType.R9G9B9E5, rd.CompType.Float, False, [9, 9, 9, 5])]
+        for formatType, compType, bgraOrder, widths in cases:
+            fmt = texture_format(compType, bgraOrder, formatType)
+            words = field_words(widths)
+            data = struct.pack("<%dI" % len(words), *words)
+            values = exporter.unpackArray(fmt, data, 0, 4, len(words)).tolist()
+            for i, value in enumerate(values):
+                expected = exporter.unpackData(fmt, data, 4 * i)
+                self.assertEqual(repr(tuple(value)), repr(expected), (fmt.Name(), hex(words[i])))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+###############################################################################
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import re
+import unittest
+
+from .. import semantics
+
+
+class SemanticResolverTest(unittest.TestCase):
+    def resolve(self, names):
+        return semantics.SemanticResolver().resolve(None, names)
+
+    def test_names_resolve_to_canonical_names(self):
+        self.assertEqual(self.resolve(["in.var.POSITION", "inNormal", "a_texcoord1", "Color"]),
+                         {"in.var.POSITION": "in_POSITION0", "inNormal": "in_NORMAL0",
+                          "a_texcoord1": "in_TEXCOORD1", "Color": "in_COLOR0"})
+
+    # POSITION and in_POSITION0 both resolve to in_POSITION0, the second keeps its name but numbered
+    def test_clashing_raw_name_is_numbered(self):
+        self.assertEqual(self.resolve(["POSITION", "in_POSITION0"]),
+                         {"POSITION": "in_POSITION0", "in_POSITION0": "in_POSITION0_1"})
+        self.assertEqual(self.resolve(["POSITION", "pos", "in_POSITION0"]),
+                         {"POSITION": "in_POSITION0", "pos": "pos", "in_POSITION0": "in_POSITION0_1"})
+
+    # A name kept by an attribute never takes the canonical name a later attribute resolves to
+    def test_kept_names_leave_later_canonical_names(self):
+        resolver = semantics.SemanticResolver([(re.compile("in_TEXCOORD1"), "COLOR0")])
+        self.assertEqual(resolver.resolve(None, ["Color", "in_TEXCOORD1", "uv1"]),
+                         {"Color": "in_COLOR0", "in_TEXCOORD1": "in_TEXCOORD1_1", "uv1": "in_TEXCOORD1"})
+        self.assertEqual(self.resolve(["weights", "weights_1", "weights"]),
+                         {"weights": "weights", "weights_1": "weights_1"})
+
+    def test_resolved_names_are_unique(self):
+        names = ["POSITION", "in_POSITION0", "in_POSITION0_1", "pos", "vertex", "in_var_POSITION"]
+        resolved = self.resolve(names)
+        self.assertEqual(len(set(resolved.values())), len(names))
+
+
+if __name__ == "__main__":
+    unittest.main()
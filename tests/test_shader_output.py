@@ -0,0 +1,97 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+###############################################################################
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import re
+import unittest
+
+import renderdoc as rd
+
+from . import export, read
+from .. import exporter
+from ..benchmark.replay import SyntheticCapture, grid_indices
+from ..benchmark.scenarios import FLOAT_LAYOUT, PACKED_LAYOUT
+
+
+# A side x side grid draw of the given layout, with the output of a vertex shader
+def skinned_capture(side, layout=FLOAT_LAYOUT):
+    capture = SyntheticCapture()
+    vb, stride, inputs = capture.add_vertex_buffer("vb", layout, side * side, side)
+    indices = grid_indices(side, side)
+    ib = capture.add_index_buffer("ib", indices, 4)
+    state = rd.PipeState(rd.BoundVBuffer(ib, 0, 4), [rd.BoundVBuffer(vb, 0, stride)], inputs)
+    draw = capture.add_draw(state, len(indices), 4)
+    capture.add_post_vs(draw, rd.MeshDataStage.VSOut, layout, side * side, side)
+    return capture
+
+
+# The Vertices array of an ascii FBX file, as its declared length and its values
+def vertices(folder, name):
+    text = read(folder, name).decode("utf-8")
+    match = re.search(r"Vertices: \*(\d+) \{\s*a: ([^\n]*)", text)
+    return int(match.group(1)), match.group(2).split(",")
+
+
+class ShaderOutputTest(unittest.TestCase):
+    def assertVertices(self, folder, count):
+        declared, values = vertices(folder, "drawcall_1.fbx")
+        self.assertEqual(declared, count * 3)
+        self.assertEqual(len(values), count * 3)
+
+    # The position output is float4 clip space, only its x, y and z are written
+    def test_clip_space_position_has_three_components(self):
+        out, _, result = export(self, skinned_capture(5), vertex_source=exporter.VERTEX_SOURCE_VSOUT)
+        self.assertIsNone(result.get_result())
+        self.assertVertices(out, 25)
+
+    def test_chunked_output_matches(self):
+        capture = skinned_capture(5)
+        expected, _, _ = export(self, capture, vertex_source=exporter.VERTEX_SOURCE_VSOUT)
+        out, _, _ = export(self, capture, vertex_source=exporter.VERTEX_SOURCE_VSOUT, chunk_size=10)
+        self.assertEqual(read(out, "drawcall_1.fbx"), read(expected, "drawcall_1.fbx"))
+
+    # Draws without a geometry shader export their vertex shader output instead
+    def test_geometry_output_falls_back_to_vertex_output(self):
+        capture = skinned_capture(5)
+        expected, _, _ = export(self, capture, vertex_source=exporter.VERTEX_SOURCE_VSOUT)
+        out, _, result = export(self, capture, vertex_source=exporter.VERTEX_SOURCE_GSOUT)
+        self.assertIsNone(result.get_result())
+        self.assertEqual(read(out, "drawcall_1.fbx"), read(expected, "drawcall_1.fbx"))
+
+    # Vertex inputs can hold four component positions too, e.g. half4
+    def test_four_component_input_position(self):
+        capture = skinned_capture(5, PACKED_LAYOUT)
+        out, _, result = export(self, capture)
+        self.assertIsNone(result.get_result())
+        self.assertVertices(out, 25)
+
+        chunked, _, _ = export(self, capture, chunk_size=10)
+        self.assertEqual(read(chunked, "drawcall_1.fbx"), read(out, "drawcall_1.fbx"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,214 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+###############################################################################
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import io
+import os
+import zlib
+import struct
+import shutil
+import tempfile
+import unittest
+import contextlib
+
+import renderdoc as rd
+
+from .. import exporter
+from .. import textures
+from ..benchmark.replay import StubController, SyntheticCapture, grid_indices, texture_format
+from ..benchmark.scenarios import FLOAT_LAYOUT
+
+# Not square, so that rows and columns can't be mixed up
+WIDTH = 12
+HEIGHT = 5
+
+
+# Width, height and RGBA pixels of a PNG file as encode_png writes them, 8 bit RGBA with every row
+# unfiltered
+def read_png(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+
+    chunks = []
+    offset = 8
+    while offset < len(data):
+        length, tag = struct.unpack_from(">I4s", data, offset)
+        body = data[offset + 8:offset + 8 + length]
+        crc = struct.unpack_from(">I", data, offset + 8 + length)[0]
+        assert crc == zlib.crc32(tag + body) & 0xffffffff, tag
+        chunks.append((tag, body))
+        offset += 12 + length
+    assert chunks[0][0] == b"IHDR" and chunks[-1] == (b"IEND", b"")
+
+    width, height, depth, color, compression, filtering, interlace = struct.unpack(">IIBBBBB", chunks[0][1])
+    assert (depth, color, compression, filtering, interlace) == (8, 6, 0, 0, 0)
+
+    rows = zlib.decompress(b"".join(body for tag, body in chunks if tag == b"IDAT"))
+    stride = width * 4
+    assert len(rows) == height * (stride + 1)
+    pixels = b""
+    for y in range(height):
+        row = rows[y * (stride + 1):(y + 1) * (stride + 1)]
+        assert row[0] == 0, "row %d has filter %d" % (y, row[0])
+        pixels += row[1:]
+    return width, height, pixels
+
+
+# Width, height and BGRA pixels, top row first, of an uncompressed 32 bit TGA file of either origin
+def read_tga(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    (id_length, color_map, image_type, _, _, _, x, y, width, height, bpp,
+     descriptor) = struct.unpack_from("<BBBHHBHHHHBB", data)
+    assert (id_length, color_map, image_type, x, y, bpp) == (0, 0, 2, 0, 0, 32)
+    assert descriptor & 0x0f == 8, "alpha bits"
+
+    stride = width * 4
+    pixels = data[18:]
+    assert len(pixels) == height * stride
+    rows = [pixels[y * stride:(y + 1) * stride] for y in range(height)]
+    # Bit 5 set puts the first row at the top, else the rows go bottom up
+    if not descriptor & 0x20:
+        rows.reverse()
+    return width, height, b"".join(rows)
+
+
+def swap_red_blue(pixels):
+    swapped = bytearray(pixels)
+    swapped[0::4] = pixels[2::4]
+    swapped[2::4] = pixels[0::4]
+    return bytes(swapped)
+
+
+# Notes the subresources read, to check that only the top mip is
+class RecordingController(StubController):
+    def __init__(self, capture):
+        StubController.__init__(self, capture)
+        self.subresources = []
+
+    def GetTextureData(self, resourceId, sub):
+        self.subresources.append((sub.mip, sub.slice))
+        return StubController.GetTextureData(self, resourceId, sub)
+
+
+# One draw binding 8 bit RGBA and BGRA textures, an array of three slices with mips, and a block
+# compressed and a float texture the encoder can't handle
+def texture_capture():
+    capture = SyntheticCapture()
+    vb, stride, inputs = capture.add_vertex_buffer("vb", FLOAT_LAYOUT, 16, 4)
+    indices = grid_indices(4, 4)
+    ib = capture.add_index_buffer("ib", indices, 2)
+
+    bound = [
+        capture.add_texture("Rgba", WIDTH, HEIGHT),
+        capture.add_texture("Bgra", WIDTH, HEIGHT, texture_format(bgraOrder=True)),
+        capture.add_texture("Srgb", WIDTH, HEIGHT, texture_format(rd.CompType.UNormSRGB, bgraOrder=True)),
+        capture.add_texture("Array", WIDTH, HEIGHT, arraysize=3),
+        capture.add_texture("Compressed", 16, 8, texture_format(type=rd.ResourceFormatType.BC1)),
+        capture.add_texture("Float", WIDTH, HEIGHT),
+    ]
+    capture.textures[bound[3]].mips = 4
+    float_texture = capture.textures[bound[5]]
+    float_texture.format = rd.ResourceFormat(rd.CompType.Float, 4, 4)
+    float_texture.byteSize = WIDTH * HEIGHT * 16
+
+    state = rd.PipeState(rd.BoundVBuffer(ib, 0, 2), [rd.BoundVBuffer(vb, 0, stride)], inputs, bound)
+    capture.add_draw(state, len(indices), 2)
+    return capture
+
+
+class TextureTest(unittest.TestCase):
+    def export(self, texture_format, **options):
+        out = tempfile.mkdtemp(prefix="renderdoc2fbx_test_")
+        self.addCleanup(shutil.rmtree, out, True)
+        capture = texture_capture()
+        controller = RecordingController(capture)
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = exporter.Exporter(controller, None, None, True, out, texture_format=texture_format,
+                                       **options)
+        self.assertIsNone(result.get_result())
+        return os.path.join(out, "Textures"), capture, controller, result.texture_saver
+
+    # The RGBA pixels of a slice as the replay serves them
+    def source(self, capture, name, index=0):
+        resourceId = next(r.resourceId for r in capture.resources if r.name == name)
+        pixels = StubController(capture).GetTextureData(resourceId, rd.Subresource(0, index, 0))
+        if capture.textures[resourceId].format.BGRAOrder():
+            pixels = swap_red_blue(pixels)
+        return pixels
+
+    # Files the encoder can't write are left to SaveTexture, one call for each slice. The stub saves a
+    # slice as its size in zeros
+    def assertSavedByRenderDoc(self, folder, capture, controller, saver, extension, names):
+        self.assertEqual(controller.calls["SaveTexture"], len(names))
+        self.assertEqual((saver.saved, saver.failed), (len(names), 0))
+        for name in names:
+            resourceId = next(r.resourceId for r in capture.resources if r.name == name.split("_")[0])
+            texture = capture.textures[resourceId]
+            with open(os.path.join(folder, name + extension), "rb") as f:
+                self.assertEqual(f.read(), bytes(texture.byteSize // texture.arraysize), name)
+
+    def test_png(self):
+        for workers in (0, textures.DEFAULT_WORKERS):
+            folder, capture, controller, saver = self.export(textures.TEXTURE_FORMAT_PNG, texture_workers=workers)
+            cases = [("Rgba", "Rgba", 0), ("Bgra", "Bgra", 0), ("Srgb", "Srgb", 0)]
+            cases += [("Array_%d" % index, "Array", index) for index in range(3)]
+            for file_name, name, index in cases:
+                width, height, pixels = read_png(os.path.join(folder, file_name + ".png"))
+                self.assertEqual((width, height), (WIDTH, HEIGHT), file_name)
+                self.assertEqual(pixels, self.source(capture, name, index), file_name)
+            self.assertEqual(saver.encoded, len(cases))
+            self.assertSavedByRenderDoc(folder, capture, controller, saver, ".png", ["Compressed", "Float"])
+            self.assertTrue(all(mip == 0 for mip, slice in controller.subresources))
+
+    def test_tga(self):
+        folder, capture, controller, saver = self.export(textures.TEXTURE_FORMAT_TGA)
+        cases = [("Rgba", "Rgba", 0), ("Bgra", "Bgra", 0), ("Srgb", "Srgb", 0)]
+        cases += [("Array_%d" % index, "Array", index) for index in range(3)]
+        for file_name, name, index in cases:
+            path = os.path.join(folder, file_name + ".tga")
+            width, height, pixels = read_tga(path)
+            # 8 bits of alpha, the first row at the top
+            with open(path, "rb") as f:
+                self.assertEqual(f.read(18)[17], 0x28)
+            self.assertEqual((width, height), (WIDTH, HEIGHT), file_name)
+            self.assertEqual(swap_red_blue(pixels), self.source(capture, name, index), file_name)
+        self.assertEqual(saver.encoded, len(cases))
+        self.assertSavedByRenderDoc(folder, capture, controller, saver, ".tga", ["Compressed", "Float"])
+
+    # DDS keeps any format as it is, so RenderDoc writes every slice
+    def test_dds(self):
+        folder, capture, controller, saver = self.export(textures.TEXTURE_FORMAT_DDS, texture_dedup=False)
+        names = ["Rgba", "Bgra", "Srgb", "Array_0", "Array_1", "Array_2", "Compressed", "Float"]
+        self.assertEqual(saver.encoded, 0)
+        self.assertEqual(controller.calls["GetTextureData"], 0)
+        self.assertSavedByRenderDoc(folder, capture, controller, saver, ".dds", names)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+###############################################################################
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import random
+import struct
+import unittest
+
+import renderdoc as rd
+
+from .. import exporter
+from ..benchmark.replay import vertex_format
+
+np = exporter.np
+
+INTEGER_TYPES = (rd.CompType.UInt, rd.CompType.SInt, rd.CompType.UNorm, rd.CompType.SNorm,
+                 rd.CompType.UScaled, rd.CompType.SScaled)
+SIGNED_TYPES = (rd.CompType.SInt, rd.CompType.SNorm, rd.CompType.SScaled)
+
+# Every regular vertex format, the component swap of 4 x 8 bit UNorm included
+FORMATS = ([vertex_format(rd.CompType.Float, compCount, width) for width in (2, 4, 8) for compCount in range(1, 5)] +
+           [vertex_format(compType, compCount, width)
+            for compType in INTEGER_TYPES for width in (1, 2, 4) for compCount in range(1, 5)] +
+           [vertex_format(rd.CompType.UNorm, 4, 1, bgraOrder=True)])
+
+# Bytes around the element, so that the stride and the offset of the elements are exercised too
+PADDING = 3
+OFFSET = 5
+
+
+# Components holding the smallest, largest and a few special values of the format, then random bytes
+def component_bytes(fmt, count):
+    width = fmt.compByteWidth
+    if fmt.compType == rd.CompType.Float:
+        code = "xxexfxxxd"[width]
+        special = [struct.pack("<" + code, v) for v in (0.0, -0.0, 1.0, -1.0, 0.5, 1e-5, -12345.6789,
+                                                        float("inf"), float("-inf"), float("nan"))]
+    else:
+        bits = width * 8
+        signed = fmt.compType in SIGNED_TYPES
+        low, high = (-(1 << (bits - 1)), (1 << (bits - 1)) - 1) if signed else (0, (1 << bits) - 1)
+        special = [v.to_bytes(width, "little", signed=signed) for v in (low, low + 1, -1 if signed else 1, 0, high)]
+
+    rng = random.Random(fmt.Name())
+    return special + [bytes(rng.getrandbits(8) for _ in range(width)) for _ in range(count - len(special))]
+
+
+def element_data(fmt, count):
+    components = component_bytes(fmt, count * fmt.compCount)
+    stride = fmt.compByteWidth * fmt.compCount + PADDING
+    data = bytearray(b"\xee" * OFFSET)
+    for i in range(count):
+        data += b"".join(components[i * fmt.compCount:(i + 1) * fmt.compCount]) + b"\xee" * PADDING
+    return bytes(data), stride
+
+
+# Reference decode, straight from the format definitions. SNorm follows the decode of RenderDoc's python
+# samples the exporter has always used: divided by 2^(bits-1) + 1, the most negative value kept as it is
+def reference(fmt, data, offset):
+    width = fmt.compByteWidth
+    value = []
+    for i in range(fmt.compCount):
+        component = data[offset + i * width:offset + (i + 1) * width]
+        if fmt.compType == rd.CompType.Float:
+            v = struct.unpack("<" + "xxexfxxxd"[width], component)[0]
+        else:
+            v = float(int.from_bytes(component, "little", signed=fmt.compType in SIGNED_TYPES))
+            if fmt.compType == rd.CompType.UNorm:
+                v /= (1 << (width * 8)) - 1
+            elif fmt.compType == rd.CompType.SNorm and v != -(1 << (width * 8 - 1)):
+                v /= (1 << (width * 8 - 1)) + 1
+        value.append(v)
+
+    if fmt.BGRAOrder():
+        value = [value[i] for i in [2, 1, 0, 3]]
+    return tuple(float("%.4f" % v) for v in value)
+
+
+class UnpackTest(unittest.TestCase):
+    count = 300
+
+    # The struct decode of one element at a time, used without NumPy, against the format definitions
+    def test_elements_match_reference(self):
+        for fmt in FORMATS:
+            data, stride = element_data(fmt, self.count)
+            for i in range(self.count):
+                offset = OFFSET + stride * i
+                self.assertEqual(repr(exporter.unpackData(fmt, data, offset)), repr(reference(fmt, data, offset)),
+                                 (fmt.Name(), i))
+
+    # A whole strided buffer decodes with NumPy as one element at a time does, rounding included
+    @unittest.skipIf(np is None, "needs numpy")
+    def test_arrays_match_elements(self):
+        for fmt in FORMATS:
+            data, stride = element_data(fmt, self.count)
+            values = exporter.unpackArray(fmt, data, OFFSET, stride, self.count)
+            self.assertEqual(values.shape, (self.count, fmt.compCount), fmt.Name())
+            for i, value in enumerate(values.tolist()):
+                expected = exporter.unpackData(fmt, data, OFFSET + stride * i)
+                self.assertEqual(repr(tuple(value)), repr(expected), (fmt.Name(), i))
+
+
+if __name__ == "__main__":
+    unittest.main()
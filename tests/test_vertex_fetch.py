@@ -0,0 +1,70 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+###############################################################################
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import unittest
+
+import renderdoc as rd
+
+from . import export
+from ..benchmark.replay import SyntheticCapture, grid_indices, vertex_format
+from ..benchmark.scenarios import FLOAT_LAYOUT
+
+SECOND_LAYOUT = [
+    ("in_TEXCOORD1", vertex_format(rd.CompType.Float, 2, 4)),
+    ("in_COLOR1", vertex_format(rd.CompType.UNorm, 4, 1)),
+]
+
+
+# Draws of an 8 x 8 grid, with the attributes of FLOAT_LAYOUT interleaved in one vertex buffer and
+# those of SECOND_LAYOUT in another
+def two_buffer_capture(draws):
+    capture = SyntheticCapture()
+    vb0, stride0, inputs0 = capture.add_vertex_buffer("vb0", FLOAT_LAYOUT, 64, 8)
+    vb1, stride1, inputs1 = capture.add_vertex_buffer("vb1", SECOND_LAYOUT, 64, 8, vertexBuffer=1)
+    indices = grid_indices(8, 8)
+    ib = capture.add_index_buffer("ib", indices, 2)
+
+    state = rd.PipeState(rd.BoundVBuffer(ib, 0, 2), [rd.BoundVBuffer(vb0, 0, stride0), rd.BoundVBuffer(vb1, 0, stride1)],
+                         inputs0 + inputs1)
+    for i in range(draws):
+        capture.add_draw(state, len(indices), 2)
+    return capture
+
+
+class VertexFetchTest(unittest.TestCase):
+    # Every attribute sourced from a buffer is decoded from a single read of it, one for the indices
+    # and one per vertex buffer, however many attributes each holds
+    def test_one_read_per_buffer(self):
+        for draws in (1, 3):
+            out, controller, result = export(self, two_buffer_capture(draws), buffer_cache_bytes=0)
+            self.assertIsNone(result.get_result())
+            self.assertEqual(controller.calls["GetBufferData"], draws * 3, draws)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+###############################################################################
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os
+import unittest
+
+from . import export, read
+from ..benchmark.scenarios import many_small_draws
+
+
+class WorkersTest(unittest.TestCase):
+    # Draws decoded and written on workers give the files of a serial export, over a range of 1000 draws.
+    # How much faster the workers are is measured by the benchmark with --speedup
+    def test_same_output_as_serial(self):
+        capture = many_small_draws(0.2)
+        self.assertEqual(len(capture.draws), 1000)
+        expected, _, _ = export(self, capture)
+        for use_processes in (False, True):
+            out, _, result = export(self, capture, workers=4, use_processes=use_processes)
+            self.assertIsNone(result.get_result())
+            self.assertEqual(sorted(os.listdir(out)), sorted(os.listdir(expected)))
+            for name in os.listdir(expected):
+                self.assertEqual(read(out, name), read(expected, name), (use_processes, name))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,334 @@
+###############################################################################
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 ericchan
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+###############################################################################
+
+# Texture saving off the replay thread. The replay thread only reads the raw
+# pixels of each slice (GetTextureData) and queues them, a pool of threads
+# encodes and writes the image files. zlib releases the GIL, so the encoding
+# really runs in parallel. Textures in formats that aren't encoded here, such
+# as block compressed or float ones, are still saved by RenderDoc itself.
+#
+# With an index folder, slices are also matched on a hash of their pixels, so
+# the same image bound as different resources, or already written by an earlier
+# export into the same folder, is linked to the existing file (or just referred
+# to) instead of being encoded again.
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os
+import json
+import zlib
+import shutil
+import struct
+import hashlib
+import concurrent.futures
+
+import renderdoc as rd
+
+from . import profiler
+
+TEXTURE_FORMAT_PNG = "png"
+TEXTURE_FORMAT_TGA = "tga"
+# DDS keeps the data of any format as is, so it is always written by RenderDoc
+TEXTURE_FORMAT_DDS = "dds"
+
+_FILE_TYPES = {
+    TEXTURE_FORMAT_PNG: rd.FileType.PNG,
+    TEXTURE_FORMAT_TGA: rd.FileType.TGA,
+    TEXTURE_FORMAT_DDS: rd.FileType.DDS,
+}
+
+DEFAULT_WORKERS = 4
+
+# The replay thread only waits for the encoders once this many bytes of pixels are queued
+DEFAULT_MAX_PENDING_BYTES = 256 << 20
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+INDEX_NAME = "texture_index.json"
+
+# Bump whenever the files written for the same pixels change
+INDEX_VERSION = 1
+
+
+# Whether the pixels of a texture can be encoded here, that is 8 bit RGBA or BGRA
+def is_encodable(texture):
+    fmt = texture.format
+    return (not fmt.Special() and fmt.compByteWidth == 1 and fmt.compCount == 4
+            and fmt.compType in (rd.CompType.UNorm, rd.CompType.UNormSRGB)
+            and texture.depth <= 1 and texture.msSamp <= 1)
+
+
+def _swap_red_blue(pixels):
+    swapped = bytearray(pixels)
+    swapped[0::4] = pixels[2::4]
+    swapped[2::4] = pixels[0::4]
+    return bytes(swapped)
+
+
+def _png_chunk(tag, data):
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff)
+
+
+def encode_png(width, height, rgba):
+    stride = width * 4
+    # Every row starts with its filter type, 0 for none
+    rows = b"".join(b"\x00" + rgba[y * stride:(y + 1) * stride] for y in range(height))
+    return (_PNG_SIGNATURE
+            + _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+            + _png_chunk(b"IDAT", zlib.compress(rows))
+            + _png_chunk(b"IEND", b""))
+
+
+def encode_tga(width, height, bgra):
+    # Uncompressed true color, 8 bits of alpha and the origin at the top left
+    header = struct.pack("<BBBHHBHHHHBB", 0, 0, 2, 0, 0, 0, 0, 0, width, height, 32, 0x28)
+    return header + bgra
+
+
+# Encode and write the raw pixels of one slice, run on the encoder threads
+def write_texture(path, texture_format, width, height, pixels, bgra_order):
+    prof = profiler.current()
+    with prof.stage("encode_texture"):
+        if texture_format == TEXTURE_FORMAT_TGA:
+            data = encode_tga(width, height, pixels if bgra_order else _swap_red_blue(pixels))
+        else:
+            data = encode_png(width, height, _swap_red_blue(pixels) if bgra_order else pixels)
+
+    with prof.stage("write_texture"):
+        with open(path, "wb") as f:
+            f.write(data)
+
+
+# Hash of the pixels of a slice and everything that decides the file written for them
+def content_digest(texture, texture_format, pixels):
+    fmt = texture.format
+    h = hashlib.blake2b(digest_size=16)
+    layout = (INDEX_VERSION, texture_format, texture.width, texture.height, int(fmt.type), int(fmt.compType),
+              fmt.compByteWidth, fmt.compCount, fmt.BGRAOrder())
+    h.update(repr(layout).encode("utf-8"))
+    h.update(pixels)
+    return h.hexdigest()
+
+
+# Content hash to file of every texture written into a folder, kept in INDEX_NAME across exports
+class TextureIndex:
+    def __init__(self, dir_path):
+        self.dir_path = dir_path
+        self.by_digest = {}
+        self.by_path = {}
+
+        try:
+            with open(os.path.join(dir_path, INDEX_NAME)) as f:
+                index = json.load(f)
+            if index.get("version") == INDEX_VERSION:
+                for digest, name in index["textures"].items():
+                    self.add(digest, os.path.join(dir_path, name))
+        except (IOError, OSError, ValueError, KeyError):
+            pass
+
+    def find(self, digest):
+        return self.by_digest.get(digest)
+
+    def add(self, digest, path):
+        # A file rewritten with other pixels no longer holds what it was indexed for
+        previous = self.by_path.get(path)
+        if previous is not None and previous != digest:
+            del self.by_digest[previous]
+
+        self.by_digest[digest] = path
+        self.by_path[path] = digest
+
+    # Exports running at the same time, such as the shards of a capture, share the folder. The entries
+    # they saved since this index was read are kept, and the file is replaced in one go
+    def save(self):
+        if not os.path.isdir(self.dir_path):
+            return
+
+        saved = TextureIndex(self.dir_path)
+        for digest, path in self.by_digest.items():
+            saved.add(digest, path)
+
+        textures = {}
+        for digest, path in saved.by_digest.items():
+            if os.path.exists(path):
+                textures[digest] = os.path.relpath(path, self.dir_path).replace(os.sep, "/")
+
+        index_path = os.path.join(self.dir_path, INDEX_NAME)
+        temp_path = "%s.%d.tmp" % (index_path, os.getpid())
+        with open(temp_path, "w") as f:
+            json.dump({"version": INDEX_VERSION, "textures": textures}, f, indent=4, sort_keys=True)
+        os.replace(temp_path, index_path)
+
+
+class TextureSaver:
+    # With an index_dir, repeated slices are hard linked to the first file holding them when link
+    # is set, and otherwise not written at all, save returning the existing file in their place
+    def __init__(self, r, texture_format=TEXTURE_FORMAT_PNG, workers=DEFAULT_WORKERS,
+                 max_pending_bytes=DEFAULT_MAX_PENDING_BYTES, index_dir=None, link=True,
+                 profiler=profiler.NULL_PROFILER):
+        self.r = r
+        self.profiler = profiler
+        self.texture_format = texture_format
+        self.max_pending_bytes = max_pending_bytes
+
+        self.index = TextureIndex(index_dir) if index_dir is not None else None
+        self.link = link
+        self.links = []
+        self.queued = set()
+
+        # Without workers the textures are encoded on the calling thread
+        self.pool = concurrent.futures.ThreadPoolExecutor(workers) if workers > 0 else None
+        self.pending = []
+        self.pending_bytes = 0
+
+        self.encoded = 0
+        self.saved = 0
+        self.failed = 0
+        self.reused = 0
+
+    # Save every slice of a texture as base_path + extension, or base_path_<slice> + extension for arrays.
+    # Returns the file holding each slice
+    def save(self, texture, base_path):
+        extension = "." + self.texture_format
+        if texture.arraysize > 1:
+            paths = [base_path + "_" + str(index) + extension for index in range(texture.arraysize)]
+        else:
+            paths = [base_path + extension]
+
+        encodable = self.texture_format != TEXTURE_FORMAT_DDS and is_encodable(texture)
+
+        # Without an index nothing but the encoding needs the pixels
+        if not encodable and self.index is None:
+            for index, path in enumerate(paths):
+                self.save_with_renderdoc(texture, index, path)
+            return paths
+
+        files = []
+        for index, path in enumerate(paths):
+            with self.profiler.stage("GetTextureData"):
+                pixels = self.r.GetTextureData(texture.resourceId, rd.Subresource(0, index, 0))
+            self.profiler.count("texture_bytes", len(pixels))
+
+            if self.index is not None:
+                with self.profiler.stage("hash_texture"):
+                    digest = content_digest(texture, self.texture_format, pixels)
+                source = self.index.find(digest)
+                if source is not None and (source in self.queued or os.path.exists(source)):
+                    files.append(self.reuse(source, path))
+                    continue
+                self.index.add(digest, path)
+
+            files.append(path)
+            self.queued.add(path)
+
+            # Anything unexpected, such as padded rows, is left to RenderDoc
+            if not encodable or len(pixels) != texture.width * texture.height * 4:
+                self.save_with_renderdoc(texture, index, path)
+                continue
+
+            self.queue(path, texture, pixels)
+        return files
+
+    def reuse(self, source, path):
+        self.reused += 1
+        if source == path or not self.link:
+            return source
+
+        # Linked once every file has been written, the source may still be queued
+        self.links.append((source, path))
+        return path
+
+    def save_with_renderdoc(self, texture, index, path):
+        texsave = rd.TextureSave()
+        texsave.resourceId = texture.resourceId
+        texsave.alpha = rd.AlphaMapping.Preserve
+        texsave.destType = _FILE_TYPES[self.texture_format]
+        texsave.slice.sliceIndex = index
+
+        with self.profiler.stage("SaveTexture"):
+            result = self.r.SaveTexture(texsave, path)
+        print("save texture," + path + ",result=" + str(result))
+        if result:
+            self.saved += 1
+        else:
+            self.failed += 1
+
+    def queue(self, path, texture, pixels):
+        args = (path, self.texture_format, texture.width, texture.height, pixels, texture.format.BGRAOrder())
+        if self.pool is None:
+            self.finish_one(path, None, args)
+            return
+
+        # Bound the memory held by queued pixels rather than waiting on every texture
+        while self.pending and self.pending_bytes + len(pixels) > self.max_pending_bytes:
+            self.finish_one(*self.pending.pop(0))
+
+        self.pending_bytes += len(pixels)
+        if self.profiler.enabled:
+            future = self.pool.submit(profiler.run_profiled, write_texture, *args)
+        else:
+            future = self.pool.submit(write_texture, *args)
+        self.pending.append((path, future, args))
+
+    def finish_one(self, path, future, args):
+        try:
+            if future is None:
+                write_texture(*args)
+            else:
+                self.pending_bytes -= len(args[4])
+                result = future.result()
+                if self.profiler.enabled:
+                    self.profiler.merge(result[1])
+        except (IOError, OSError) as e:
+            print("save texture," + path + ",result=" + str(e))
+            self.failed += 1
+            return
+
+        print("save texture," + path + ",result=True")
+        self.encoded += 1
+
+    # Wait for every queued texture to be written, then link the repeated ones
+    def finish(self):
+        while self.pending:
+            self.finish_one(*self.pending.pop(0))
+        if self.pool is not None:
+            self.pool.shutdown()
+
+        for source, path in self.links:
+            if os.path.exists(path):
+                os.remove(path)
+            try:
+                os.link(source, path)
+            except OSError:
+                shutil.copyfile(source, path)
+        self.links = []
+
+        if self.index is not None:
+            self.index.save()
+
+    def summary(self):
+        return "textures: %d encoded, %d saved by RenderDoc, %d reused, %d failed" % (
+            self.encoded, self.saved, self.reused, self.failed)
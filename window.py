@@ -23,11 +23,15 @@
 ###############################################################################
 
 import os
+import tempfile
 import qrenderdoc as qrd
 import renderdoc as rd
 from typing import Optional
+from . import cache
 from . import exporter
 
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "renderdoc2fbx_cache")
+
 
 class Window(qrd.CaptureViewer):
     def __init__(self, ctx: qrd.CaptureContext, version: str):
@@ -36,6 +40,7 @@ class Window(qrd.CaptureViewer):
         self.mqt: qrd.MiniQtHelper = ctx.Extensions().GetMiniQtHelper()
 
         self.save_path = None
+        self.progress = None
 
         self.ctx = ctx
         self.version = version
@@ -57,6 +62,22 @@ class Window(qrd.CaptureViewer):
         self.mqt.AddWidget(horiz, self.endDrawcallTextBox)
         self.mqt.AddWidget(vert, horiz)
 
+        markerLabel = self.mqt.CreateLabel()
+        self.mqt.SetWidgetText(markerLabel, "Marker Filter:")
+        self.markerTextBox = self.mqt.CreateTextBox(True, None)
+        horiz = self.mqt.CreateHorizontalContainer()
+        self.mqt.AddWidget(horiz, markerLabel)
+        self.mqt.AddWidget(horiz, self.markerTextBox)
+        self.mqt.AddWidget(vert, horiz)
+
+        semanticMapLabel = self.mqt.CreateLabel()
+        self.mqt.SetWidgetText(semanticMapLabel, "Semantic Map File:")
+        self.semanticMapTextBox = self.mqt.CreateTextBox(True, None)
+        horiz = self.mqt.CreateHorizontalContainer()
+        self.mqt.AddWidget(horiz, semanticMapLabel)
+        self.mqt.AddWidget(horiz, self.semanticMapTextBox)
+        self.mqt.AddWidget(vert, horiz)
+
         saveTextureLabel = self.mqt.CreateLabel()
         self.mqt.SetWidgetText(saveTextureLabel, "Save Texture:")
         self.saveTextureCheckBox = self.mqt.CreateCheckbox(None)
@@ -66,6 +87,72 @@ class Window(qrd.CaptureViewer):
         self.mqt.AddWidget(horiz, self.saveTextureCheckBox)
         self.mqt.AddWidget(vert, horiz)
 
+        binaryLabel = self.mqt.CreateLabel()
+        self.mqt.SetWidgetText(binaryLabel, "Binary FBX:")
+        self.binaryCheckBox = self.mqt.CreateCheckbox(None)
+        horiz = self.mqt.CreateHorizontalContainer()
+        self.mqt.AddWidget(horiz, binaryLabel)
+        self.mqt.AddWidget(horiz, self.mqt.CreateSpacer(True))
+        self.mqt.AddWidget(horiz, self.binaryCheckBox)
+        self.mqt.AddWidget(vert, horiz)
+
+        dedupLabel = self.mqt.CreateLabel()
+        self.mqt.SetWidgetText(dedupLabel, "Link Repeated Meshes:")
+        self.dedupCheckBox = self.mqt.CreateCheckbox(None)
+        horiz = self.mqt.CreateHorizontalContainer()
+        self.mqt.AddWidget(horiz, dedupLabel)
+        self.mqt.AddWidget(horiz, self.mqt.CreateSpacer(True))
+        self.mqt.AddWidget(horiz, self.dedupCheckBox)
+        self.mqt.AddWidget(vert, horiz)
+
+        sceneLabel = self.mqt.CreateLabel()
+        self.mqt.SetWidgetText(sceneLabel, "Single Scene File:")
+        self.sceneCheckBox = self.mqt.CreateCheckbox(None)
+        horiz = self.mqt.CreateHorizontalContainer()
+        self.mqt.AddWidget(horiz, sceneLabel)
+        self.mqt.AddWidget(horiz, self.mqt.CreateSpacer(True))
+        self.mqt.AddWidget(horiz, self.sceneCheckBox)
+        self.mqt.AddWidget(vert, horiz)
+
+        mergeInstancesLabel = self.mqt.CreateLabel()
+        self.mqt.SetWidgetText(mergeInstancesLabel, "Merge Instances:")
+        self.mergeInstancesCheckBox = self.mqt.CreateCheckbox(None)
+        horiz = self.mqt.CreateHorizontalContainer()
+        self.mqt.AddWidget(horiz, mergeInstancesLabel)
+        self.mqt.AddWidget(horiz, self.mqt.CreateSpacer(True))
+        self.mqt.AddWidget(horiz, self.mergeInstancesCheckBox)
+        self.mqt.AddWidget(vert, horiz)
+
+        shaderOutputLabel = self.mqt.CreateLabel()
+        self.mqt.SetWidgetText(shaderOutputLabel, "Export Shader Output:")
+        self.shaderOutputCheckBox = self.mqt.CreateCheckbox(None)
+        horiz = self.mqt.CreateHorizontalContainer()
+        self.mqt.AddWidget(horiz, shaderOutputLabel)
+        self.mqt.AddWidget(horiz, self.mqt.CreateSpacer(True))
+        self.mqt.AddWidget(horiz, self.shaderOutputCheckBox)
+        self.mqt.AddWidget(vert, horiz)
+
+        cacheLabel = self.mqt.CreateLabel()
+        self.mqt.SetWidgetText(cacheLabel, "Use Export Cache:")
+        self.cacheCheckBox = self.mqt.CreateCheckbox(None)
+        clearCacheButton = self.mqt.CreateButton(lambda c, w, d: self.clear_cache())
+        self.mqt.SetWidgetText(clearCacheButton, "Clear Cache")
+        horiz = self.mqt.CreateHorizontalContainer()
+        self.mqt.AddWidget(horiz, cacheLabel)
+        self.mqt.AddWidget(horiz, self.mqt.CreateSpacer(True))
+        self.mqt.AddWidget(horiz, self.cacheCheckBox)
+        self.mqt.AddWidget(horiz, clearCacheButton)
+        self.mqt.AddWidget(vert, horiz)
+
+        profileLabel = self.mqt.CreateLabel()
+        self.mqt.SetWidgetText(profileLabel, "Profile Export:")
+        self.profileCheckBox = self.mqt.CreateCheckbox(None)
+        horiz = self.mqt.CreateHorizontalContainer()
+        self.mqt.AddWidget(horiz, profileLabel)
+        self.mqt.AddWidget(horiz, self.mqt.CreateSpacer(True))
+        self.mqt.AddWidget(horiz, self.profileCheckBox)
+        self.mqt.AddWidget(vert, horiz)
+
         self.folderLabel = self.mqt.CreateLabel()
         folderButton = self.mqt.CreateButton(lambda c, w, d: self.select_folder())
         self.mqt.SetWidgetText(folderButton, "Select Folder")
@@ -77,7 +164,15 @@ class Window(qrd.CaptureViewer):
 
         self.exportButton = self.mqt.CreateButton(lambda c, w, d: self.start_export())
         self.mqt.SetWidgetText(self.exportButton, "Export")
-        self.mqt.AddWidget(vert, self.exportButton)
+        self.cancelButton = self.mqt.CreateButton(lambda c, w, d: self.cancel_export())
+        self.mqt.SetWidgetText(self.cancelButton, "Cancel")
+        horiz = self.mqt.CreateHorizontalContainer()
+        self.mqt.AddWidget(horiz, self.exportButton)
+        self.mqt.AddWidget(horiz, self.cancelButton)
+        self.mqt.AddWidget(vert, horiz)
+
+        self.progressLabel = self.mqt.CreateLabel()
+        self.mqt.AddWidget(vert, self.progressLabel)
         
         self.refresh()
 
@@ -99,30 +194,68 @@ class Window(qrd.CaptureViewer):
         self.save_path = self.ctx.Extensions().OpenDirectoryName("Select Folder")
         self.refresh()
 
+    def clear_cache(self):
+        cache.ExportCache(CACHE_DIR).clear()
+
     def refresh(self):
-        self.mqt.SetWidgetEnabled(self.exportButton, self.save_path is not None)
+        self.mqt.SetWidgetEnabled(self.exportButton, self.save_path is not None and self.progress is None)
+        self.mqt.SetWidgetEnabled(self.cancelButton, self.progress is not None)
         self.mqt.SetWidgetText(self.folderLabel, "Destination Folder:" + str(self.save_path))
 
     def start_export(self):
+        # An empty start or end leaves that side of the range open
         try:
-            startDrawcallId = int(self.mqt.GetWidgetText(self.startDrawcallTextBox))
-            endDrawcallId = int(self.mqt.GetWidgetText(self.endDrawcallTextBox))
+            startDrawcallId = self.mqt.GetWidgetText(self.startDrawcallTextBox)
+            startDrawcallId = int(startDrawcallId) if startDrawcallId else None
+            endDrawcallId = self.mqt.GetWidgetText(self.endDrawcallTextBox)
+            endDrawcallId = int(endDrawcallId) if endDrawcallId else None
         except:
             self.ctx.Extensions().MessageDialog("not a valid number", "Error")
             return
 
-        if startDrawcallId < 0 or endDrawcallId < 0:
+        if (startDrawcallId or 0) < 0 or (endDrawcallId or 0) < 0:
             self.ctx.Extensions().MessageDialog("not a valid drawcall id", "Error")
             return
             
         is_save_texture = self.mqt.IsWidgetChecked(self.saveTextureCheckBox)
-        exporter.export_wrap(self.ctx, startDrawcallId, endDrawcallId, is_save_texture, self.save_path, lambda results: self.finish_export(results))
+        dedup = exporter.DEDUP_HARDLINK if self.mqt.IsWidgetChecked(self.dedupCheckBox) else exporter.DEDUP_OFF
+        fbx_format = exporter.FBX_FORMAT_BINARY if self.mqt.IsWidgetChecked(self.binaryCheckBox) else exporter.FBX_FORMAT_ASCII
+        cache_dir = CACHE_DIR if self.mqt.IsWidgetChecked(self.cacheCheckBox) else None
+        scene = self.mqt.IsWidgetChecked(self.sceneCheckBox)
+        profile = self.mqt.IsWidgetChecked(self.profileCheckBox)
+        marker = self.mqt.GetWidgetText(self.markerTextBox) or None
+        semantic_map = self.mqt.GetWidgetText(self.semanticMapTextBox) or None
+        instances = exporter.INSTANCES_MERGED if self.mqt.IsWidgetChecked(self.mergeInstancesCheckBox) else exporter.INSTANCES_MODELS
+        # The geometry shader output where there is one, else the vertex shader output
+        vertex_source = exporter.VERTEX_SOURCE_GSOUT if self.mqt.IsWidgetChecked(self.shaderOutputCheckBox) else exporter.VERTEX_SOURCE_INPUTS
+        self.progress = exporter.export_wrap(self.ctx, startDrawcallId, endDrawcallId, is_save_texture, self.save_path,
+                                             lambda results, summary: self.finish_export(results, summary),
+                                             lambda report: self.show_progress(report),
+                                             fbx_format=fbx_format, dedup=dedup, cache_dir=cache_dir,
+                                             scene=scene, profile=profile, marker=marker,
+                                             instances=instances, vertex_source=vertex_source,
+                                             semantic_map=semantic_map)
+        self.refresh()
+
+    def show_progress(self, report):
+        self.mqt.SetWidgetText(self.progressLabel, report.text())
+
+    def cancel_export(self):
+        if self.progress is not None:
+            self.progress.cancel()
+            self.mqt.SetWidgetText(self.progressLabel, "Cancelling...")
+
+    def finish_export(self, result, summary):
+        self.progress = None
+        self.refresh()
 
-    def finish_export(self, result):
         if result:
             self.ctx.Extensions().MessageDialog(result, "Failed")
         else:
-            self.ctx.Extensions().MessageDialog("Export Finished", "Congradualtion!~")
+            message = "Export Finished"
+            if summary:
+                message += "\n" + summary
+            self.ctx.Extensions().MessageDialog(message, "Congradualtion!~")
             os.startfile(self.save_path)
 
 